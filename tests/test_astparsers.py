@@ -0,0 +1,358 @@
+from __future__ import print_function
+import os
+import io
+import shutil
+import pickle
+
+from xdress.astparsers import ParseCache, ParsersAvailable, ParserMemo, \
+    gccxml_index, etree, _gccxml_iterparse, ClangIndex, cindex
+from xdress.types.system import TypeSystem
+from xdress import astparsers
+
+from nose.tools import assert_equal, assert_true, assert_false
+from nose.plugins.skip import SkipTest
+from tools import unit
+
+def _clean(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.isfile(path):
+            os.remove(path)
+
+def _write(filename, s):
+    with io.open(filename, 'w') as f:
+        f.write(s)
+
+@unit
+def test_parse_cache():
+    cachedir = os.path.join('build', 'parse-cache')
+    _clean([cachedir])
+    hdrs = [os.path.join('build', 'pc_a.h'), os.path.join('build', 'pc_b.h')]
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    _write(hdrs[0], u'#include "pc_b.h"\n')
+    _write(hdrs[1], u'int x;\n')
+    cmd = ['gccxml', hdrs[0], '-DXDRESS']
+    out = os.path.join('build', 'pc_a.xml.tmp')
+    _write(out, u'<GCC_XML/>')
+    cache = ParseCache(cachedir)
+    assert_true(cache.lookup(cmd) is None)
+    path = cache.store(cmd, out, hdrs)
+    assert_false(os.path.isfile(out))
+    assert_equal(cache.lookup(cmd), path)
+    # hits are only written out when the cache is flushed
+    assert_true(cache.dirty)
+    atime = cache.entries[cache.cmdkey(cmd)][0]['atime']
+    cache.flush()
+    assert_false(cache.dirty)
+    assert_equal(ParseCache(cachedir).entries[cache.cmdkey(cmd)][0]['atime'], atime)
+    # different flags miss
+    assert_true(cache.lookup(cmd + ['-DOTHER']) is None)
+    # the index persists
+    assert_equal(ParseCache(cachedir).lookup(cmd), path)
+    # changing a transitive include invalidates the entry
+    _write(hdrs[1], u'int y, z;\n')
+    assert_true(cache.lookup(cmd) is None)
+    _clean([cachedir] + hdrs)
+
+@unit
+def test_parse_cache_evict():
+    cachedir = os.path.join('build', 'parse-cache-evict')
+    _clean([cachedir])
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    hdr = os.path.join('build', 'pc_evict.h')
+    _write(hdr, u'int x;\n')
+    cache = ParseCache(cachedir, maxsize=15)
+    paths = []
+    for i in range(3):
+        out = os.path.join('build', 'pc_evict.xml.tmp')
+        _write(out, u'<GCC_XML/>')  # 10 bytes
+        paths.append(cache.store(['gccxml', hdr, '-DN={0}'.format(i)], out, [hdr]))
+    assert_false(os.path.isfile(paths[0]))
+    assert_false(os.path.isfile(paths[1]))
+    assert_true(os.path.isfile(paths[2]))
+    assert_equal(cache.lookup(['gccxml', hdr, '-DN=2']), paths[2])
+    assert_true(cache.lookup(['gccxml', hdr, '-DN=0']) is None)
+    _clean([cachedir, hdr])
+
+@unit
+def test_parse_cache_merge():
+    cachedir = os.path.join('build', 'parse-cache-merge')
+    _clean([cachedir])
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    hdr = os.path.join('build', 'pc_merge.h')
+    _write(hdr, u'int x;\n')
+    # two caches with the same directory, as in concurrent processes
+    c1 = ParseCache(cachedir)
+    c2 = ParseCache(cachedir)
+    out = os.path.join('build', 'pc_merge.xml.tmp')
+    _write(out, u'<GCC_XML/>')
+    p1 = c1.store(['gccxml', hdr, '-DN=1'], out, [hdr])
+    _write(out, u'<GCC_XML/>')
+    p2 = c2.store(['gccxml', hdr, '-DN=2'], out, [hdr])
+    c3 = ParseCache(cachedir)
+    assert_equal(c3.lookup(['gccxml', hdr, '-DN=1']), p1)
+    assert_equal(c3.lookup(['gccxml', hdr, '-DN=2']), p2)
+    _clean([cachedir, hdr])
+
+@unit
+def test_parse_cache_sizes():
+    builddir = os.path.join('build', 'parse-cache-sizes')
+    sizes = astparsers.GCCXML_CACHE_SIZE, astparsers.PYCPARSER_CACHE_SIZE
+    astparsers.GCCXML_CACHE_SIZE, astparsers.PYCPARSER_CACHE_SIZE = 10, 20
+    try:
+        assert_equal(astparsers.gccxml_cache(builddir).maxsize, 10)
+        assert_equal(astparsers.pycparser_cache(builddir).maxsize, 20)
+    finally:
+        astparsers.GCCXML_CACHE_SIZE, astparsers.PYCPARSER_CACHE_SIZE = sizes
+        for parser in ('gccxml', 'pycparser'):
+            astparsers._parse_caches.pop((builddir, parser), None)
+        _clean([builddir])
+
+@unit
+def test_parser_memo():
+    memo = ParserMemo(maxsize=25)
+    assert_equal(memo.lookup('a'), (False, None))
+    memo.store('a', 'A', 10)
+    memo.store('b', 'B', 10)
+    assert_equal(memo.lookup('a'), (True, 'A'))
+    # 'b' is now the least recently used
+    memo.store('c', 'C', 10)
+    assert_false('b' in memo)
+    assert_true('a' in memo)
+    assert_true('c' in memo)
+    # the newest entry is kept even if it is too large on its own
+    memo.store('d', 'D', 100)
+    assert_equal(len(memo), 1)
+    assert_equal(memo.stats(), {'hits': 1, 'misses': 1, 'evictions': 3,
+                                'entries': 1, 'nbytes': 100})
+    memo.clear()
+    assert_equal(memo.nbytes, 0)
+
+@unit
+def test_parser_memo_invalidate():
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    hdrs = [os.path.join('build', 'memo_a.h'), os.path.join('build', 'memo_b.h')]
+    for hdr in hdrs:
+        _write(hdr, u'int x;\n')
+    memo = ParserMemo()
+    memo.store('a', 'A', 10, deps=hdrs[:1])
+    memo.store('b', 'B', 10, deps=hdrs)
+    assert_equal(memo.invalidate(), 0)
+    _write(hdrs[1], u'int x, y;\n')
+    assert_equal(memo.invalidate(), 1)
+    assert_true('a' in memo)
+    assert_false('b' in memo)
+    assert_equal(memo.nbytes, 10)
+    _clean(hdrs)
+
+GCCXML_SAMPLE = u"""<?xml version="1.0"?>
+<GCC_XML>
+  <Namespace id="_1" name="::" members="_3 _4" mangled="_Z2::" demangled="::"/>
+  <Function id="_3" name="f" returns="_5" context="_1" file="f1" line="1">
+    <Argument name="x" type="_5" file="f1" line="1"/>
+  </Function>
+  <FundamentalType id="_5" name="int" size="32" align="32"/>
+  <Variable id="_4" name="x" type="_5" context="_1" file="f1" line="2"/>
+  <File id="f1" name="a.h"/>
+</GCC_XML>
+"""
+
+@unit
+def test_gccxml_index():
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    xmlname = os.path.join('build', 'index.xml')
+    _write(xmlname, GCCXML_SAMPLE)
+    root = etree.parse(xmlname)
+    index = gccxml_index(root)
+    assert_true(gccxml_index(root) is index)
+    for id in ['_1', '_3', '_4', '_5', 'f1', '_42']:
+        assert_true(index.find_id(id) is root.find(".//*[@id='{0}']".format(id)))
+    # the first element with a name is the nested argument, as with find()
+    assert_true(index.find_name('x') is root.find(".//*[@name='x']"))
+    assert_equal(index.find_name('x').tag, 'Argument')
+    assert_true(index.find_tag('Variable', 'x') is root.find("Variable[@name='x']"))
+    assert_equal(list(index.iter_tag('FundamentalType')),
+                 list(root.iterfind('FundamentalType')))
+    assert_equal(index.files, {'a.h': 'f1'})
+    assert_equal(index.filenames, {'f1': 'a.h'})
+    _clean([xmlname])
+
+GCCXML_STREAM_SAMPLE = u"""<?xml version="1.0"?>
+<GCC_XML>
+  <Namespace id="_1" name="::" members="_3 _4 _6 _7" mangled="_Z2::" demangled="::"/>
+  <Function id="_3" name="f" returns="_5" context="_1" file="f1" line="1">
+    <Argument name="x" type="_8" file="f1" line="1"/>
+  </Function>
+  <FundamentalType id="_5" name="int" size="32" align="32"/>
+  <Variable id="_4" name="x" type="_5" context="_1" file="f1" line="2"/>
+  <Struct id="_6" name="used" context="_1" members="_9" bases="private:_7" file="f2" line="1"/>
+  <Struct id="_7" name="unused" context="_1" members="" file="f2" line="2"/>
+  <PointerType id="_8" type="_6" size="64" align="64"/>
+  <Field id="_9" name="y" type="_10" context="_6" file="f2" line="1"/>
+  <FundamentalType id="_10" name="double" size="64" align="64"/>
+  <FundamentalType id="_11" name="float" size="32" align="32"/>
+  <Typedef id="_12" name="other" type="_11" context="_1" file="f2" line="3"/>
+  <File id="f1" name="a.h"/>
+  <File id="f2" name="sys.h"/>
+</GCC_XML>
+"""
+
+@unit
+def test_gccxml_iterparse():
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    xmlname = os.path.join('build', 'stream.xml')
+    _write(xmlname, GCCXML_STREAM_SAMPLE)
+    root = _gccxml_iterparse(xmlname, set(['a.h']))
+    ids = [e.attrib['id'] for e in root.getroot()]
+    assert_equal(ids, ['_1', '_3', '_5', '_4', '_6', '_7', '_8', '_9', '_10',
+                       'f1', 'f2'])
+    # nested elements are kept with their parents
+    assert_equal(root.find("Function/Argument").attrib['type'], '_8')
+    root = _gccxml_iterparse(xmlname, set(['nothere.h']))
+    assert_equal([e.tag for e in root.getroot()], ['File', 'File'])
+    _clean([xmlname])
+
+GCCXML_STREAM_TEMPLATE_SAMPLE = u"""<?xml version="1.0"?>
+<GCC_XML>
+  <Function id="_3" name="g" returns="_5" demangled="g&lt;other, (ns::E)1&gt;()" file="f1" line="1"/>
+  <FundamentalType id="_5" name="int" size="32" align="32"/>
+  <Enumeration id="_6" name="E" file="f2" line="1">
+    <EnumValue name="E1" init="1"/>
+  </Enumeration>
+  <FundamentalType id="_11" name="float" size="32" align="32"/>
+  <Typedef id="_12" name="other" type="_11" file="f2" line="3"/>
+  <Typedef id="_13" name="unused" type="_11" file="f2" line="4"/>
+  <File id="f1" name="a.h"/>
+  <File id="f2" name="sys.h"/>
+</GCC_XML>
+"""
+
+@unit
+def test_gccxml_iterparse_template_names():
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    xmlname = os.path.join('build', 'stream-tmpl.xml')
+    _write(xmlname, GCCXML_STREAM_TEMPLATE_SAMPLE)
+    # template arguments are looked up by name, so they are kept
+    index = gccxml_index(_gccxml_iterparse(xmlname, set(['a.h'])))
+    assert_equal(index.find_name('other').attrib['id'], '_12')
+    assert_equal(index.find_name('float').attrib['id'], '_11')
+    assert_equal(index.find_name('E').attrib['id'], '_6')
+    assert_true(index.find_name('unused') is None)
+    _clean([xmlname])
+
+class _Cursor(object):
+    # a stand-in for clang cursors, which needs no libclang
+    def __init__(self, kind, spelling, filename, children=(), specs=()):
+        class Location(object):
+            file = None if filename is None else type('File', (), {'name': filename})
+        self.kind = getattr(cindex.CursorKind, kind)
+        self.spelling = spelling
+        self.location = Location
+        self.children = children
+        self.specs = specs
+
+    def get_children(self):
+        return iter(self.children)
+
+    def get_specializations(self):
+        return iter(self.specs)
+
+class _TU(object):
+    def __init__(self, children):
+        self.cursor = _Cursor('TRANSLATION_UNIT', 'tu', None, children)
+
+@unit
+def test_clang_index():
+    f = _Cursor('FUNCTION_DECL', 'f', 'a.h')
+    g = _Cursor('FUNCTION_DECL', 'f', 'sys.h')
+    nf = _Cursor('FUNCTION_DECL', 'f', 'a.h')
+    nnf = _Cursor('FUNCTION_DECL', 'f', 'a.h')
+    s = _Cursor('STRUCT_DECL', 'f', 'a.h')
+    inner = _Cursor('NAMESPACE', 'inner', 'a.h', [nnf])
+    ns = _Cursor('NAMESPACE', 'ns', 'a.h', [nf, inner, s])
+    sysns = _Cursor('NAMESPACE', 'ns', 'sys.h', [g])
+    index = ClangIndex(_TU([f, g, ns, sysns]))
+    fn = (cindex.CursorKind.FUNCTION_DECL,)
+    both = (cindex.CursorKind.FUNCTION_DECL, cindex.CursorKind.STRUCT_DECL)
+    # innermost scopes first, in source order within a scope
+    assert_equal(index.find('f', fn), [g, nnf, nf, f, g])
+    assert_equal(index.find('f', fn, onlyin=set(['a.h'])), [nnf, nf, f])
+    assert_equal(index.find('f', both, onlyin=set(['a.h'])), [nnf, nf, s, f])
+    assert_equal(index.find('f', fn, namespace='ns'), [g, nf])
+    assert_equal(index.find('f', fn, onlyin=set(['a.h']), namespace='ns'), [nf])
+    assert_equal(index.find('nope', fn), [])
+    # specializations are computed once per type system
+    calls = []
+    def canonargs(spec):
+        calls.append(spec)
+        return (spec.spelling,)
+    tmpl = _Cursor('CLASS_TEMPLATE', 'T', 'a.h', specs=[f, s, g])
+    specs = index.specializations(tmpl, None, canonargs)
+    assert_equal(specs, {('f',): f})
+    assert_true(index.specializations(tmpl, None, canonargs) is specs)
+    assert_equal(len(calls), 3)
+    # and rebuilt when the type system changes
+    ts = TypeSystem()
+    specs = index.specializations(tmpl, ts, canonargs)
+    assert_true(index.specializations(tmpl, ts, canonargs) is specs)
+    assert_equal(len(calls), 6)
+    ts.register_classname('T', 'pkg', 'm', 'cpp_m')
+    assert_false(index.specializations(tmpl, ts, canonargs) is specs)
+    assert_equal(len(calls), 9)
+    ts.reset()
+    specs = index.specializations(tmpl, ts, canonargs)
+    assert_equal(len(calls), 12)
+    # resetting an unchanged type system keeps the table
+    ts.reset()
+    assert_true(index.specializations(tmpl, ts, canonargs) is specs)
+    assert_equal(len(calls), 12)
+
+@unit
+def test_parsers_available():
+    if os.name == 'nt':
+        raise SkipTest
+    bindir = os.path.abspath(os.path.join('build', 'probe-bin'))
+    builddir = os.path.join('build', 'probe')
+    _clean([bindir, builddir])
+    os.makedirs(bindir)
+    exe = os.path.join(bindir, 'gccxml')
+    _write(exe, u'#!/bin/sh\nexit 0\n')
+    os.chmod(exe, 0o755)
+    path = os.environ.get('PATH', '')
+    os.environ['PATH'] = bindir + os.pathsep + path
+    try:
+        avail = ParsersAvailable(builddir)
+        assert_equal(len(avail), 0)
+        assert_true(avail['gccxml'])
+        assert_equal(list(avail.keys()), ['gccxml'])
+        assert_true(os.path.isfile(os.path.join(builddir, 'parsers.cache')))
+        # the probe is cached per executable path and mtime
+        mtime = os.path.getmtime(exe)
+        _write(exe, u'#!/bin/sh\nexit 1\n')
+        os.utime(exe, (mtime, mtime))
+        assert_true(ParsersAvailable(builddir)['gccxml'])
+        os.utime(exe, (mtime + 10, mtime + 10))
+        assert_false(ParsersAvailable(builddir)['gccxml'])
+        # a truncated cache is probed again and rewritten
+        cachefile = os.path.join(builddir, 'parsers.cache')
+        with io.open(cachefile, 'r+b') as f:
+            f.truncate(3)
+        assert_false(ParsersAvailable(builddir)['gccxml'])
+        assert_equal(os.listdir(builddir), ['parsers.cache'])
+        with io.open(cachefile, 'rb') as f:
+            assert_equal(len(pickle.load(f)), 1)
+    finally:
+        os.environ['PATH'] = path
+        _clean([bindir, builddir])
+
+if __name__ == '__main__':
+    import nose
+    nose.runmodule()
@@ -5,8 +5,9 @@ from xdress.types.system import TypeSystem
 from xdress import cythongen as cg
 from xdress import autodescribe as ad
 from xdress.astparsers import PARSERS_AVAILABLE
-from xdress.utils import parse_global_rc, Arg
+from xdress.utils import parse_global_rc, Arg, apiname
 
+from nose.tools import assert_equal
 from tools import unit, assert_equal_or_diff, skip_then_continue, cleanfs
 
 from numpy.testing import dec
@@ -256,6 +257,41 @@ def test_merge_descriptions():
     exp = full_merge_desc
     assert_equal_or_diff(obs, exp)
 
+class _StoreCache(object):
+    # a description cache stand-in which records the stored names
+    def __init__(self):
+        self.stored = []
+
+    def store(self, name, kind, desc, deps=()):
+        self.stored.append(name.srcname)
+
+def _described(srcname, argtype, argkinds=()):
+    name = apiname(srcname, ('m.h',), 'm', srcname, ('m.h',), (), 'c++')
+    desc = {'name': srcname, 'namespace': None,
+            'signatures': {(srcname, ('x', argtype)): 'int32'}}
+    return [(name, 'func')], ([desc], list(argkinds), ())
+
+@unit
+def test_merge_described():
+    vec = ('vector', 'int32', 0)
+    groups = [_described('f', 'int32', [(vec, (Arg.TYPE,))]),
+              _described('g', vec), _described('h', 'float64')]
+    # g mentions a type whose argument kinds f registered, so it and every
+    # group after it are left to be described serially
+    x, cache = TypeSystem(), _StoreCache()
+    todo, results = zip(*groups)
+    assert_equal(ad._merge_described(todo, results, x, cache), 1)
+    assert_equal(cache.stored, ['f'])
+    assert_equal(x.argument_kinds[vec], (Arg.TYPE,))
+    # independent groups are all merged, in order, up to the first failure
+    x, cache = TypeSystem(), _StoreCache()
+    todo, results = zip(groups[0], groups[2])
+    assert_equal(ad._merge_described(todo, results, x, cache), 2)
+    assert_equal(cache.stored, ['f', 'h'])
+    x, cache = TypeSystem(), _StoreCache()
+    assert_equal(ad._merge_described(todo, (None,) + results[1:], x, cache), 0)
+    assert_equal(cache.stored, [])
+
 @dec.skipif(ad.pycparser is None)
 @unit
 def test_pycparser_describe_device_measure():
@@ -328,6 +364,16 @@ def test_pycparser_describe_device_descriptor_tag():
            }
     assert_equal_or_diff(obs, exp)
 
+@dec.skipif(ad.pycparser is None)
+@unit
+def test_pycparser_describe_many():
+    names = [('Device_measure', 'func'), ('Device_Init', 'func')]
+    obs = ad.describe_many('device.c', names, parsers='pycparser', ts=ts,
+                           language='c')
+    exp = [ad.pycparser_describe('device.c', name, kind, ts=ts)
+           for name, kind in names]
+    assert_equal_or_diff(obs, exp)
+
 if __name__ == '__main__':
     import nose
     nose.runmodule()
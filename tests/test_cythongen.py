@@ -0,0 +1,201 @@
+from __future__ import print_function
+import os
+import shutil
+import warnings
+
+from xdress.types.system import TypeSystem
+from xdress.utils import Arg, RunControl
+from xdress import cythongen
+from xdress.cythongen import _gen_function, funccpppxd, classcpppxd, \
+    _unsafe_nogil, module_fingerprint, _generator_digest, _gen_dispatcher, \
+    XDressPlugin
+
+from nose.tools import assert_equal, assert_true, assert_false, assert_raises
+from tools import unit
+
+def _sig(rtn, nargs=0):
+    return {'return': rtn, 'defaults': ((Arg.NONE, None),) * nargs}
+
+def _name(name):
+    return {'tarname': name, 'srcname': name, 'incfiles': ('m.h',),
+            'language': 'c++', 'tarbase': 'm'}
+
+def _funcdesc(signatures, nogil=True):
+    return {'name': _name('f'), 'namespace': None, 'signatures': signatures,
+            'nogil': nogil, 'extra': {'srcpxd_filename': 'cpp_m.pxd'}}
+
+def _classdesc(methods, attrs=None, nogil=True):
+    return {'name': _name('Toaster'), 'type': 'Toaster', 'parents': [],
+            'namespace': None, 'construct': 'class', 'attrs': attrs or {},
+            'methods': methods, 'nogil': nogil,
+            'extra': {'srcpxd_filename': 'cpp_m.pxd'}}
+
+fptr = ('function_pointer', (('x', 'int32'),), 'float64')
+
+@unit
+def test_gen_function_nogil():
+    ts = TypeSystem()
+    lines = _gen_function('f', 'f', (('x', 'str'), ('y', 'float64')), 'int32',
+                          ((Arg.NONE, None), (Arg.NONE, None)), ts,
+                          inst_name='cpp_m', is_method=False, nogil=True)
+    # arguments are converted before the GIL is released
+    assert_true('    cdef std_string x_nogil' in lines)
+    assert_true('    cdef double y_nogil' in lines)
+    assert_true('    y_nogil = <double> y' in lines)
+    i = lines.index('    with nogil:')
+    assert_true(lines.index('    y_nogil = <double> y') < i)
+    assert_equal(lines[i+1], '        rtnval = cpp_m.f(x_nogil, y_nogil)')
+    assert_equal(lines[i+2], '    return int(rtnval)')
+    # without nogil, the call is made directly
+    lines = _gen_function('f', 'f', (('x', 'str'), ('y', 'float64')), 'int32',
+                          ((Arg.NONE, None), (Arg.NONE, None)), ts,
+                          inst_name='cpp_m', is_method=False)
+    assert_false('    with nogil:' in lines)
+    assert_false(any(['_nogil' in line for line in lines]))
+
+@unit
+def test_cpppxd_nogil():
+    ts = TypeSystem()
+    desc = _funcdesc({('f', ('x', 'int32')): _sig('float64', 1)})
+    cpppxd = funccpppxd(desc, ts=ts)[1]
+    assert_true('double f(int) nogil except +' in cpppxd)
+    desc['nogil'] = False
+    cpppxd = funccpppxd(desc, ts=ts)[1]
+    assert_true('double f(int) except +' in cpppxd)
+    ts.register_class('Toaster', cpp_type='Toaster', cython_c_type='cpp_m.Toaster',
+                      cython_cimport=(('cpp_m',),), cython_py_type='Toaster')
+    desc = _classdesc({('Toaster',): _sig(None),
+                       ('make', ('n', 'int32')): _sig('int32', 1),
+                       ('burn',): _sig('void')}, nogil=['make'])
+    cpppxd = classcpppxd(desc, ts=ts)[1]
+    assert_true('int make(int) nogil except +' in cpppxd)
+    assert_true('void burn() except +' in cpppxd)
+    assert_true('cpp_m.Toaster() except +' in cpppxd)
+
+@unit
+def test_unsafe_nogil():
+    ts = TypeSystem()
+    func = _funcdesc({('f', ('x', 'int32')): _sig('float64', 1),
+                      ('f', ('cb', fptr)): _sig('int32', 1)})
+    cls = _classdesc({('Toaster',): _sig(None),
+                      ('make', ('cb', fptr)): _sig('int32', 1),
+                      ('burn',): _sig('void')})
+    attrcls = _classdesc({('burn',): _sig('void')}, attrs={'cb': fptr},
+                         nogil=['burn'])
+    safe = _funcdesc({('g', ('x', 'int32')): _sig('float64', 1)})
+    env = {'m': {'f': func, 'Toaster': cls, 'Oven': attrcls, 'g': safe}}
+    with warnings.catch_warnings(record=True) as w:
+        warnings.simplefilter('always')
+        _unsafe_nogil(env, ts)
+    assert_equal(len(w), 3)
+    assert_false(func['nogil'])
+    assert_equal(cls['nogil'], ['Toaster', 'burn'])
+    assert_false(attrcls['nogil'])
+    assert_true(safe['nogil'])
+
+@unit
+def test_module_fingerprint_without_source():
+    mod = {'f': _funcdesc({('f', ('x', 'int32')): _sig('float64', 1)})}
+    assert_true(module_fingerprint(mod, {}, []) is not None)
+    # when only bytecode is installed, modules are never skipped
+    filename = cythongen.__file__
+    cythongen.__file__ = filename + '.notthere'
+    _generator_digest.cache.clear()
+    try:
+        assert_true(_generator_digest() is None)
+        assert_true(module_fingerprint(mod, {}, []) is None)
+    finally:
+        cythongen.__file__ = filename
+        _generator_digest.cache.clear()
+    assert_true(_generator_digest() is not None)
+
+class _PyTypes(object):
+    # a type system stand-in which only knows Python type names
+    pytypes = {'int32': 'int', 'float64': 'float', 'myint': 'MyInt'}
+
+    def isrefinement(self, t):
+        return False
+
+    def cython_pytype(self, t):
+        return self.pytypes[t]
+
+def _overload(name, pytype):
+    def f(*args, **kwargs):
+        args += tuple([kwargs[k] for k in sorted(kwargs)])
+        if not all([isinstance(a, pytype) for a in args]):
+            raise TypeError(name)
+        return (name,) + args
+    return f
+
+@unit
+def test_gen_dispatcher():
+    nm = {('f', ('x', 'int32'), ('y', 'float64')): 'f_0',
+          ('f', ('x', 'float64')): 'f_1',
+          ('f', ('x', 'myint')): 'f_2',
+          ('f', ('x', 'int32')): 'f_3'}
+    src = "\n".join(_gen_dispatcher('f', nm, _PyTypes(), is_method=False))
+    # MyInt is a distinct type string for the same type as int
+    ns = {'MyInt': int, 'f_0': _overload('f_0', (int, float)),
+          'f_1': _overload('f_1', float), 'f_2': _overload('f_2', int),
+          'f_3': _overload('f_3', int)}
+    exec(src, ns)
+    f = ns['f']
+    assert_equal(ns['f_dispatch'][(int, float)], ns['f_0'])
+    # prefixes of the argument types are in the table, and overloads sorted
+    # first take precedence, even over equal types spelled differently
+    assert_equal(f(), ('f_1',))
+    assert_equal(f(1.0), ('f_1', 1.0))
+    assert_equal(f(1), ('f_2', 1))
+    assert_equal(f(1, 2.0), ('f_0', 1, 2.0))
+    # keyword arguments use the argument type sets
+    assert_equal(f(x=1.0), ('f_1', 1.0))
+    # misses fall back to trying each overload
+    assert_false((bool,) in ns['f_dispatch'])
+    assert_equal(f(True), ('f_2', True))
+    assert_raises(RuntimeError, f, 'one')
+
+def _structenv():
+    env = {}
+    for i in range(3):
+        mod, name = 'm{0}'.format(i), 'P{0}'.format(i)
+        attrs = {'x': 'int32', 'y': 'float64'}
+        if 0 < i:
+            attrs['prev'] = 'P{0}'.format(i - 1)
+        desc = {'name': dict(_name(name), language='c', tarbase=mod,
+                             incfiles=(mod + '.h',)),
+                'type': name, 'namespace': None, 'parents': [],
+                'construct': 'struct', 'attrs': attrs, 'methods': {},
+                'extra': {'srcpxd_filename': 'cpp_' + mod + '.pxd'}}
+        env[mod] = {name: desc, 'name': mod, 'srcpxd_filename': 'cpp_' + mod + '.pxd',
+                    'pxd_filename': mod + '.pxd', 'pyx_filename': mod + '.pyx'}
+    return env
+
+@unit
+def test_generate_parallel():
+    results = []
+    for jobs in (2, 1):
+        outdir = os.path.join('build', 'cythongen-j{0}'.format(jobs))
+        if os.path.isdir(outdir):
+            shutil.rmtree(outdir)
+        ts = TypeSystem()
+        for i in range(3):
+            ts.register_classname('P{0}'.format(i), 'pkg', 'm{0}'.format(i),
+                                  'cpp_m{0}'.format(i))
+        rc = RunControl(env=_structenv(), ts=ts, builddir=outdir,
+                        packagedir=outdir, jobs=jobs, max_callbacks=8,
+                        release_gil=(), verbose=False)
+        XDressPlugin().execute(rc)
+        files = {}
+        for f in os.listdir(outdir):
+            if f.endswith('.pxd') or f.endswith('.pyx'):
+                with open(os.path.join(outdir, f)) as g:
+                    files[f] = g.read()
+        results.append((files, rc.env))
+        shutil.rmtree(outdir)
+    (pfiles, penv), (sfiles, senv) = results
+    assert_equal(len(pfiles), 9)
+    assert_equal(pfiles, sfiles)
+    # the keys added to the descriptions are copied back from the workers
+    assert_equal(penv, senv)
+    assert_equal(penv['m1']['P1']['srcpxd_filename'], 'cpp_m1.pxd')
+    assert_equal(penv['m1']['P1']['extra']['pxd_filename'], 'm1.pxd')
@@ -0,0 +1,72 @@
+from __future__ import print_function
+import os
+import sys
+import socket
+import threading
+import subprocess
+
+from xdress.daemon import socket_path, wait_for_change, _FdStream, _messages, \
+    _environ
+
+from nose.tools import assert_equal, assert_true
+from tools import unit
+
+@unit
+def test_socket_path():
+    obs = socket_path('build')
+    assert_true(os.path.isabs(obs))
+    assert_equal(os.path.basename(obs), 'xdress.sock')
+
+@unit
+def test_wait_for_change():
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    watched = os.path.join('build', 'watched.h')
+    other = os.path.join('build', 'unwatched.h')
+    with open(watched, 'w') as f:
+        f.write('int x;\n')
+    def edit():
+        with open(other, 'w') as f:
+            f.write('int y;\n')
+        with open(watched, 'w') as f:
+            f.write('int x, y;\n')
+    t = threading.Timer(0.1, edit)
+    t.start()
+    obs = wait_for_change([watched], interval=0.05)
+    t.join()
+    assert_equal(obs, watched)
+    os.remove(watched)
+    os.remove(other)
+
+@unit
+def test_fd_stream():
+    if not hasattr(socket, 'socketpair'):
+        return
+    server, client = socket.socketpair()
+    sys.stdout.flush()
+    stream = _FdStream(server, 1, 'out')
+    try:
+        subprocess.call([sys.executable, '-c', 'print("from a subprocess")'])
+    finally:
+        stream.close()
+    server.close()
+    obs = "".join([msg['out'] for msg in _messages(client)])
+    client.close()
+    assert_equal(obs.strip(), 'from a subprocess')
+
+@unit
+def test_environ():
+    env = dict(os.environ, XDRESS_TEST_VAR='client')
+    del env['HOME']
+    home = os.environ['HOME']
+    cmd = [sys.executable, '-c', 'import os; '
+           'print(os.environ.get("XDRESS_TEST_VAR"), "HOME" in os.environ)']
+    with _environ(env):
+        obs = subprocess.check_output(cmd).decode().split()
+    assert_equal(obs, ['client', 'False'])
+    # the environment of the daemon is restored afterwards
+    assert_true('XDRESS_TEST_VAR' not in os.environ)
+    assert_equal(os.environ['HOME'], home)
+    with _environ(None):
+        obs = subprocess.check_output(cmd).decode().split()
+    assert_equal(obs, ['None', 'True'])
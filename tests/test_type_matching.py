@@ -1,6 +1,6 @@
-from nose.tools import assert_equal
+from nose.tools import assert_equal, assert_true
 
-from xdress.types.matching import TypeMatcher, MatchAny, matches
+from xdress.types.matching import TypeMatcher, MatchAny, MatcherIndex, matches
 
 from tools import unit
 
@@ -39,3 +39,47 @@ def check_matches(pattern, t, exp):
 def test_matches():
     for pattern, t, exp in type_matcher_cases:
         yield check_matches, pattern, t, exp
+
+
+def check_matcherindex(pattern, t, exp):
+    index = MatcherIndex([TypeMatcher(pattern)])
+    obs = index.match(t) is not None
+    assert_equal(exp, obs)
+
+
+@unit
+def test_matcherindex():
+    for pattern, t, exp in type_matcher_cases:
+        yield check_matcherindex, pattern, t, exp
+
+
+@unit
+def test_matcherindex_most_specific():
+    tms = [TypeMatcher(p) for p in [(MatchAny, 'const'), ('float64', MatchAny),
+           ('float64', 'const'), ((MatchAny, 'const'), '&'), 
+           (('vector', MatchAny, 0), MatchAny)]]
+    for order in (tms, tms[::-1]):
+        index = MatcherIndex(order)
+        assert_equal(index.match(('float64', 'const')), tms[2])
+        assert_equal(index.match(('float64', '*')), tms[1])
+        assert_equal(index.match(('int32', 'const')), tms[0])
+        assert_equal(index.match((('int32', 'const'), '&')), tms[3])
+        assert_equal(index.match((('vector', ('int32', '*'), 0), '&')), tms[4])
+        assert_equal(index.match(('int32', '*')), None)
+        assert_equal(index.match(['float64', 'const']), tms[2])
+    index.remove(tms[2])
+    assert_equal(index.match(('float64', 'const')), tms[1])
+    assert_equal(len(index), 4)
+
+
+@unit
+def test_matcherindex_cache():
+    tm = TypeMatcher(('float64', MatchAny))
+    index = MatcherIndex([tm])
+    index.cachesize = 3
+    for i in range(10):
+        assert_equal(index.match(('int{0}'.format(i), '*')), None)
+        assert_true(len(index._cache) <= 3)
+    assert_equal(index.match(('float64', '*')), tm)
+    index.clearcache()
+    assert_equal(len(index._cache), 0)
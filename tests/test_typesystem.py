@@ -6,7 +6,7 @@ import sys
 from xdress.types.system import TypeSystem
 from xdress.utils import Arg
 
-from nose.tools import assert_equal, with_setup
+from nose.tools import assert_equal, assert_true, assert_false, with_setup
 from tools import unit
 
 if sys.version_info[0] > 2:
@@ -639,3 +639,141 @@ def test_io():
     hoover.extra_types = "excellent"
     hoover.dump(filename, format='pkl.gz')
     hoover = TypeSystem.load(filename, format='pkl.gz')
+
+@unit
+def test_pickle():
+    import pickle
+    x = TypeSystem()
+    x.register_argument_kinds(('vector', 'int32', 0), (Arg.TYPE,))
+    x.type_aliases['banana'] = 'float64'
+    del x.humannames['str']
+    x.base_types.add('banana_t')
+    x.cython_c2py('x', ('int32', '*'))
+    y = pickle.loads(pickle.dumps(x))
+    assert_equal(y.argument_kinds[('vector', 'int32', 0)], (Arg.TYPE,))
+    assert_equal(y.canon('banana'), 'float64')
+    assert_equal('str' in y.humannames, False)
+    assert_equal('banana_t' in y.base_types, True)
+    assert_equal(y.cython_c2py('x', ('int32', '*')), x.cython_c2py('x', ('int32', '*')))
+    e = pickle.loads(pickle.dumps(TypeSystem.empty()))
+    assert_equal(len(e.base_types), 0)
+    assert_equal(hasattr(e, 'dtypes'), False)
+
+@unit
+def test_memo_invalidation():
+    x = TypeSystem()
+    assert_equal(x.cython_pytype(('map', 'str', 'int32')), 
+                 'stlcontainers.MapStrInt')
+    assert_equal(x.cython_ctype('float64'), 'double')
+    # memoizations are kept separately for each stlcontainers module
+    with x.swap_stlcontainers(None):
+        assert_equal(x.cython_pytype(('map', 'str', 'int32')), 'MapStrInt')
+        assert_equal(x.cython_ctype('float64'), 'double')
+    n = len(x._cache)
+    assert_equal(x.cython_pytype(('map', 'str', 'int32')), 
+                 'stlcontainers.MapStrInt')
+    with x.swap_stlcontainers(None):
+        assert_equal(x.cython_pytype(('map', 'str', 'int32')), 'MapStrInt')
+    assert_equal(len(x._cache), n)
+    # and for each set of local classes
+    x.register_classname('Joan', 'pkg', 'pxd_joan', 'cpppxd_joan')
+    assert_equal(x.cython_pytype('Joan'), 'pxd_joan.Joan')
+    with x.local_classes(['Joan']):
+        assert_equal(x.cython_pytype('Joan'), 'Joan')
+        assert_equal(x.cython_ctype('Joan'), 'cpppxd_joan.Joan')
+    n = len(x._cache)
+    assert_equal(x.cython_pytype('Joan'), 'pxd_joan.Joan')
+    with x.local_classes(['Joan']):
+        assert_equal(x.cython_pytype('Joan'), 'Joan')
+    assert_equal(len(x._cache), n)
+    # registering a type clears only the memoizations which mention it
+    assert_equal(x.cython_ctype(('vector', 'float64')), 'cpp_vector[double]')
+    n = len(x._cache)
+    x.register_specialization(('vector', 'float64'), cython_c_type='dvec')
+    assert_true(len(x._cache) < n)
+    assert_true(0 < len(x._cache))
+    assert_equal(x.cython_ctype(('vector', 'float64')), 'dvec')
+    assert_true(0 < x.invalidatememo('vector'))
+    # placeholders are only looked for while memoizing, once for each value
+    y = TypeSystem()
+    y.register_class('Pt', cpp_type='Pt', cython_c_type='Pt',
+                     cython_py_type='{stlcontainers}Pt')
+    assert_equal(y.cython_pytypes['Pt'], 'stlcontainers.Pt')
+    assert_true('Pt' not in y.cython_pytypes._deps)
+    assert_equal(y.cython_pytype('Pt'), 'stlcontainers.Pt')
+    assert_equal(y.cython_pytypes._deps['Pt'][1], ('{stlcontainers}',))
+    with y.swap_stlcontainers(None):
+        assert_equal(y.cython_pytype('Pt'), 'Pt')
+    y.register_class('Pt', cython_py_type='Pt2')
+    assert_equal(y.cython_pytype('Pt'), 'Pt2')
+    assert_equal(y.cython_pytypes._deps['Pt'][1], ())
+
+@unit
+def test_registrations():
+    from xdress.utils import NotSpecified
+    x = TypeSystem()
+    fields = x.registrations()
+    assert_equal(fields, [('dtypes', None, 'dtypes'),
+                          ('extra_types', None, 'xdress_extra_types'),
+                          ('stlcontainers', None, 'stlcontainers')])
+    x.register_class('Joan', cython_c_type='cpp_joan.Joan', cython_cy_type='joan.Joan')
+    del x.humannames['str']
+    entries = x.registrations()
+    assert_true(('base_types', 'Joan', True) in entries)
+    assert_true(('cython_ctypes', 'Joan', 'cpp_joan.Joan') in entries)
+    assert_true(('humannames', 'str', NotSpecified) in entries)
+    x.deregister_class('Joan')
+    x.humannames['str'] = TypeSystem().humannames['str']
+    assert_equal(x.registrations(), fields)
+
+@unit
+def test_reset():
+    x = TypeSystem()
+    fields = x.registrations()
+    assert_equal(x.cython_ctype('int32'), 'int')
+    assert_equal(x.cython_ctype(('vector', 'float64')), 'cpp_vector[double]')
+    nmemo = len(x._cache)
+    x.register_class('Joan', cython_c_type='cpp_joan.Joan', cython_cy_type='joan.Joan')
+    x.cython_ctypes['int32'] = 'long'
+    x.dtypes = 'mydtypes'
+    assert_equal(x.cython_ctype('Joan'), 'cpp_joan.Joan')
+    assert_true(5 <= x.reset())
+    assert_equal(x.registrations(), fields)
+    assert_true('Joan' not in x.base_types)
+    # the memoizations of unrelated types are kept
+    assert_true(0 < len(x._cache))
+    assert_true(len(x._cache) < nmemo + 1)
+    assert_equal(x.cython_ctype('int32'), 'int')
+    assert_equal(x.cython_ctype(('vector', 'float64')), 'cpp_vector[double]')
+    assert_equal(x.reset(), 0)
+    # the results of type matcher lookups are forgotten
+    assert_true('NotAType' not in x.cython_c2py_conv)
+    assert_true(0 < len(x.cython_c2py_conv._tms._cache))
+    x.reset()
+    assert_equal(len(x.cython_c2py_conv._tms._cache), 0)
+
+@unit
+def test_canon_interned():
+    import pickle
+    from xdress.types.system import CanonType
+    x = TypeSystem()
+    t = x.canon(('vector', ('vector', 'float64')))
+    assert_true(isinstance(t, CanonType))
+    assert_true(isinstance(t[1], CanonType))
+    assert_equal(t, ('vector', ('vector', 'float64', 0), 0))
+    assert_equal(hash(t), hash(('vector', ('vector', 'float64', 0), 0)))
+    assert_true(t is TypeSystem().canon(('vector', ('vector', 'float64', 0))))
+    assert_true(t is pickle.loads(pickle.dumps(t)))
+    assert_true(t != ('vector', 'float64', 0))
+    assert_true(t != 'vector')
+    assert_equal(x.canon('float64'), 'float64')
+    # types which nothing refers to are forgotten on reset, the others kept
+    from xdress.types.system import _canon_types
+    u = x.canon(('set', ('vector', 'char')))
+    key = ('set', ('vector', 'char', 0), 0)
+    del u
+    x.clearmemo()
+    x.reset()
+    assert_true(key not in _canon_types)
+    assert_true(t is x.canon(('vector', ('vector', 'float64', 0))))
+    assert_false(hasattr(t, '__dict__'))
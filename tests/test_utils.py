@@ -5,7 +5,10 @@ import numpy as np
 
 from xdress.utils import NotSpecified, RunControl, flatten, split_template_args, \
     ishashable, memoize, memoize_method, apiname, ensure_apiname, sortedbytype, \
-    c_literal, touch
+    c_literal, touch, DescriptionCache, RunFingerprint, digest, generated_from, \
+    note_generated, dump_generated, stabledigest, OutputManifest, newoverwrite
+from xdress.main import _run_paths
+from xdress.plugins import Plugins
 
 from nose.tools import assert_equal, with_setup, assert_true, assert_false, \
     assert_not_equal
@@ -121,6 +124,263 @@ def test_memoize_method():
     assert_not_equal(Joan.inc(j, 2), Joan.inc(j, 2))
     assert_equal(j.inc.__name__, "inc")
     assert_equal(j.inc.__doc__, "I am inc's docstr")
+    # the bound method is reused, and counts its calls
+    assert_true(j.inc is j.inc)
+    assert_equal((j.inc.hits, j.inc.misses, len(j.inc)), (2, 1, 1))
+    assert_equal(j.inc(1), 7)
+    assert_equal(j.inc(arg=1), 8)
+    assert_equal(j._cache.stats(), {'inc': (2, 3, 3)})
+    j.inc.forget(2)
+    assert_equal(len(j.inc), 2)
+    assert_equal(Joan().inc(2), 2)
+
+def _remove_cache(cachefile):
+    # removes a description cache along with its sqlite sidecar files
+    for path in (cachefile, cachefile + '-wal', cachefile + '-shm'):
+        if os.path.isfile(path):
+            os.remove(path)
+
+@unit
+def test_description_cache():
+    cachefile = os.path.join('build', 'desc-test.cache')
+    srcfile = os.path.join('build', 'desc_test.h')
+    _remove_cache(cachefile)
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    # an old-style pickled cache is replaced
+    with open(cachefile, 'wb') as f:
+        f.write(b'not a database')
+    with open(srcfile, 'w') as f:
+        f.write('int x;\n')
+    name = apiname('x', (srcfile,), 'dt', 'x', language='c')
+    cache = DescriptionCache(cachefile)
+    assert_equal(len(cache), 0)
+    assert_false(cache.isvalid(name, 'var'))
+    cache[name, 'var'] = {'name': 'x', 'type': 'int32'}
+    assert_true(cache.isvalid(name, 'var'))
+    # entries are committed as they are set
+    cache2 = DescriptionCache(cachefile)
+    assert_true((name, 'var') in cache2)
+    assert_equal(cache2[name, 'var'], {'name': 'x', 'type': 'int32'})
+    with open(srcfile, 'w') as f:
+        f.write('double x;\n')
+    assert_false(cache2.isvalid(name, 'var'))
+    del cache2[name, 'var']
+    assert_equal(len(cache2), 0)
+    cache.close()
+    cache2.close()
+    os.remove(srcfile)
+    _remove_cache(cachefile)
+
+@unit
+def test_description_cache_deps():
+    cachefile = os.path.join('build', 'desc-deps.cache')
+    hdrs = [os.path.join('build', 'desc_dep{0}.h'.format(i)) for i in range(3)]
+    _remove_cache(cachefile)
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    for hdr in hdrs:
+        with open(hdr, 'w') as f:
+            f.write('int x;\n')
+    x = apiname('x', (hdrs[0],), 'dt', 'x', language='c')
+    y = apiname('y', (hdrs[1],), 'dt', 'y', language='c')
+    cache = DescriptionCache(cachefile)
+    cache.store(x, 'var', {'name': 'x'}, deps=[hdrs[2]])
+    cache.store(y, 'var', {'name': 'y'})
+    cache.close()
+    # touching a file without changing it keeps the entries valid
+    st = os.stat(hdrs[2])
+    os.utime(hdrs[2], (st.st_atime, st.st_mtime + 10))
+    cache = DescriptionCache(cachefile)
+    assert_true(cache.isvalid(x, 'var'))
+    assert_true(cache.isvalid(y, 'var'))
+    cache.close()
+    # after which the refreshed stat information is enough
+    cache = DescriptionCache(cachefile)
+    assert_true(cache.isvalid(x, 'var'))
+    assert_equal(cache._hashes, {})
+    # editing an included header invalidates only its dependents
+    with open(hdrs[2], 'w') as f:
+        f.write('int x, y;\n')
+    cache.refresh()
+    assert_false(cache.isvalid(x, 'var'))
+    assert_true(cache.isvalid(y, 'var'))
+    cache.close()
+    for hdr in hdrs:
+        os.remove(hdr)
+    _remove_cache(cachefile)
+
+@unit
+def test_run_fingerprint():
+    fpfile = os.path.join('build', 'test.fingerprint')
+    inp = os.path.join('build', 'fp_input.h')
+    new = os.path.join('build', 'fp_new.h')
+    for path in (fpfile, new):
+        if os.path.isfile(path):
+            os.remove(path)
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    with open(inp, 'w') as f:
+        f.write('int x;\n')
+    key = {'plugins': ['xdress.autoall']}
+    fp = RunFingerprint(fpfile)
+    assert_equal(fp.check(key), "there is no record of a previous successful run")
+    fp.update(key, [inp, new])
+    fp = RunFingerprint(fpfile)
+    assert_true(fp.check(key) is None)
+    assert_equal(fp.check({'plugins': []}), "the plugins changed")
+    # touching is not a change
+    st = os.stat(inp)
+    os.utime(inp, (st.st_atime, st.st_mtime + 10))
+    assert_true(RunFingerprint(fpfile).check(key) is None)
+    with open(inp, 'w') as f:
+        f.write('int y;\n')
+    assert_equal(RunFingerprint(fpfile).check(key), inp + " changed")
+    os.remove(inp)
+    assert_equal(RunFingerprint(fpfile).check(key), inp + " was removed")
+    with open(new, 'w') as f:
+        f.write('int z;\n')
+    fp = RunFingerprint(fpfile)
+    fp.files.pop(inp)
+    assert_equal(fp.check(key), new + " was created")
+    os.remove(new)
+    os.remove(fpfile)
+
+@unit
+def test_run_fingerprint_new_sidecar():
+    fpfile = os.path.join('build', 'test-sc.fingerprint')
+    srcdir = os.path.join('build', 'fp_src')
+    src = os.path.join(srcdir, 'fp_sc.h')
+    sc = os.path.join(srcdir, 'fp_sc.py')
+    hdr = os.path.join(srcdir, 'fp_other.h')
+    for path in (fpfile, sc, hdr):
+        if os.path.isfile(path):
+            os.remove(path)
+    if not os.path.isdir(srcdir):
+        os.makedirs(srcdir)
+    with open(src, 'w') as f:
+        f.write('int x;\n')
+    rc = RunControl(classes=[ensure_apiname(('X', src))])
+    plugins = Plugins(['xdress.stlwrap'])
+    key = {'plugins': ['xdress.stlwrap']}
+    RunFingerprint(fpfile).update(key, _run_paths(rc, plugins, 'xdressrc.py'))
+    assert_true(RunFingerprint(fpfile).check(key) is None)
+    # a new sidecar must not be skipped
+    fp = RunFingerprint(fpfile)
+    assert_true(fp.files[sc] is None)
+    with open(sc, 'w') as f:
+        f.write('mod = {}\n')
+    assert_true(fp.check(key) is not None)
+    fp.files.pop(srcdir)
+    assert_equal(fp.check(key), sc + " was created")
+    rc = RunControl(classes=[ensure_apiname(('X', src))])
+    RunFingerprint(fpfile).update(key, _run_paths(rc, plugins, 'xdressrc.py'))
+    assert_true(RunFingerprint(fpfile).check(key) is None)
+    # nor may a new header which a source glob would match
+    with open(hdr, 'w') as f:
+        f.write('int y;\n')
+    assert_equal(RunFingerprint(fpfile).check(key), srcdir + " changed")
+    for path in (fpfile, src, sc, hdr):
+        os.remove(path)
+    os.rmdir(srcdir)
+
+@unit
+def test_generated_from():
+    out = os.path.join('build', 'gen_out.pyx')
+    if not os.path.isdir('build'):
+        os.mkdir('build')
+    with open(out, 'w') as f:
+        f.write('# generated\n')
+    inputs = digest({'name': 'mod'}, 42)
+    assert_equal(inputs, digest({'name': 'mod'}, 42))
+    assert_false(generated_from(('test', 'mod'), inputs, [out]))
+    note_generated(('test', 'mod'), inputs, [out])
+    assert_true(generated_from(('test', 'mod'), inputs, [out]))
+    assert_false(generated_from(('test', 'mod'), digest({'name': 'mod'}, 43), 
+                                [out]))
+    assert_false(generated_from(('test', 'mod'), None, [out]))
+    # generated files which were changed or removed must be regenerated
+    st = os.stat(out)
+    os.utime(out, (st.st_atime, st.st_mtime + 10))
+    assert_false(generated_from(('test', 'mod'), inputs, [out]))
+    note_generated(('test', 'mod'), inputs, [out])
+    os.remove(out)
+    assert_false(generated_from(('test', 'mod'), inputs, [out]))
+    assert_true(digest(lambda x: x) is None)
+
+@unit
+def test_generated_from_record():
+    out = os.path.join('build', 'gen_rec.pyx')
+    record = os.path.join('build', 'gen_rec.fingerprint')
+    for f in out, record:
+        if os.path.exists(f):
+            os.remove(f)
+    with open(out, 'w') as f:
+        f.write('# generated\n')
+    inputs = stabledigest({'name': 'mod'}, 42)
+    assert_false(generated_from(('test', 'mod'), inputs, [out], record))
+    note_generated(('test', 'mod'), inputs, [out], record)
+    assert_true(generated_from(('test', 'mod'), inputs, [out], record))
+    assert_false(os.path.exists(record))
+    dump_generated(record)
+    assert_true(os.path.exists(record))
+    # records are reloaded when the file is replaced, as by another process
+    os.remove(record)
+    assert_false(generated_from(('test', 'mod'), inputs, [out], record))
+    note_generated(('test', 'mod'), inputs, [out], record)
+    dump_generated(record)
+    from xdress import utils
+    utils._generated.pop(record)
+    assert_true(generated_from(('test', 'mod'), inputs, [out], record))
+    os.remove(out)
+    os.remove(record)
+
+@unit
+def test_output_manifest():
+    out = os.path.join('build', 'manifest_out', 'gen.pyx')
+    mfile = os.path.join('build', 'outputs.manifest.test')
+    for f in out, mfile:
+        if os.path.exists(f):
+            os.remove(f)
+    m = OutputManifest(mfile)
+    assert_true(m.write(u'x = 1\n', out))
+    assert_true(os.path.dirname(os.path.abspath(out)) in m.dirs)
+    st = os.stat(out)
+    assert_false(m.write(u'x = 1\n', out))
+    assert_false(m.write(b'x = 1\n', out))
+    assert_equal(os.stat(out).st_mtime, st.st_mtime)
+    m.dump()
+    # unchanged files are recognized by a fresh manifest without reading them,
+    # files which would be read look missing here
+    m = OutputManifest(mfile)
+    m._stathash = lambda path, h=None: None if h is None else \
+        OutputManifest._stathash(m, path, h)
+    assert_false(m.write(u'x = 1\n', out))
+    del m._stathash
+    # files changed by others are read back and rewritten
+    with open(out, 'w') as f:
+        f.write('x = 2\n')
+    os.utime(out, (st.st_atime, st.st_mtime + 10))
+    assert_true(m.write(u'x = 1\n', out))
+    with open(out) as f:
+        assert_equal(f.read(), 'x = 1\n')
+    # without a manifest entry, identical contents are still not rewritten
+    assert_false(OutputManifest().write(u'x = 1\n', out))
+    assert_false(newoverwrite(u'x = 1\n', out))
+    os.remove(out)
+    os.remove(mfile)
+    os.rmdir(os.path.dirname(out))
+
+@unit
+def test_stabledigest():
+    # independent of the insertion order of dicts and sets
+    x = {'a': set(['x', 'y', ('z', 0)]), 'b': [1, 2.0, None]}
+    y = {'b': [1, 2.0, None], 'a': set([('z', 0), 'y', 'x'])}
+    assert_equal(stabledigest(x), stabledigest(y))
+    assert_not_equal(stabledigest(x), stabledigest(x, 1))
+    assert_not_equal(stabledigest([1, 2]), stabledigest((1, 2)))
+    assert_true(stabledigest(lambda x: x) is None)
+    assert_true(stabledigest(object()) is None)
 
 def check_ensure_apiname(x, exp):
     obs = ensure_apiname(x)
@@ -9,16 +9,21 @@ AST Parsers API
 from __future__ import print_function
 import os
 import io
+import re
 import sys
+import time
 from copy import deepcopy
 import linecache
+import argparse
 import subprocess
 import itertools
 import tempfile
 import functools
 import collections
+import weakref
 from pprint import pprint, pformat
 from warnings import warn
+from hashlib import md5
 import gzip
 try:
     import cPickle as pickle
@@ -61,40 +66,108 @@ except ImportError:
     pycparser = None
     PycparserNodeVisitor = object  # fake this for class definitions
 
-# clang conditional imports
+# clang conditional imports, libclang itself is only loaded once clang is probed
 try:
     from . import clang
     from .clang import cindex
-    # Make sure we use our own version of libclang.so
-    from .clang import libclang
-    cindex.Config.set_library_file(libclang.__file__)
 except ImportError:
-    clang = None
+    clang = cindex = None
 
 from . import utils
 from .utils import guess_language, RunControl, NotSpecified, ensuredirs
 from .plugins import Plugin
 
-PARSERS_AVAILABLE = {
-    'clang': clang is not None,
-    'pycparser': pycparser is not None,
-    }
-with tempfile.NamedTemporaryFile() as f:
-    # If gccxml is not availble, an OSError is raised.  Otherwise, it will
-    # return 0 (typically indicates successful invocation).
-    try:
-        retcode = subprocess.call(['gccxml'], stdout=f, stderr=f)
-        if retcode == 0:
-            PARSERS_AVAILABLE['gccxml'] = True
-        else:
-            PARSERS_AVAILABLE['gccxml'] = False
-    except OSError:
-        PARSERS_AVAILABLE['gccxml'] = False
-del f
-
 if sys.version_info[0] >= 3:
     basestring = str
 
+#
+# Parser availability
+#
+
+def _which(exe):
+    """Finds the full path to an executable on the PATH, or None."""
+    exts = ('', '.exe') if os.name == 'nt' else ('',)
+    for d in os.environ.get('PATH', '').split(os.pathsep):
+        for ext in exts:
+            path = os.path.join(d, exe + ext)
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
+    return None
+
+def _probe_pycparser(builddir=None):
+    return pycparser is not None
+
+def _probe_clang(builddir=None):
+    if cindex is None:
+        return False
+    try:
+        # Make sure we use our own version of libclang.so
+        from .clang import libclang
+    except ImportError:
+        return False
+    if not cindex.Config.loaded:
+        cindex.Config.set_library_file(libclang.__file__)
+    return True
+
+def _probe_gccxml(builddir=None):
+    exe = _which('gccxml')
+    if exe is None:
+        return False
+    key = ('gccxml', exe, os.path.getmtime(exe))
+    cachefile = None if builddir is None else \
+                os.path.join(builddir, 'parsers.cache')
+    probes = {}
+    if cachefile is not None and os.path.isfile(cachefile):
+        try:
+            with io.open(cachefile, 'rb') as f:
+                probes = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError, ValueError):
+            probes = {}  # a truncated cache is the same as no cache
+        if key in probes:
+            return probes[key]
+    with tempfile.TemporaryFile() as f:
+        # If gccxml is not availble, an OSError is raised.  Otherwise, it will
+        # return 0 (typically indicates successful invocation).
+        try:
+            avail = subprocess.call([exe], stdout=f, stderr=f) == 0
+        except OSError:
+            avail = False
+    if cachefile is not None:
+        probes[key] = avail
+        ensuredirs(cachefile)
+        tmpfile = '{0}.{1}.tmp'.format(cachefile, os.getpid())
+        with io.open(tmpfile, 'wb') as f:
+            pickle.dump(probes, f, pickle.HIGHEST_PROTOCOL)
+        _rename(tmpfile, cachefile)
+    return avail
+
+_parser_probes = {'clang': _probe_clang, 'gccxml': _probe_gccxml,
+                  'pycparser': _probe_pycparser}
+
+class ParsersAvailable(dict):
+    """A mapping from parser names to whether or not they are available.  Parsers
+    are probed lazily the first time that they are looked up, so that importing
+    this module neither runs gccxml nor loads libclang.  When builddir is set,
+    the result of running an external parser executable is cached there per
+    executable path and modification time.
+    """
+
+    def __init__(self, builddir=None):
+        super(ParsersAvailable, self).__init__()
+        self.builddir = builddir
+
+    def __missing__(self, key):
+        if key not in _parser_probes:
+            raise KeyError(key)
+        avail = self[key] = _parser_probes[key](self.builddir)
+        return avail
+
+    def probe_all(self):
+        """Probes every known parser and returns a plain dict of the results."""
+        return dict([(p, self[p]) for p in sorted(_parser_probes)])
+
+PARSERS_AVAILABLE = ParsersAvailable()
+
 def _makekey(obj):
     if isinstance(obj, basestring):
         return obj
@@ -107,25 +180,146 @@ def _makekey(obj):
     else:
         return obj
 
+PARSER_CACHE_SIZE = 2**31
+"""The approximate maximum number of bytes of memory that the parsed ASTs held
+in memory may occupy before the least recently used ones are evicted."""
+
+AST_NODE_NBYTES = 512
+"""Rough estimate of the memory used per node of an in-memory AST, in bytes."""
+
+def _ast_nbytes(ast):
+    """Roughly estimates the memory used by a parsed AST, in bytes."""
+    if hasattr(ast, 'getroot'):
+        # element trees
+        return AST_NODE_NBYTES * sum([1 for _ in ast.getroot().iter()])
+    if cindex is not None and isinstance(ast, cindex.TranslationUnit):
+        # the in-memory AST is about an order of magnitude larger than the source
+        files = [ast.spelling] + [inc.include.name for inc in ast.get_includes()]
+        return 10 * sum([os.path.getsize(f) for f in set(files) if os.path.isfile(f)])
+    if pycparser is not None and isinstance(ast, pycparser.c_ast.Node):
+        n = 0
+        stack = [ast]
+        while 0 < len(stack):
+            node = stack.pop()
+            n += 1
+            stack.extend([child for _, child in node.children()])
+        return AST_NODE_NBYTES * n
+    return sys.getsizeof(ast)
+
+class ParserMemo(object):
+    """An in-memory, least recently used cache for parsed ASTs.  The memory used
+    by each AST is estimated when it is stored, and the least recently used ASTs
+    are evicted once the total exceeds maxsize.  Hits, misses, and evictions are
+    counted.
+    """
+
+    def __init__(self, maxsize=None):
+        """Parameters
+        -------------
+        maxsize : int or None, optional
+            Maximum total estimated size of the ASTs, in bytes.  If None, the
+            current value of PARSER_CACHE_SIZE is used.
+
+        """
+        self.maxsize = maxsize
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (ast, nbytes, deps), oldest first
+        self._d = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._d)
+
+    def __contains__(self, key):
+        return key in self._d
+
+    def lookup(self, key):
+        """Returns a (found, ast) tuple, marking the entry as recently used."""
+        if key not in self._d:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        entry = self._d.pop(key)
+        self._d[key] = entry
+        return True, entry[0]
+
+    def store(self, key, ast, nbytes=None, deps=()):
+        """Adds an AST to the cache and evicts old ones if needed.  The stat
+        information of the files in deps is remembered, see invalidate()."""
+        if key in self._d:
+            self.nbytes -= self._d.pop(key)[1]
+        nbytes = _ast_nbytes(ast) if nbytes is None else nbytes
+        deps = tuple([(p, _statkey(p)) for p in deps])
+        self._d[key] = (ast, nbytes, deps)
+        self.nbytes += nbytes
+        self.evict()
+
+    def invalidate(self):
+        """Removes the ASTs for which the stat information of any of the files
+        they were parsed from has changed since they were stored.  Returns the
+        number of ASTs that were removed."""
+        stale = [key for key, (_, _, deps) in self._d.items() \
+                 if any([_statkey(p) != st for p, st in deps])]
+        for key in stale:
+            self.nbytes -= self._d.pop(key)[1]
+        return len(stale)
+
+    def evict(self):
+        """Removes least recently used ASTs until the cache fits in maxsize.  The
+        most recently used AST is always kept."""
+        maxsize = PARSER_CACHE_SIZE if self.maxsize is None else self.maxsize
+        while self.nbytes > maxsize and 1 < len(self._d):
+            key = next(iter(self._d))
+            self.nbytes -= self._d.pop(key)[1]
+            self.evictions += 1
+
+    def clear(self):
+        """Removes all ASTs from the cache."""
+        self._d.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        """Returns a dictionary of cache statistics."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._d),
+                'nbytes': self.nbytes}
+
+def _statkey(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+_parser_memo = ParserMemo()
+
 def _memoize_parser(f):
     # based off code from http://wiki.python.org/moin/PythonDecoratorLibrary
-    cache = f.cache = {}
     @functools.wraps(f)
     def memoizer(*args, **kwargs):
-        key = _makekey(args) + _makekey(kwargs)
-        if key in cache:
-            value = cache[key]
-        else:
+        key = (f.__name__,) + _makekey(args) + _makekey(kwargs)
+        try:
+            found, value = _parser_memo.lookup(key)
+        except TypeError:
+            return f(*args, **kwargs)
+        if not found:
             value = f(*args, **kwargs)
-            try:
-                cache[key] = value
-            except TypeError:
-                pass
+            filename = args[0] if 0 < len(args) else kwargs.get('filename', None)
+            deps = parse_deps(filename) or (filename,)
+            _parser_memo.store(key, value, deps=deps)
         return value
     return memoizer
 
+def parser_cache_stats():
+    """Returns the hit, miss, and eviction counts as well as the current number
+    of entries and estimated size of the in-memory parser cache."""
+    return _parser_memo.stats()
+
 def clearmemo():
     """Clears all function memoizations for autodescribers."""
+    _parser_memo.clear()
     for x in globals().values():
         if callable(x) and hasattr(x, 'cache'):
             x.cache.clear()
@@ -143,15 +337,489 @@ def not_implemented(obj):
         raise NotImplementedError(msg)
     return func
 
+#
+# Persisted parser caches
+#
+
+GCCXML_CACHE_SIZE = 2**30
+"""The maximum number of bytes that the on-disk GCC-XML parse cache may occupy
+before the least recently used entries are evicted."""
+
+PYCPARSER_CACHE_SIZE = 2**30
+"""The maximum number of bytes that the on-disk cache of pickled pycparser ASTs
+may occupy before the least recently used entries are evicted."""
+
+CLANG_CACHE_SIZE = 2**30
+"""The maximum number of bytes that the on-disk cache of saved clang translation
+units may occupy before the least recently used entries are evicted."""
+
+CLANG_PREFIX_HEADER = None
+"""Path to a header that includes the headers common to all sources, or None.
+If given, this is compiled once into a precompiled header which every clang
+parse then uses as its preamble."""
+
+GCCXML_STREAM_SIZE = None
+"""GCC-XML outputs of at least this many bytes are read in streaming mode when
+the caller only needs the declarations from some files: only the elements that
+are reachable from those files are kept in memory.  None disables streaming."""
+
+def _md5(s):
+    return md5(s.encode()).hexdigest()
+
+def _rename(src, dst):
+    """Moves src onto dst, replacing dst if it already exists."""
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+class ParseCache(object):
+    """A content-addressed, persistent cache for the files that external parsers
+    produce.  Entries are looked up by the full command line used to run the parser
+    and are only valid if the hashes of every file that went into the translation
+    unit (the file itself and all of its transitive includes) still match.  Hashes
+    are only recomputed for files whose (mtime, size) has changed, so a hit usually
+    costs nothing more than a stat() call per dependency.  When the total size of
+    the cached files exceeds maxsize, the least recently used entries are evicted.
+    """
+
+    def __init__(self, cachedir, maxsize=GCCXML_CACHE_SIZE, ext='.xml'):
+        """Parameters
+        -------------
+        cachedir : str
+            Directory to store the cached files and index in.
+        maxsize : int, optional
+            Maximum total size of the cached files, in bytes.
+        ext : str, optional
+            File extension for cached files.
+
+        """
+        self.cachedir = cachedir
+        self.maxsize = maxsize
+        self.ext = ext
+        self.indexfile = os.path.join(cachedir, 'index.pkl')
+        self.files = {}  # path -> (mtime, size, hash)
+        self.entries = {}  # command key -> list of entry dicts, most recent first
+        self.dirty = False  # whether hits have changed the index since a dump
+        if os.path.isfile(self.indexfile):
+            with io.open(self.indexfile, 'rb') as f:
+                index = pickle.load(f)
+            self.files = index['files']
+            self.entries = index['entries']
+
+    def merge(self):
+        """Adopts entries which other processes have written to the on-disk
+        index since it was loaded, so that concurrent parsers do not drop
+        each other's entries."""
+        if not os.path.isfile(self.indexfile):
+            return
+        with io.open(self.indexfile, 'rb') as f:
+            index = pickle.load(f)
+        for ck, es in index['entries'].items():
+            mine = self.entries.setdefault(ck, [])
+            keys = set([e['key'] for e in mine])
+            for e in es:
+                if e['key'] not in keys and os.path.isfile(self.path(e['key'])):
+                    mine.append(e)
+                    for p, _ in e['deps']:
+                        if p not in self.files and p in index['files']:
+                            self.files[p] = index['files'][p]
+            if 0 == len(mine):
+                del self.entries[ck]
+
+    def filehash(self, path):
+        """Returns the md5 hash of a file's contents, or None if it does not
+        exist.  The file is only read if its stat information has changed since
+        the hash was last computed."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stkey = (st.st_mtime, st.st_size)
+        rec = self.files.get(path, None)
+        if rec is not None and rec[:2] == stkey:
+            return rec[2]
+        with io.open(path, 'rb') as f:
+            h = md5(f.read()).hexdigest()
+        self.files[path] = stkey + (h,)
+        return h
+
+    def cmdkey(self, cmd):
+        """Computes the key for a parser command line."""
+        return _md5("\0".join(cmd))
+
+    def path(self, key):
+        """The path to the cached file for a content key."""
+        return os.path.join(self.cachedir, key + self.ext)
+
+    def lookup(self, cmd):
+        """Returns the path to the cached output of a parser command line if
+        there is a valid entry for it, and None otherwise."""
+        for entry in self.entries.get(self.cmdkey(cmd), ()):
+            deps = entry['deps']
+            if any(self.filehash(p) != h for p, h in deps):
+                continue
+            path = self.path(entry['key'])
+            if not os.path.isfile(path):
+                continue
+            # the access time is written out with the next store or flush
+            entry['atime'] = time.time()
+            self.dirty = True
+            return path
+        return None
+
+    def entry_deps(self, path):
+        """Returns the paths of the files that a cached file depends on, or an
+        empty tuple if the file is not in the cache."""
+        for es in self.entries.values():
+            for e in es:
+                if self.path(e['key']) == path:
+                    return tuple([p for p, _ in e['deps']])
+        return ()
+
+    def store(self, cmd, filename, deps):
+        """Moves a freshly generated parser output file into the cache.
+
+        Parameters
+        ----------
+        cmd : list of str
+            The command line that produced the file.
+        filename : str
+            Path to the parser output.
+        deps : sequence of str
+            Paths to all files that the output depends on.
+
+        Returns
+        -------
+        path : str
+            The location of the file in the cache.
+
+        """
+        ck = self.cmdkey(cmd)
+        deps = sorted(set(deps))
+        deps = tuple((p, self.filehash(p)) for p in deps)
+        key = _md5(ck + "".join([p + "\0" + (h or '') for p, h in deps]))
+        path = self.path(key)
+        ensuredirs(path)
+        _rename(filename, path)
+        entry = {'key': key, 'deps': deps, 'nbytes': os.path.getsize(path),
+                 'atime': time.time()}
+        self.merge()
+        entries = [e for e in self.entries.get(ck, ()) if e['key'] != key]
+        self.entries[ck] = [entry] + entries
+        self.evict()
+        self.dump()
+        return path
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in maxsize."""
+        allentries = [(e['atime'], ck, e) for ck, es in self.entries.items()
+                                          for e in es]
+        total = sum([e['nbytes'] for _, _, e in allentries])
+        if total <= self.maxsize:
+            return
+        allentries.sort(key=lambda x: x[0])
+        for _, ck, e in allentries[:-1]:
+            if total <= self.maxsize:
+                break
+            self.entries[ck].remove(e)
+            if 0 == len(self.entries[ck]):
+                del self.entries[ck]
+            path = self.path(e['key'])
+            if os.path.isfile(path):
+                os.remove(path)
+            total -= e['nbytes']
+        # forget about files that no entry depends on any more
+        live = set([p for es in self.entries.values() for e in es
+                      for p, _ in e['deps']])
+        for p in set(self.files) - live:
+            del self.files[p]
+
+    def dump(self):
+        """Atomically writes the cache index out to the filesystem."""
+        ensuredirs(self.indexfile)
+        tmpfile = '{0}.{1}.tmp'.format(self.indexfile, os.getpid())
+        with io.open(tmpfile, 'wb') as f:
+            pickle.dump({'files': self.files, 'entries': self.entries}, f,
+                        pickle.HIGHEST_PROTOCOL)
+        _rename(tmpfile, self.indexfile)
+        self.dirty = False
+
+    def flush(self):
+        """Writes out the access times and file hashes updated by lookups since
+        the index was last written, if any."""
+        if not self.dirty:
+            return
+        self.merge()
+        self.dump()
+
+_parse_caches = {}
+
+def _parse_cache(builddir, parser, ext, maxsize):
+    key = (builddir, parser)
+    if key not in _parse_caches:
+        _parse_caches[key] = ParseCache(os.path.join(builddir, parser), ext=ext)
+    cache = _parse_caches[key]
+    cache.maxsize = maxsize
+    return cache
+
+def flush_parse_caches():
+    """Writes out the indexes of all of the parse caches in use."""
+    for cache in _parse_caches.values():
+        cache.flush()
+
+_parse_deps = {}
+
+def parse_deps(filename):
+    """Returns the files that the last parse of a file depended on, as reported
+    by the parser: the file itself and all of its transitive includes.  This is
+    an empty tuple if the file has not been parsed or the parser does not report
+    its includes."""
+    return _parse_deps.get(filename, ())
+
+def gccxml_cache(builddir='build'):
+    """Returns the GCC-XML parse cache living in a build directory."""
+    return _parse_cache(builddir, 'gccxml', '.xml', GCCXML_CACHE_SIZE)
+
+def pycparser_cache(builddir='build'):
+    """Returns the cache of pickled pycparser ASTs living in a build directory."""
+    return _parse_cache(builddir, 'pycparser', '.pkl.gz', PYCPARSER_CACHE_SIZE)
+
+def clang_cache(builddir='build'):
+    """Returns the cache of saved clang translation units living in a build
+    directory."""
+    return _parse_cache(builddir, 'clang', '.ast', CLANG_CACHE_SIZE)
+
+def _tmp_filename(filename, cachedir, ext):
+    # a process-unique name in the cache directory to write parser output to
+    drive, name = os.path.splitdrive(filename)
+    if len(drive) > 0:
+        # Windows drive handling, 'C:' -> 'C_'
+        name = drive.replace(':', '_') + name
+    name = name.replace(os.path.sep, '_').rsplit('.', 1)[0]
+    name = '{0}.{1}{2}.tmp'.format(name, os.getpid(), ext)
+    name = os.path.join(cachedir, name)
+    ensuredirs(name)
+    return name
+
 #
 # GCC-XML Describers
 #
 
-@_memoize_parser
+def _gccxml_etree(xmlname, onlyin=None):
+    try:
+        if onlyin is not None and GCCXML_STREAM_SIZE is not None and \
+           os.path.getsize(xmlname) >= GCCXML_STREAM_SIZE:
+            root = _gccxml_iterparse(xmlname, onlyin)
+        else:
+            root = etree.parse(xmlname)
+    except etree.XMLSyntaxError:
+        raise etree.XMLSyntaxError("failed to parse GCC-XML results, this likely "
+                                   "means that the C/C++ code is not valid. please "
+                                   "see the top most build error.")
+    return root
+
+# Attributes whose values never refer to other elements.
+_GCCXML_NONREFS = frozenset(['id', 'name', 'file', 'line', 'location', 'mangled',
+                             'demangled', 'init', 'default', 'access', 'size',
+                             'align', 'offset', 'artificial', 'extern', 'const',
+                             'static', 'virtual', 'pure_virtual', 'explicit',
+                             'inline', 'incomplete', 'abstract', 'max', 'min'])
+
+def _gccxml_refs(elem, refs):
+    # adds the ids referred to by an element and its children to refs
+    for key, value in elem.attrib.items():
+        if key in _GCCXML_NONREFS:
+            continue
+        if key == 'members' and elem.tag == 'Namespace':
+            # following namespace members would pull in every declaration
+            continue
+        for token in value.split():
+            # base lists may be prefixed with the access, 'private:_12'
+            token = token.rsplit(':', 1)[-1]
+            if token.startswith('_'):
+                refs.append(token)
+    for child in elem:
+        _gccxml_refs(child, refs)
+
+_gccxml_word = re.compile(r'\w+')
+
+def _gccxml_targ_names(elem, targnames):
+    # adds the names which the describers look up from the template arguments
+    # in the name of an element to targnames
+    for key in ('name', 'demangled'):
+        value = elem.attrib.get(key, '')
+        if '<' not in value:
+            continue
+        for targ in utils.split_template_args(value):
+            targnames.append(targ)
+            targnames.extend(_gccxml_word.findall(targ))
+
+def _gccxml_iterparse(xmlname, onlyin):
+    """Reads a GCC-XML file keeping only the elements that are reachable from
+    declarations in the onlyin files, along with all File elements.  This takes
+    two streaming passes over the file.  The first records the compact reference
+    graph, the second builds the pruned tree, discarding everything else as it
+    streams past.  Besides the id references, an element with template arguments
+    in its name also reaches the elements with those names, since describers
+    look the arguments up by name.
+
+    Parameters
+    ----------
+    xmlname : str
+        Path to the GCC-XML output.
+    onlyin : set of str
+        File names whose declarations (and what they refer to) should be kept.
+
+    Returns
+    -------
+    root : XML etree
+        The pruned tree, which has the same layout as the full tree.
+    """
+    # first pass: the reference graph
+    graph = {}
+    fileids = {}
+    infile = {}
+    names = {}  # name -> ids of the top-level elements with or containing it
+    targrefs = {}  # id -> names of template arguments
+    depth = 0
+    for event, elem in etree.iterparse(xmlname, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        attrib = elem.attrib
+        id = attrib.get('id', None)
+        if elem.tag == 'File':
+            fileids[attrib.get('name', None)] = id
+        elif id is not None:
+            refs = []
+            _gccxml_refs(elem, refs)
+            graph[id] = tuple(refs)
+            if 'file' in attrib:
+                infile.setdefault(attrib['file'], []).append(id)
+            for e in elem.iter():
+                if 'name' in e.attrib:
+                    names.setdefault(e.attrib['name'], []).append(id)
+            targnames = []
+            _gccxml_targ_names(elem, targnames)
+            if 0 < len(targnames):
+                targrefs[id] = tuple(targnames)
+        elem.clear()
+    # reachable set
+    stack = []
+    for fname in onlyin:
+        fid = fileids.get(fname, None) or fileids.get('./' + fname, None)
+        stack.extend(infile.get(fid, ()))
+    keep = set()
+    while len(stack) > 0:
+        id = stack.pop()
+        if id in keep:
+            continue
+        keep.add(id)
+        stack.extend(graph.get(id, ()))
+        for name in targrefs.get(id, ()):
+            stack.extend(names.get(name, ()))
+    del graph, infile, names, targrefs
+    # second pass: the pruned tree
+    root = None
+    depth = 0
+    for event, elem in etree.iterparse(xmlname, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1 and elem.tag != 'File' and elem.attrib.get('id') not in keep:
+            elem.clear()
+            root.remove(elem)
+    return etree.ElementTree(root)
+
+class GccxmlIndex(object):
+    """Lookup tables for a GCC-XML element tree, so that finding elements by id,
+    name, or file does not require scanning the whole tree.  GCC-XML output is
+    flat: every declaration is a direct child of the root, and only arguments
+    and enumeration values are nested.
+    """
+
+    def __init__(self, root):
+        """Parameters
+        -------------
+        root : element tree or element
+            The GCC-XML tree to index.
+
+        """
+        top = root.getroot() if hasattr(root, 'getroot') else root
+        self.ids = {}  # id -> element
+        self.names = {}  # name -> all elements with this name, in document order
+        self.tags = {}  # tag -> top-level elements, in document order
+        self.tagnames = {}  # (tag, name) -> top-level elements, in document order
+        self.files = {}  # file name -> file id
+        self.filenames = {}  # file id -> file name
+        for elem in top.iter():
+            if elem is top:
+                continue
+            attrib = elem.attrib
+            if 'id' in attrib:
+                self.ids[attrib['id']] = elem
+            if 'name' in attrib:
+                self.names.setdefault(attrib['name'], []).append(elem)
+        for elem in top:
+            tag = elem.tag
+            name = elem.attrib.get('name', None)
+            self.tags.setdefault(tag, []).append(elem)
+            self.tagnames.setdefault((tag, name), []).append(elem)
+            if tag == 'File':
+                self.files[name] = elem.attrib['id']
+                self.filenames[elem.attrib['id']] = name
+
+    def find_id(self, id):
+        """Returns the element with the given id, or None."""
+        return self.ids.get(id, None)
+
+    def find_name(self, name):
+        """Returns the first element anywhere in the tree with the given name,
+        or None."""
+        elems = self.names.get(name, None)
+        return None if elems is None else elems[0]
+
+    def iter_tag(self, tag, name=None):
+        """Returns the top-level elements with a given tag, and optionally name."""
+        if name is None:
+            return self.tags.get(tag, ())
+        return self.tagnames.get((tag, name), ())
+
+    def find_tag(self, tag, name):
+        """Returns the first top-level element with a given tag and name, or None."""
+        elems = self.tagnames.get((tag, name), None)
+        return None if elems is None else elems[0]
+
+_gccxml_indexes = weakref.WeakKeyDictionary()
+_gccxml_last_index = [None, None]
+
+def gccxml_index(root):
+    """Returns the index of a GCC-XML element tree, building it the first time
+    the tree is seen.  The index is dropped along with the tree."""
+    try:
+        index = _gccxml_indexes.get(root, None)
+    except TypeError:
+        # some element trees do not support weak references, so just keep
+        # the most recently used index alive with its tree.
+        if _gccxml_last_index[0] is not root:
+            _gccxml_last_index[:] = [root, GccxmlIndex(root)]
+        return _gccxml_last_index[1]
+    if index is None:
+        index = _gccxml_indexes[root] = GccxmlIndex(root)
+    return index
+
 def gccxml_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
                  extra_parser_args=(), verbose=False, debug=False, builddir='build',
-                 clang_includes=()):
+                 clang_includes=(), onlyin=None):
     """Use GCC-XML to parse a file. This function is automatically memoized.
+    The results are also persisted in a content-addressed cache in the build
+    directory, see ``ParseCache``.
 
     Parameters
     ----------
@@ -172,39 +840,61 @@ def gccxml_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
     builddir : str, optional
         Location of -- often temporary -- build files.
     clang_includes : ignored
+    onlyin : tuple of str, optional
+        The files whose declarations are of interest.  If given and the output
+        is at least GCCXML_STREAM_SIZE bytes, only the elements reachable from
+        these files are kept.
 
     Returns
     -------
     root : XML etree
         An in memory tree representing the parsed file.
     """
-    drive, xmlname = os.path.splitdrive(filename)
-    if len(drive) > 0:
-        # Windows drive handling, 'C:' -> 'C_'
-        xmlname = drive.replace(':', '_') + xmlname
-    xmlname = xmlname.replace(os.path.sep, '_').rsplit('.', 1)[0] + '.xml'
-    xmlname = os.path.join(builddir, xmlname)
-    cmd = ['gccxml', filename, '-fxml=' + xmlname]
+    # onlyin only matters, and so is only part of the memo key, when streaming
+    if GCCXML_STREAM_SIZE is None or onlyin is None:
+        onlyin = None
+    else:
+        onlyin = tuple(sorted(onlyin))
+    return _gccxml_parse(filename, includes=includes, defines=defines,
+                         undefines=undefines, extra_parser_args=extra_parser_args,
+                         verbose=verbose, debug=debug, builddir=builddir,
+                         onlyin=onlyin)
+
+@_memoize_parser
+def _gccxml_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
+                  extra_parser_args=(), verbose=False, debug=False,
+                  builddir='build', onlyin=None):
+    cmd = ['gccxml', filename]
     cmd += ['-I' + i for i in includes]
     cmd += ['-D' + d for d in defines]
     cmd += ['-U' + u for u in undefines]
     cmd += extra_parser_args
+    cache = gccxml_cache(builddir)
+    xmlname = cache.lookup(cmd)
+    if xmlname is not None:
+        if verbose:
+            print("gccxml: using cached {0} for {1}".format(xmlname, filename))
+        _parse_deps[filename] = cache.entry_deps(xmlname)
+        return _gccxml_etree(xmlname, onlyin)
+    xmlname = _tmp_filename(filename, cache.cachedir, '.xml')
+    xmlcmd = cmd + ['-fxml=' + xmlname]
     if verbose:
-        print(" ".join(cmd))
-    if os.path.isfile(xmlname):
-        f = io.open(xmlname, 'r+b')
-    else:
-        ensuredirs(xmlname)
-        f = io.open(xmlname, 'w+b')
-        subprocess.call(cmd)
-    f.seek(0)
-    try:
-        root = etree.parse(f)
-    except etree.XMLSyntaxError:
-        raise etree.XMLSyntaxError("failed to parse GCC-XML results, this likely "
-                                   "means that the C/C++ code is not valid. please "
-                                   "see the top most build error.")
-    f.close()
+        print(" ".join(xmlcmd))
+    status = subprocess.call(xmlcmd)
+    if status != 0:
+        if os.path.isfile(xmlname):
+            os.remove(xmlname)
+        raise RuntimeError("gccxml failed with exit status {0} while parsing {1}, "
+                           "please see the build errors above.".format(status,
+                           filename))
+    root = _gccxml_etree(xmlname, onlyin)
+    # GCC-XML lists every file that went into the translation unit, which makes
+    # up the transitive include set that the cache entry depends on.  File
+    # elements are always kept by the streaming mode.
+    deps = [filename] + [f.attrib['name'] for f in root.iterfind('File')]
+    deps = [d for d in deps if os.path.isfile(d)]
+    _parse_deps[filename] = tuple(sorted(set(deps)))
+    cache.store(cmd, xmlname, deps)
     return root
 
 #
@@ -214,7 +904,9 @@ def gccxml_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
 def clang_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
                 extra_parser_args=(), verbose=False, debug=False, builddir='build',
                 language='c++', clang_includes=()):
-    """Use clang to parse a file.
+    """Use clang to parse a file.  This function is automatically memoized.
+    The translation units are also saved to a content-addressed cache in the
+    build directory and reloaded from there on later calls, see ``ParseCache``.
 
     Parameters
     ----------
@@ -233,7 +925,7 @@ def clang_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
     debug : bool, optional
         Flag to enable/disable debug mode.  Currently ignored.
     builddir : str, optional
-        Ignored.  Exists only for compatibility with gccxml_describe.
+        Location of -- often temporary -- build files.
     language : str
         Valid language flag.
     clang_includes : list of str, optional
@@ -243,14 +935,48 @@ def clang_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
     -------
     tu : libclang TranslationUnit object
     """
+    if not PARSERS_AVAILABLE['clang']:
+        raise RuntimeError("clang is not available")
     index = cindex.Index.create()
     options = cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
-    tu = index.parse(filename, options=options,
-                     args=['-x', language]
-                        + ['-I' + i for i in tuple(clang_includes) + tuple(includes)]
-                        + ['-D' + d for d in defines]
-                        + ['-U' + u for u in undefines]
-                        + list(extra_parser_args))
+    args = ['-I' + i for i in tuple(clang_includes) + tuple(includes)] \
+         + ['-D' + d for d in defines] \
+         + ['-U' + u for u in undefines] \
+         + list(extra_parser_args)
+    if CLANG_PREFIX_HEADER is not None:
+        pch = clang_pch(CLANG_PREFIX_HEADER, language, args, builddir=builddir,
+                        verbose=verbose)
+        args = ['-include-pch', pch] + args
+    args = ['-x', language] + args
+    cmd = [cindex.Config.library_file or 'clang', filename, str(options)] + args
+    cache = clang_cache(builddir)
+    astname = cache.lookup(cmd)
+    if astname is not None:
+        try:
+            tu = cindex.TranslationUnit.from_ast_file(astname, index=index)
+        except cindex.TranslationUnitLoadError:
+            tu = None
+        if tu is not None:
+            if verbose:
+                print("clang: using cached {0} for {1}".format(astname, filename))
+            _parse_deps[filename] = cache.entry_deps(astname)
+            return tu
+    tu = index.parse(filename, options=options, args=args)
+    _clang_check(tu, filename)
+    deps = [filename] + [inc.include.name for inc in tu.get_includes()]
+    deps = [d for d in deps if os.path.isfile(d)]
+    _parse_deps[filename] = tuple(sorted(set(deps)))
+    astname = _tmp_filename(filename, cache.cachedir, '.ast')
+    try:
+        tu.save(astname)
+    except cindex.TranslationUnitSaveError:
+        if os.path.isfile(astname):
+            os.remove(astname)
+        return tu
+    cache.store(cmd, astname, deps)
+    return tu
+
+def _clang_check(tu, filename):
     # Check for fatal errors
     failed = False
     for d in tu.diagnostics:
@@ -259,7 +985,141 @@ def clang_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
             failed = True
     if failed:
         raise RuntimeError('failed to parse {0}'.format(filename))
-    return tu
+
+class ClangIndex(object):
+    """Symbol table for a clang translation unit, built in one traversal of the
+    top-level scope and of all namespaces.  Declarations are indexed by their
+    spelling and cursor kind, and template specializations by their canonical
+    argument tuples, so that finding API elements does not walk the translation
+    unit again for each one.
+    """
+
+    def __init__(self, tu):
+        """Parameters
+        -------------
+        tu : clang translation unit
+            The translation unit to index.
+
+        """
+        self.tu = tu
+        # (name, kind) -> [(scope number, source order, top-level namespace
+        #                   name or None, scope file or None, cursor, file)]
+        self.decls = {}
+        self._nscopes = 0
+        self._ndecls = 0
+        self._specs = {}
+        self._scan(tu.cursor, 0, None, None)
+
+    def _scan(self, scope, nscope, scopename, scopefile):
+        namespace_kind = cindex.CursorKind.NAMESPACE
+        decls = self.decls
+        for c in scope.get_children():
+            f = c.location.file
+            fname = None if f is None else f.name
+            self._ndecls += 1
+            key = (c.spelling, c.kind)
+            decls.setdefault(key, []).append((nscope, self._ndecls, scopename,
+                                              scopefile, c, fname))
+            if c.kind == namespace_kind:
+                # scopes are numbered in preorder
+                self._nscopes += 1
+                name = c.spelling if nscope == 0 else None
+                self._scan(c, self._nscopes, name, fname)
+
+    def find(self, name, kinds, onlyin=None, namespace=None):
+        """Finds all declarations of a name and one of the cursor kinds.  With a
+        namespace only the top-level namespaces of that name are searched,
+        otherwise the whole translation unit is.  Scopes and declarations must
+        come from the onlyin files, if given.  The declarations are returned in
+        reverse scope order and in source order within a scope.
+        """
+        found = []
+        for kind in kinds:
+            for nscope, n, scopename, scopefile, c, fname in \
+                    self.decls.get((name, kind), ()):
+                if onlyin is not None and fname not in onlyin:
+                    continue
+                if nscope > 0 and onlyin is not None and scopefile not in onlyin:
+                    continue
+                if namespace is not None and scopename != namespace:
+                    continue
+                found.append((-nscope, n, c))
+        found.sort(key=lambda x: x[:2])
+        return [c for _, _, c in found]
+
+    def specializations(self, decl, ts, canonargs):
+        """Returns a dictionary mapping canonical argument tuples to the
+        specializations of a template declaration.  The canonargs function
+        computes the tuple for a specialization with the type system ts.  The
+        table is built once per declaration and type system, and rebuilt when
+        the type system changes (see TypeSystem.memostamp()).
+        """
+        key = (decl, id(ts))
+        stamp = None if ts is None else ts.memostamp()
+        if key not in self._specs or self._specs[key][1] != stamp:
+            table = {}
+            for spec in decl.get_specializations():
+                try:
+                    args = canonargs(spec)
+                except Exception:
+                    continue
+                table.setdefault(args, spec)
+            self._specs[key] = (ts, stamp, table)
+        return self._specs[key][2]
+
+_clang_indexes = weakref.WeakKeyDictionary()
+
+def clang_index(tu):
+    """Returns the symbol index of a clang translation unit, building it the
+    first time the translation unit is seen.  The index is dropped along with
+    the translation unit."""
+    index = _clang_indexes.get(tu, None)
+    if index is None:
+        index = _clang_indexes[tu] = ClangIndex(tu)
+    return index
+
+def clang_pch(filename, language='c++', args=(), builddir='build', verbose=False):
+    """Compiles a prefix header into a precompiled header with clang.  This is
+    stored in the same cache as the translation units, so that the header is
+    only compiled again when it, one of its includes, or the arguments change.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the prefix header.
+    language : str
+        Valid language flag.
+    args : list of str, optional
+        Further command line arguments, these should match the ones used when
+        parsing the sources.
+    builddir : str, optional
+        Location of -- often temporary -- build files.
+    verbose : bool, optional
+        Flag to display extra information.
+
+    Returns
+    -------
+    pch : str
+        Path to the precompiled header.
+    """
+    if not PARSERS_AVAILABLE['clang']:
+        raise RuntimeError("clang is not available")
+    args = ['-x', language + '-header'] + list(args)
+    cmd = [cindex.Config.library_file or 'clang', '-emit-pch', filename] + args
+    cache = clang_cache(builddir)
+    pch = cache.lookup(cmd)
+    if pch is not None:
+        return pch
+    if verbose:
+        print("clang: precompiling {0}".format(filename))
+    index = cindex.Index.create()
+    tu = index.parse(filename, args=args)
+    _clang_check(tu, filename)
+    pch = _tmp_filename(filename, cache.cachedir, '.pch')
+    tu.save(pch)
+    deps = [filename] + [inc.include.name for inc in tu.get_includes()]
+    deps = [d for d in deps if os.path.isfile(d)]
+    return cache.store(cmd, pch, deps)
 
 #
 # pycparser Describers
@@ -297,27 +1157,38 @@ def pycparser_parse(filename, includes=(), defines=('XDRESS',), undefines=(),
         A pycparser abstract syntax tree.
 
     """
-    pklgzname = filename.replace(os.path.sep, '_').rsplit('.', 1)[0] + '.pkl.gz'
-    pklgzname = os.path.join(builddir, pklgzname)
-    if os.path.isfile(pklgzname):
-        with gzip.open(pklgzname, 'rb') as f:
-            root = pickle.loads(f.read())
-        return root
-    kwargs = {'cpp_args': [r'-D__attribute__(x)=',  # Workaround for GNU libc
+    cpp_args = [r'-D__attribute__(x)=',  # Workaround for GNU libc
                 r'-D__asm__(x)=', r'-D__const=',
                 r'-D__builtin_va_list=int', # just fake this
                 r'-D__restrict=', r'-D__extension__=',
                 r'-D__inline__=', r'-D__inline=',
-                ]}
-    kwargs['cpp_args'] += ['-I' + i for i in includes]
-    kwargs['cpp_args'] += ['-D' + d for d in defines]
-    kwargs['cpp_args'] += ['-U' + u for u in undefines]
-    kwargs['cpp_args'] += extra_parser_args
-    root = pycparser.parse_file(filename, use_cpp=True, **kwargs)
+                ]
+    cpp_args += ['-I' + i for i in includes]
+    cpp_args += ['-D' + d for d in defines]
+    cpp_args += ['-U' + u for u in undefines]
+    cpp_args += list(extra_parser_args)
+    cmd = ['pycparser', filename] + cpp_args
+    cache = pycparser_cache(builddir)
+    pklgzname = cache.lookup(cmd)
+    if pklgzname is not None:
+        with gzip.open(pklgzname, 'rb') as f:
+            root = pickle.loads(f.read())
+        _parse_deps[filename] = cache.entry_deps(pklgzname)
+        return root
+    text = pycparser.preprocess_file(filename, cpp_args=cpp_args)
+    root = pycparser.CParser().parse(text, filename)
+    # the line markers left by the preprocessor name every included file
+    deps = [filename] + _CPP_LINE_MARKER.findall(text)
+    deps = [d for d in set(deps) if os.path.isfile(d)]
+    _parse_deps[filename] = tuple(sorted(deps))
+    pklgzname = _tmp_filename(filename, cache.cachedir, '.pkl.gz')
     with gzip.open(pklgzname, 'wb') as f:
         f.write(pickle.dumps(root, pickle.HIGHEST_PROTOCOL))
+    cache.store(cmd, pklgzname, deps)
     return root
 
+_CPP_LINE_MARKER = re.compile(r'^#\s*(?:line\s+)?\d+\s+"([^"]+)"', re.MULTILINE)
+
 #
 #  General utilities
 #
@@ -429,7 +1300,13 @@ class ParserPlugin(Plugin):
         classes=(),
         parsers={'c': ['pycparser', 'clang', 'gccxml'],
                  'c++':['clang', 'gccxml', 'pycparser']},
-        clear_parser_cache_period=50,
+        clear_parser_cache_period=NotSpecified,
+        parser_cache_size=PARSER_CACHE_SIZE,
+        gccxml_cache_size=GCCXML_CACHE_SIZE,
+        gccxml_stream_size=NotSpecified,
+        pycparser_cache_size=PYCPARSER_CACHE_SIZE,
+        clang_cache_size=CLANG_CACHE_SIZE,
+        clang_prefix_header=NotSpecified,
         dumpast=NotSpecified,
         extra_parser_args=(),
         )
@@ -452,9 +1329,23 @@ class ParserPlugin(Plugin):
                    "Options include \n"
                    "     c: ['pycparser', 'clang', 'gccxml'] \n"
                    "     c++:['clang', 'gccxml', 'pycparser']"),
-        'clear_parser_cache_period': ("Number of parser calls to perform before "
-                                      "clearing the internal cache.  This prevents "
-                                      "nasty memory overflow issues."),
+        'clear_parser_cache_period': ("Deprecated, the in-memory parser cache is "
+                                      "now bounded by parser_cache_size."),
+        'parser_cache_size': ("Approximate maximum size in bytes of the parsed "
+                              "ASTs kept in memory.  The least recently used "
+                              "are evicted first."),
+        'gccxml_cache_size': ("Maximum size in bytes of the on-disk GCC-XML parse "
+                              "cache in the build directory."),
+        'gccxml_stream_size': ("GCC-XML outputs of at least this many bytes are "
+                               "streamed, keeping only the declarations reachable "
+                               "from the files being described."),
+        'pycparser_cache_size': ("Maximum size in bytes of the on-disk cache of "
+                                 "pickled pycparser ASTs in the build directory."),
+        'clang_cache_size': ("Maximum size in bytes of the on-disk cache of saved "
+                             "clang translation units in the build directory."),
+        'clang_prefix_header': ("Header that includes the headers common to all "
+                                "sources.  If given, clang precompiles it once and "
+                                "uses it as the preamble of every parse."),
         'dumpast': "Prints the abstract syntax tree of a file.",
         'clang_includes': "clang-specific include paths",
         'extra_parser_args': "Further command line arguments to pass to the parser"
@@ -472,7 +1363,25 @@ class ParserPlugin(Plugin):
                             help=rcdocs["parsers"])
         parser.add_argument('--clear-parser-cache-period', action='store',
                             dest='clear_parser_cache_period', type=int,
-                            help=rcdocs["clear_parser_cache_period"])
+                            help=argparse.SUPPRESS)
+        parser.add_argument('--parser-cache-size', action='store',
+                            dest='parser_cache_size', type=int,
+                            help=rcdocs["parser_cache_size"])
+        parser.add_argument('--gccxml-cache-size', action='store',
+                            dest='gccxml_cache_size', type=int,
+                            help=rcdocs["gccxml_cache_size"])
+        parser.add_argument('--gccxml-stream-size', action='store',
+                            dest='gccxml_stream_size', type=int,
+                            help=rcdocs["gccxml_stream_size"])
+        parser.add_argument('--pycparser-cache-size', action='store',
+                            dest='pycparser_cache_size', type=int,
+                            help=rcdocs["pycparser_cache_size"])
+        parser.add_argument('--clang-cache-size', action='store',
+                            dest='clang_cache_size', type=int,
+                            help=rcdocs["clang_cache_size"])
+        parser.add_argument('--clang-prefix-header', action='store',
+                            dest='clang_prefix_header', metavar="FILE",
+                            help=rcdocs["clang_prefix_header"])
         parser.add_argument('--dumpast', action='store', dest='dumpast',
                             metavar="FILE", help=rcdocs["dumpast"])
         parser.add_argument('--clang-includes', action='store', dest='clang_includes',
@@ -483,6 +1392,20 @@ class ParserPlugin(Plugin):
 
     def setup(self, rc):
         """Remember to call super() on subclasses!"""
+        global GCCXML_CACHE_SIZE, CLANG_CACHE_SIZE, CLANG_PREFIX_HEADER, \
+               PARSER_CACHE_SIZE, GCCXML_STREAM_SIZE, PYCPARSER_CACHE_SIZE
+        if rc.clear_parser_cache_period is not NotSpecified:
+            warn("run control parameter 'clear_parser_cache_period' has been "
+                 "removed in favor of 'parser_cache_size'", DeprecationWarning)
+        PARSER_CACHE_SIZE = rc.parser_cache_size
+        GCCXML_CACHE_SIZE = rc.gccxml_cache_size
+        GCCXML_STREAM_SIZE = None if rc.gccxml_stream_size is NotSpecified \
+                             else rc.gccxml_stream_size
+        PYCPARSER_CACHE_SIZE = rc.pycparser_cache_size
+        CLANG_CACHE_SIZE = rc.clang_cache_size
+        CLANG_PREFIX_HEADER = None if rc.clang_prefix_header is NotSpecified \
+                              else rc.clang_prefix_header
+        PARSERS_AVAILABLE.builddir = rc.builddir
         if isinstance(rc.parsers, basestring):
             if '[' in rc.parsers or '{' in rc.parsers:
                 rc.parsers = eval(rc.parsers)
@@ -497,8 +1420,14 @@ class ParserPlugin(Plugin):
     def execute(self, rc):
         raise TypeError("ParserPlugin is not a complete plugin.  Do not use directly")
 
+    def teardown(self, rc):
+        """Remember to call super() on subclasses!"""
+        flush_parse_caches()
+
     def report_debug(self, rc):
         """Remember to call super() on subclasses!"""
         msg = 'Autodescriber parsers available:\n\n{0}\n\n'
-        msg = msg.format(pformat(PARSERS_AVAILABLE))
+        msg += 'Parser cache statistics:\n\n{1}\n\n'
+        msg = msg.format(pformat(PARSERS_AVAILABLE.probe_all()),
+                         pformat(parser_cache_stats()))
         return msg
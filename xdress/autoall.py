@@ -82,11 +82,11 @@ class GccxmlFinder(object):
         """
         self.verbose = verbose
         self._root = root
+        self._index = index = astparsers.gccxml_index(root)
         origonlyin = onlyin
         onlyin = [onlyin] if isinstance(onlyin, basestring) else onlyin
         onlyin = set() if onlyin is None else set(onlyin)
-        onlyin = [root.find("File[@name='{0}']".format(oi)) for oi in onlyin]
-        self.onlyin = set([oi.attrib['id'] for oi in onlyin if oi is not None])
+        self.onlyin = set([index.files[oi] for oi in onlyin if oi in index.files])
         if 0 == len(self.onlyin):
             msg = ("None of these files are present: {0!r}; "
                    "autodescribing will probably fail.")
@@ -147,7 +147,9 @@ class GccxmlFinder(object):
             names = [n for n in names if n not in FORBIDDEN_NAMES]
             return names
         names = set()
-        for child in node.iterfind(".//" + kinds):
+        children = self._index.iter_tag(kinds) if node is self._root \
+                   else node.iterfind(".//" + kinds)
+        for child in children:
             if child.attrib.get('file', None) not in self.onlyin:
                 continue
             name = child.attrib.get('name', '_')
@@ -200,12 +202,12 @@ def gccxml_findall(filename, includes=(), defines=('XDRESS',), undefines=(),
     if os.name == 'nt':
         # GCC-XML and/or Cygwin wants posix paths on Windows.
         filename = posixpath.join(*ntpath.split(filename))
-    root = astparsers.gccxml_parse(filename, includes=includes, defines=defines,
-            undefines=undefines, extra_parser_args=extra_parser_args, verbose=verbose, 
-            debug=debug, builddir=builddir)
     basename = filename.rsplit('.', 1)[0]
     onlyin = set([filename] + 
                  [basename + '.' + h for h in utils._hdr_exts if h.startswith('h')])
+    root = astparsers.gccxml_parse(filename, includes=includes, defines=defines,
+            undefines=undefines, extra_parser_args=extra_parser_args, verbose=verbose, 
+            debug=debug, builddir=builddir, onlyin=onlyin)
     finder = GccxmlFinder(root, onlyin=onlyin, verbose=verbose)
     finder.visit()
     return finder.variables, finder.functions, finder.classes
@@ -232,7 +234,8 @@ def clang_findall(filename, includes=(), defines=('XDRESS',), undefines=(),
         Valid language flag.
     verbose : Ignored
     debug : Ignored
-    builddir : Ignored
+    builddir : str, optional
+        Location of -- often temporary -- build files.
     clang_includes : list of str, optional
         clang-specific include paths.
 
@@ -249,7 +252,7 @@ def clang_findall(filename, includes=(), defines=('XDRESS',), undefines=(),
     tu = astparsers.clang_parse(filename, includes=includes, defines=defines,
                                 undefines=undefines, 
                                 extra_parser_args=extra_parser_args, verbose=verbose, 
-                                debug=debug, language=language, 
+                                debug=debug, builddir=builddir, language=language, 
                                 clang_includes=clang_includes)
     basename = filename.rsplit('.', 1)[0]
     onlyin = frozenset([filename] +
@@ -625,7 +628,7 @@ class XDressPlugin(astparsers.ParserPlugin):
         allfiles = {}
         cachefile = os.path.join(rc.builddir, 'autoname.cache')
         autonamecache = AutoNameCache(cachefile=cachefile)
-        for i, (srcfile, lang) in enumerate(allsrc.items()):
+        for srcfile, lang in allsrc.items():
             print("autoall: searching {0}".format(srcfile))
             if autonamecache.isvalid(srcfile):
                 found = autonamecache[srcfile]
@@ -643,8 +646,6 @@ class XDressPlugin(astparsers.ParserPlugin):
                 if 0 < len(found[k]):
                     fstr = ", ".join([str(_) for _ in found[k]])
                     print("autoall: found {0}: {1}".format(kind, fstr))
-            if 0 == i%rc.clear_parser_cache_period:
-                astparsers.clearmemo()
 
         # third pass -- replace *s
         if self.varhasstar:
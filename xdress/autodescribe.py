@@ -236,7 +236,9 @@ import subprocess
 import itertools
 import functools
 import pickle
+import multiprocessing
 import collections
+from collections import Mapping
 from hashlib import md5
 from numbers import Number
 from pprint import pprint, pformat
@@ -420,12 +422,13 @@ def gccxml_describe(filename, name, kind, includes=(), defines=('XDRESS',),
     # GCC-XML and/or Cygwin wants posix paths on Windows.
     posixfilename = posixpath.join(*ntpath.split(filename)) if os.name == 'nt' \
                     else filename
+    if onlyin is None:
+        onlyin = set([filename])
     root = astparsers.gccxml_parse(posixfilename, includes=includes, defines=defines,
                                    undefines=undefines,
                                    extra_parser_args=extra_parser_args,
-                                   verbose=verbose, debug=debug, builddir=builddir)
-    if onlyin is None:
-        onlyin = set([filename])
+                                   verbose=verbose, debug=debug, builddir=builddir,
+                                   onlyin=onlyin)
     describers = {'class': GccxmlClassDescriber, 'func': GccxmlFuncDescriber,
                   'var': GccxmlVarDescriber}
     describer = describers[kind](name, root, onlyin=onlyin, ts=ts, verbose=verbose)
@@ -462,23 +465,18 @@ class GccxmlBaseDescriber(object):
         self.ts = ts or TypeSystem()
         self.verbose = verbose
         self._root = root
+        self._index = index = astparsers.gccxml_index(root)
         origonlyin = onlyin
         onlyin = [onlyin] if isinstance(onlyin, basestring) else onlyin
         onlyin = set() if onlyin is None else set(onlyin)
         self.onlyin = set()
-        self._filemap = {}
-        for fnode in root.iterfind("File"):
-            fid = fnode.attrib['id']
-            fname = fnode.attrib['name']
-
-            self._filemap[fid] = fname
+        self._filemap = index.filenames
         for fname in onlyin:
-            fnode = root.find("File[@name='{0}']".format(fname))
-            if fnode is None:
-                fnode = root.find("File[@name='./{0}']".format(fname))
-                if fnode is None:
+            fid = index.files.get(fname, None)
+            if fid is None:
+                fid = index.files.get('./' + fname, None)
+                if fid is None:
                     continue
-            fid = fnode.attrib['id']
             self.onlyin.add(fid)
         if 0 == len(self.onlyin):
             msg = "{0!r} is not present in {1!r}; autodescribing will probably fail."
@@ -510,8 +508,7 @@ class GccxmlBaseDescriber(object):
         if m is None:
             return None
         enumname, val = m.groups()
-        query = ".//*[@name='{0}']"
-        node = self._root.find(query.format(enumname))
+        node = self._index.find_name(enumname)
         if node is None:
             return None
         for child in node.iterfind('EnumValue'):
@@ -532,9 +529,8 @@ class GccxmlBaseDescriber(object):
         targ_nodes = []
         targ_islit = []
         # gross but string parsing of node name is needed.
-        query = ".//*[@name='{0}']"
         for targ in template_args:
-            targ_node = self._root.find(query.format(targ))
+            targ_node = self._index.find_name(targ)
             if targ_node is None:
                 try:
                     targ_node = c_literal(targ)
@@ -566,8 +562,7 @@ class GccxmlBaseDescriber(object):
         name = node.attrib['name']
         members = node.attrib.get('members', '').strip().split()
         if 0 < len(members):
-            children = [child for m in members for child in \
-                        self._root.iterfind(".//*[@id='{0}']".format(m))]
+            children = [self._index.ids[m] for m in members if m in self._index.ids]
             tags = [child.tag for child in children]
             template_name = children[tags.index('Constructor')].attrib['name']  # 'map'
         else:
@@ -586,9 +581,8 @@ class GccxmlBaseDescriber(object):
         else:
             # gross but string parsing of node name is needed.
             targs = utils.split_template_args(name)
-            query = ".//*[@name='{0}']"
             for targ in targs:
-                targ_node = self._root.find(query.format(targ))
+                targ_node = self._index.find_name(targ)
                 if targ_node is None:
                     targ_node = c_literal(targ)
                     targ_islit.append(True)
@@ -736,7 +730,7 @@ class GccxmlBaseDescriber(object):
     def visit_field(self, node):
         """visits a member variable."""
         self._pprint(node)
-        context = self._root.find(".//*[@id='{0}']".format(node.attrib['context']))
+        context = self._index.find_id(node.attrib['context'])
         if context.attrib['name'] == self.name:
             # assert this field is member of the class we are trying to parse
             name = node.attrib['name']
@@ -835,7 +829,7 @@ class GccxmlBaseDescriber(object):
 
     def type(self, id):
         """Resolves the type from its id and information in the root element tree."""
-        node = self._root.find(".//*[@id='{0}']".format(id))
+        node = self._index.find_id(id)
         tag = node.tag.lower()
         meth_name = 'visit_' + tag
         meth = getattr(self, meth_name, None)
@@ -854,7 +848,7 @@ class GccxmlBaseDescriber(object):
 
     def context(self, id):
         """Resolves the context from its id and information in the element tree."""
-        node = self._root.find(".//*[@id='{0}']".format(id))
+        node = self._index.find_id(id)
         tag = node.tag.lower()
         meth_name = 'visit_' + tag
         meth = getattr(self, meth_name, None)
@@ -904,8 +898,7 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
     def _find_class_node(self):
         basename = self.name[0]
         namet = self.desc['type']
-        query = "Class"
-        for node in self._root.iterfind(query):
+        for node in self._index.iter_tag("Class"):
             if node.attrib['file'] not in self.onlyin:
                 continue
             nodename = node.attrib['name']
@@ -936,14 +929,11 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
             if not isinstance(self.name, basestring) and self.name not in self.ts.argument_kinds:
                 node = self._find_class_node()
             if node is None:
-                query = "Class[@name='{0}']".format(self.ts.gccxml_type(self.name))
-                node = self._root.find(query)
+                node = self._index.find_tag("Class", self.ts.gccxml_type(self.name))
             if node is None:
-                query = "Struct[@name='{0}']".format(self.ts.gccxml_type(self.name))
-                node = self._root.find(query)
+                node = self._index.find_tag("Struct", self.ts.gccxml_type(self.name))
             if node is None:
-                query = "Union[@name='{0}']".format(self.ts.gccxml_type(self.name))
-                node = self._root.find(query)
+                node = self._index.find_tag("Union", self.ts.gccxml_type(self.name))
             if node is None and not isinstance(self.name, basestring):
                 # Must be a template with some wacky argument values
                 node = self._find_class_node()
@@ -961,7 +951,7 @@ class GccxmlClassDescriber(GccxmlBaseDescriber):
             self.desc['construct'] = node.tag.lower()
             self.visit_class(node)
         members = node.attrib.get('members', '').strip().split()
-        children = [self._root.find(".//*[@id='{0}']".format(m)) for m in members]
+        children = [self._index.find_id(m) for m in members]
         children = [c for c in children if c.attrib['access'] == 'public']
         self._level += 1
         for child in children:
@@ -1007,8 +997,13 @@ class GccxmlVarDescriber(GccxmlBaseDescriber):
             top-level class node is found and visited.
 
         """
-        root = node or self._root
-        for n in root.iterfind("Variable[@name='{0}']".format(self.name)):
+        if node is None:
+            variables = self._index.iter_tag("Variable", self.name)
+            enums = self._index.iter_tag("Enumeration", self.name)
+        else:
+            variables = node.iterfind("Variable[@name='{0}']".format(self.name))
+            enums = node.iterfind("Enumeration[@name='{0}']".format(self.name))
+        for n in variables:
             if n.attrib['file'] in self.onlyin:
                 ns = self.context(n.attrib['context'])
                 if ns is not None and ns != "::":
@@ -1022,7 +1017,7 @@ class GccxmlVarDescriber(GccxmlBaseDescriber):
                 raise RuntimeError(msg)
 
         # Variables can also be enums
-        for n in root.iterfind("Enumeration[@name='{0}']".format(self.name)):
+        for n in enums:
             if n.attrib['file'] in self.onlyin:
                 ns = self.context(n.attrib['context'])
                 if ns is not None and ns != "::":
@@ -1074,7 +1069,6 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
             top-level class node is found and visited.
 
         """
-        root = node or self._root
         name = self.name
         ts = self.ts
         if isinstance(name, basestring):
@@ -1093,7 +1087,11 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
             namet = tuple(namet)
         if not isinstance(name, basestring):
             pattern = re.compile(r'(?: |::)'+basename+'.*>')
-        for n in root.iterfind("Function[@name='{0}']".format(basename)):
+        if node is None:
+            functions = self._index.iter_tag("Function", basename)
+        else:
+            functions = node.iterfind("Function[@name='{0}']".format(basename))
+        for n in functions:
             if not isinstance(name, basestring):
                 # Must be a template function
                 if n.attrib['file'] not in self.onlyin:
@@ -1117,7 +1115,7 @@ class GccxmlFuncDescriber(GccxmlBaseDescriber):
 
 def clang_describe(filename, name, kind, includes=(), defines=('XDRESS',),
                    undefines=(), extra_parser_args=(), ts=None, verbose=False,
-                   debug=False, builddir=None, onlyin=None, language='c++',
+                   debug=False, builddir='build', onlyin=None, language='c++',
                    clang_includes=()):
     """Use Clang to describe the class.
 
@@ -1144,7 +1142,7 @@ def clang_describe(filename, name, kind, includes=(), defines=('XDRESS',),
     debug : bool, optional
         Flag to enable/disable debug mode.  Currently ignored.
     builddir : str, optional
-        Ignored.  Exists only for compatibility with gccxml_describe.
+        Location of -- often temporary -- build files.
     onlyin : set of str, optional
         The paths to the files that the definition is allowed to exist in.
     language : str
@@ -1159,7 +1157,7 @@ def clang_describe(filename, name, kind, includes=(), defines=('XDRESS',),
     tu = astparsers.clang_parse(filename, includes=includes, defines=defines,
                                 undefines=undefines,
                                 extra_parser_args=extra_parser_args, verbose=verbose,
-                                debug=debug, language=language,
+                                debug=debug, builddir=builddir, language=language,
                                 clang_includes=clang_includes)
     ts = ts or TypeSystem()
     if onlyin is None:
@@ -1227,15 +1225,23 @@ def clang_find_scopes(tu, onlyin, namespace=None):
         return scopes
 
 def clang_find_decls(tu, name, kinds, onlyin, namespace=None):
-    """Find all declarations of the given name and kind in the given scopes."""
-    scopes = clang_find_scopes(tu, onlyin, namespace=namespace)
-    decls = []
-    for s in scopes[::-1]:
-        for c in s.get_children():
-            if c.kind in kinds and c.spelling == name:
-                if onlyin is None or c.location.file.name in onlyin:
-                    decls.append(c)
-    return decls
+    """Find all declarations of the given name and kind in the given scopes.
+    This looks them up in the symbol index of the translation unit, see
+    ``astparsers.ClangIndex``."""
+    return astparsers.clang_index(tu).find(name, kinds, onlyin=onlyin,
+                                           namespace=namespace)
+
+def clang_find_specialization(tu, decl, args, ts):
+    """Find the specialization of a class or function template declaration
+    for the given template arguments, or None."""
+    kinds = clang_template_param_kinds(decl)
+    args = tuple(canon_template_arg(ts,k,a) for k,a in zip(kinds, args))
+    args = clang_expand_template_args(decl, args)
+    def canonargs(spec):
+        return tuple(canon_template_arg(ts,k,a) for k,a in
+                     zip(kinds, clang_describe_template_args(spec)))
+    specs = astparsers.clang_index(tu).specializations(decl, ts, canonargs)
+    return specs.get(args, None)
 
 # TODO: This functionality belongs in TypeSystem
 def canon_template_arg(ts, kind, arg):
@@ -1272,12 +1278,9 @@ def clang_find_class(tu, name, ts, namespace=None, filename=None, onlyin=None):
             return decl
         else:
             # Search for the desired template specialization
-            kinds = clang_template_param_kinds(decl)
-            args = tuple(canon_template_arg(ts,k,a) for k,a in zip(kinds, args))
-            args = clang_expand_template_args(decl, args)
-            for spec in decl.get_specializations():
-                if args == tuple(canon_template_arg(ts,k,a) for k,a in zip(kinds, clang_describe_template_args(spec))):
-                    return spec
+            spec = clang_find_specialization(tu, decl, args, ts)
+            if spec is not None:
+                return spec
 
     # Nothing found, time to complain
     where = clang_where(namespace, filename)
@@ -1307,12 +1310,9 @@ def clang_find_function(tu, name, ts, namespace=None, filename=None, onlyin=None
         else:
             # Search for the desired function specialization
             decl, = decls # TODO: Support multiple decl case
-            kinds = clang_template_param_kinds(decl)
-            args = tuple(canon_template_arg(ts,k,a) for k,a in zip(kinds, args))
-            args = clang_expand_template_args(decl, args)
-            for spec in decl.get_specializations():
-                if args == tuple(canon_template_arg(ts,k,a) for k,a in zip(kinds, clang_describe_template_args(spec))):
-                    return [spec]
+            spec = clang_find_specialization(tu, decl, args, ts)
+            if spec is not None:
+                return [spec]
 
     # Nothing found, time to complain
     where = clang_where(namespace, filename)
@@ -2163,18 +2163,20 @@ def _make_includer(filenames, builddir, language, verbose=False):
     all of the files in filenames.  Returns the path to the newly made file.
     """
     newfile = ""
-    newnames = []
     for filename in filenames:
-        newnames.append(filename.replace(os.path.sep, '_'))
         newfile += '#include "{0}"\n'.format(filename)
-    newnames = "-".join(newnames)
-    if len(newnames) > 250:
-        # this is needed to prevent 'IOError: [Errno 36] File name too long'
-        newnames = md5(newnames).hexdigest()
-    newname = os.path.join(builddir, newnames + '.' + _lang_exts[language])
+    newname = _includer_name(filenames, builddir, language)
     newoverwrite(newfile, newname, verbose=verbose)
     return newname
 
+def _includer_name(filenames, builddir, language):
+    # the path of the file that _make_includer() writes
+    newnames = "-".join([f.replace(os.path.sep, '_') for f in filenames])
+    if len(newnames) > 250:
+        # this is needed to prevent 'IOError: [Errno 36] File name too long'
+        newnames = md5(newnames.encode()).hexdigest()
+    return os.path.join(builddir, newnames + '.' + _lang_exts[language])
+
 _describers = {
     'clang': clang_describe,
     'gccxml': gccxml_describe,
@@ -2232,12 +2234,7 @@ def describe(filename, name=None, kind='class', includes=(), defines=('XDRESS',)
         A dictionary describing the class which may be used to generate
         API bindings.
     """
-    if isinstance(filename, basestring):
-        onlyin = set([filename])
-    else:
-        onlyin = set(filename)
-        filename = filename[0] if len(filename) == 0 \
-                   else _make_includer(filename, builddir, language, verbose=verbose)
+    filename, onlyin = _includer_onlyin(filename, builddir, language, verbose)
     if name is None:
         name = os.path.split(filename)[-1].rsplit('.', 1)[0].capitalize()
     parser = astparsers.pick_parser(language, parsers)
@@ -2248,6 +2245,187 @@ def describe(filename, name=None, kind='class', includes=(), defines=('XDRESS',)
                      language=language, clang_includes=clang_includes)
     return desc
 
+def describe_many(filename, names, includes=(), defines=('XDRESS',), undefines=(),
+                  extra_parser_args=(), parsers='gccxml', ts=None, verbose=False,
+                  debug=False, builddir='build', language='c++', clang_includes=()):
+    """Automatically describes many API elements which live in the same file(s).
+    The file is parsed only once and the resulting AST is used to describe all
+    of the elements, regardless of the parser cache period.
+
+    Parameters
+    ----------
+    filename : str or container of strs
+        The path to the file or a list of file paths, as with describe().
+    names : list of (name, kind) tuples
+        The names to describe along with the kind of each, valid kind flags are
+        'class', 'func', and 'var'.
+    includes: list of str, optional
+        The list of extra include directories to search for header files.
+    defines: list of str, optional
+        The list of extra macro definitions to apply.
+    undefines: list of str, optional
+        The list of extra macro undefinitions to apply.
+    extra_parser_args : list of str, optional
+        Further command line arguments to pass to the parser.
+    parsers : str, list, or dict, optional
+        The parser / AST to use to use for the file, see describe().
+    ts : TypeSystem, optional
+        A type system instance.
+    verbose : bool, optional
+        Flag to diplay extra information while describing the class.
+    debug : bool, optional
+        Flag to enable/disable debug mode.
+    builddir : str, optional
+        Location of -- often temporary -- build files.
+    language : str
+        Valid language flag.
+    clang_includes : list of str, optional
+        clang-specific include paths.
+
+    Returns
+    -------
+    descs : list of dicts
+        The description dictionaries, in the same order as names.
+    """
+    filename, onlyin = _includer_onlyin(filename, builddir, language, verbose)
+    parser = astparsers.pick_parser(language, parsers)
+    describer = _describers[parser]
+    descs = []
+    for name, kind in names:
+        desc = describer(filename, name, kind, includes=includes, defines=defines,
+                         undefines=undefines, extra_parser_args=extra_parser_args,
+                         ts=ts, verbose=verbose, debug=debug, builddir=builddir,
+                         onlyin=onlyin, language=language,
+                         clang_includes=clang_includes)
+        descs.append(desc)
+    return descs
+
+def _includer_onlyin(filename, builddir, language, verbose):
+    # returns the file to parse and the files that definitions may live in
+    if isinstance(filename, basestring):
+        onlyin = set([filename])
+    else:
+        onlyin = set(filename)
+        filename = filename[0] if len(filename) == 0 \
+                   else _make_includer(filename, builddir, language, verbose=verbose)
+    return filename, onlyin
+
+def describe_deps(filename, builddir='build', language='c++'):
+    """Returns the files that descriptions of API elements from a file (or list
+    of files) depend on.  These are the files themselves along with all of the
+    includes that the parser reported when it last parsed them.
+
+    Parameters
+    ----------
+    filename : str or list of str
+        The source file(s) that were described.
+    builddir : str, optional
+        Location of -- often temporary -- build files.
+    language : str
+        Valid language flag.
+
+    Returns
+    -------
+    deps : tuple of str
+        Sorted paths of the dependencies.
+    """
+    if isinstance(filename, basestring):
+        srcfiles = [filename]
+        parsed = filename
+    else:
+        srcfiles = list(filename)
+        parsed = srcfiles[0] if len(srcfiles) == 1 else \
+                 _includer_name(srcfiles, builddir, language)
+    deps = set(srcfiles)
+    deps.update(astparsers.parse_deps(parsed))
+    if parsed not in srcfiles:
+        deps.discard(parsed)  # the generated includer
+    return tuple(sorted(deps))
+
+#
+# Parallel describing
+#
+
+_worker_ts = None
+_worker_argkinds = None
+
+# astparsers settings that are handed on to the worker processes
+_PARSER_SETTINGS = ('GCCXML_CACHE_SIZE', 'GCCXML_STREAM_SIZE', 'CLANG_CACHE_SIZE',
+                    'CLANG_PREFIX_HEADER', 'PARSER_CACHE_SIZE',
+                    'PYCPARSER_CACHE_SIZE')
+
+def _init_describe_worker(tsdump, settings):
+    global _worker_ts, _worker_argkinds
+    _worker_ts = pickle.loads(tsdump)
+    _worker_argkinds = dict(_worker_ts.argument_kinds)
+    for key, value in settings.items():
+        setattr(astparsers, key, value)
+
+def _describe_worker(args):
+    # Describes a group of API elements starting from the type system snapshot.
+    # Returns the descriptions, the argument kinds that were registered along
+    # the way, and the files the descriptions depend on, or None if describing
+    # failed so that the caller may retry serially.
+    filename, names, kwargs = args
+    ts = _worker_ts
+    try:
+        descs = describe_many(filename, names, ts=ts, **kwargs)
+        deps = describe_deps(filename, kwargs.get('builddir', 'build'),
+                             kwargs.get('language', 'c++'))
+    except Exception:
+        descs = None
+    argkinds = [(t, k) for t, k in ts.argument_kinds.items() \
+                if t not in _worker_argkinds or _worker_argkinds[t] != k]
+    if 0 < len(argkinds):
+        ts.argument_kinds.clear()
+        ts.argument_kinds.update(_worker_argkinds)
+        ts.clearmemo()
+    return None if descs is None else (descs, argkinds, deps)
+
+def _referenced_types(x, types=None):
+    # all of the tuples which appear anywhere in a name or description, which
+    # include the template instantiations of every type that it refers to
+    types = set() if types is None else types
+    if isinstance(x, Mapping):
+        for k, v in x.items():
+            _referenced_types(k, types)
+            _referenced_types(v, types)
+    elif isinstance(x, (tuple, list)):
+        if isinstance(x, tuple):
+            try:
+                types.add(x)
+            except TypeError:
+                pass  # holds something unhashable, so it is not a type
+        for y in x:
+            _referenced_types(y, types)
+    return types
+
+def _merge_described(todo, results, ts, cache):
+    """Merges the results of describing groups of API elements in parallel
+    into the type system and the description cache, in the order of the
+    groups.  Merging stops at the first group which failed, or which mentions
+    a type whose argument kinds an earlier group registered, either in its
+    names or anywhere in its descriptions, since describing it serially could
+    have had a different outcome.  Returns the number of groups merged.
+    """
+    registered = set()
+    for n, (group, result) in enumerate(zip(todo, results)):
+        if result is None:
+            return n
+        srcdescs, argkinds, deps = result
+        if 0 < len(registered):
+            refs = _referenced_types([name.srcname for name, _ in group])
+            _referenced_types(srcdescs, refs)
+            if 0 < len(registered & refs):
+                return n
+        for t, k in argkinds:
+            ts.register_argument_kinds(t, k)
+            registered.add(t)
+        for (name, kind), srcdesc in zip(group, srcdescs):
+            srcdesc['name'] = dict(zip(name._fields, name))
+            cache.store(name, kind, srcdesc, deps)
+    return len(todo)
+
 
 #
 # Plugin
@@ -2267,6 +2445,7 @@ class XDressPlugin(astparsers.ParserPlugin):
         rc._update(super(XDressPlugin, self).defaultrc)
         # target enviroment made up of module dicts made up of descriptions
         rc.env = {}
+        rc.describe_by_file = False
         return rc
 
     def rcdocs(self):
@@ -2274,8 +2453,17 @@ class XDressPlugin(astparsers.ParserPlugin):
         docs = {}
         docs.update(super(XDressPlugin, self).rcdocs)
         docs['env'] = "The target environment computed by the autodescriber."
+        docs['describe_by_file'] = ("Describe API elements in groups that share "
+                                    "source files, parsing each group only once.")
         return docs
 
+    def update_argparser(self, parser):
+        super(XDressPlugin, self).update_argparser(parser)
+        rcdocs = self.rcdocs()
+        parser.add_argument('--describe-by-file', action='store_true',
+                            dest='describe_by_file',
+                            help=rcdocs["describe_by_file"])
+
     def setup(self, rc):
         """Expands variables, functions, and classes in the rc based on
         copying src filenames to tar filename."""
@@ -2299,9 +2487,14 @@ class XDressPlugin(astparsers.ParserPlugin):
     def execute(self, rc):
         print("autodescribe: scraping C/C++ APIs from source")
         self.load_sidecars(rc)
+        if rc.describe_by_file:
+            self.compute_descs_by_file(rc)
         self.compute_classes(rc)
         self.compute_functions(rc)
         self.compute_variables(rc)
+        if rc.verbose:
+            print("autodescribe: parser cache {0}".format(
+                  astparsers.parser_cache_stats()))
 
     def report_debug(self, rc):
         super(XDressPlugin, self).report_debug(rc)
@@ -2380,21 +2573,126 @@ class XDressPlugin(astparsers.ParserPlugin):
             srcdesc = cache[name, kind]
         else:
             srcdesc = describe(name.srcfiles, name=name.srcname, kind=kind,
-                               includes=rc.includes, defines=rc.defines,
-                               undefines=rc.undefines,
-                               extra_parser_args=rc.extra_parser_args,
-                               parsers=rc.parsers, ts=rc.ts, verbose=rc.verbose,
-                               debug=rc.debug, builddir=rc.builddir,
-                               language=name.language,
-                               clang_includes=rc.clang_includes)
+                               ts=rc.ts, language=name.language,
+                               **self._describe_kwargs(rc))
             srcdesc['name'] = dict(zip(name._fields, name))
-            cache[name, kind] = srcdesc
+            deps = describe_deps(name.srcfiles, rc.builddir, name.language)
+            cache.store(name, kind, srcdesc, deps)
         descs = [srcdesc]
         descs += [self.pysrcenv[s].get(name.srcname, {}) for s in name.sidecars]
         descs.append({'extra': extra_filenames(name)})
         desc = merge_descriptions(descs)
         return desc
 
+    def _describe_kwargs(self, rc):
+        return dict(includes=rc.includes, defines=rc.defines, undefines=rc.undefines,
+                    extra_parser_args=rc.extra_parser_args, parsers=rc.parsers,
+                    verbose=rc.verbose, debug=rc.debug, builddir=rc.builddir,
+                    clang_includes=rc.clang_includes)
+
+    def _uncached_groups(self, groups, rc):
+        # filters out cached and repeated elements, and then empty groups
+        cache = rc._cache
+        seen = set()
+        todo = []
+        for group in groups:
+            group = [(name, kind) for name, kind in group if (name, kind) not in seen \
+                                                  and not cache.isvalid(name, kind)]
+            seen.update(group)
+            if 0 < len(group):
+                todo.append(group)
+        return todo
+
+    def _file_groups(self, rc):
+        # groups all API elements by their source files, in order of appearance
+        groups = collections.OrderedDict()
+        for kind, names in (('class', rc.classes), ('func', rc.functions),
+                            ('var', rc.variables)):
+            for name in names:
+                key = (tuple(name.srcfiles), name.language)
+                groups.setdefault(key, []).append((name, kind))
+        return list(groups.values())
+
+    def compute_descs_by_file(self, rc):
+        """Describes all of the uncached API elements, grouped by their source
+        files, and stores the results in the description cache.  Each group is
+        described with a single call to describe_many() so that its files are
+        parsed only once.
+
+        Parameters
+        ----------
+        rc : xdress.utils.RunControl
+            Run contoler for this xdress execution.
+
+        """
+        groups = self._uncached_groups(self._file_groups(rc), rc)
+        if 1 < rc.jobs:
+            self.compute_descs_parallel(groups, rc)
+            groups = self._uncached_groups(groups, rc)
+        cache = rc._cache
+        kwargs = self._describe_kwargs(rc)
+        for group in groups:
+            name = group[0][0]
+            print("autodescribe: describing {0} API elements from {1}".format(
+                  len(group), ", ".join(name.srcfiles)))
+            srcdescs = describe_many(name.srcfiles,
+                                     [(n.srcname, kind) for n, kind in group],
+                                     ts=rc.ts, language=name.language, **kwargs)
+            deps = describe_deps(name.srcfiles, rc.builddir, name.language)
+            for (name, kind), srcdesc in zip(group, srcdescs):
+                srcdesc['name'] = dict(zip(name._fields, name))
+                cache.store(name, kind, srcdesc, deps)
+            cache.dump()
+
+    def compute_descs_parallel(self, groups, rc):
+        """Describes groups of uncached API elements using a pool of rc.jobs
+        processes and stores the results in the description cache.  Each group is
+        a list of (apiname, kind) tuples that share source files and is described
+        with one describe_many() call.  Each worker starts from a snapshot of the
+        type system.  The results are merged back in the order of the groups so
+        that the type system and cache end up the same as when describing
+        serially.  Starting from the first group which fails or which mentions a
+        type whose argument kinds an earlier group registered, the rest are left
+        for the serial pass (see _merge_described()).
+
+        Parameters
+        ----------
+        groups : list of lists of (apiname, str) tuples
+            API element names and kinds to describe.
+        rc : xdress.utils.RunControl
+            Run contoler for this xdress execution.
+
+        """
+        todo = self._uncached_groups(groups, rc)
+        if len(todo) < 2:
+            return
+        try:
+            tsdump = pickle.dumps(rc.ts, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            msg = "type system could not be pickled, describing serially: {0}"
+            warn(msg.format(e), RuntimeWarning)
+            return
+        print("autodescribe: describing {0} API elements with {1} jobs".format(
+              sum(map(len, todo)), rc.jobs))
+        kwargs = self._describe_kwargs(rc)
+        tasks = []
+        for group in todo:
+            name = group[0][0]
+            tasks.append((name.srcfiles, [(n.srcname, kind) for n, kind in group],
+                          dict(kwargs, language=name.language)))
+        settings = dict((k, getattr(astparsers, k)) for k in _PARSER_SETTINGS)
+        pool = multiprocessing.Pool(min(rc.jobs, len(todo)),
+                                    initializer=_init_describe_worker,
+                                    initargs=(tsdump, settings))
+        try:
+            results = pool.map(_describe_worker, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        cache = rc._cache
+        _merge_described(todo, results, rc.ts, cache)
+        cache.dump()
+
     _extrajoinkeys = ['pxd_header', 'pxd_footer', 'pyx_header', 'pyx_footer',
                       'cpppxd_header', 'cpppxd_footer']
 
@@ -2433,7 +2731,9 @@ class XDressPlugin(astparsers.ParserPlugin):
         ts = rc.ts
         env = rc.env
         cache = rc._cache
-        for i, var in enumerate(rc.variables):
+        if 1 < rc.jobs:
+            self.compute_descs_parallel([[(x, 'var')] for x in rc.variables], rc)
+        for var in rc.variables:
             print("autodescribe: describing {0}".format(var.srcname))
             desc = self.compute_desc(var, 'var', rc)
             if rc.verbose:
@@ -2442,35 +2742,33 @@ class XDressPlugin(astparsers.ParserPlugin):
             self.adddesc2env(desc, env, var)
             ts.register_variable_namespace(desc['name']['srcname'], desc['namespace'],
                                            desc['type'])
-            if 0 == i%rc.clear_parser_cache_period:
-                astparsers.clearmemo()
 
     def compute_functions(self, rc):
         """Computes function descriptions and loads them into the environment."""
         env = rc.env
         cache = rc._cache
-        for i, fnc in enumerate(rc.functions):
+        if 1 < rc.jobs:
+            self.compute_descs_parallel([[(x, 'func')] for x in rc.functions], rc)
+        for fnc in rc.functions:
             print("autodescribe: describing {0}".format(fnc.srcname))
             desc = self.compute_desc(fnc, 'func', rc)
             if rc.verbose:
                 pprint(desc)
             cache.dump()
             self.adddesc2env(desc, env, fnc)
-            if 0 == i%rc.clear_parser_cache_period:
-                astparsers.clearmemo()
 
     def compute_classes(self, rc):
         """Computes class descriptions and loads them into the environment."""
         # compute all class descriptions first
         cache = rc._cache
         env = rc.env  # target environment, not source one
-        for i, cls in enumerate(rc.classes):
+        if 1 < rc.jobs:
+            self.compute_descs_parallel([[(x, 'class')] for x in rc.classes], rc)
+        for cls in rc.classes:
             print("autodescribe: describing {0}".format(cls.srcname))
             desc = self.compute_desc(cls, 'class', rc)
             cache.dump()
             if rc.verbose:
                 pprint(desc)
             self.adddesc2env(desc, env, cls)
-            if 0 == i%rc.clear_parser_cache_period:
-                astparsers.clearmemo()
 
@@ -13,7 +13,7 @@ import sys
 from warnings import warn
 
 from .utils import RunControl, NotSpecified, writenewonly, DescriptionCache, \
-    DEFAULT_RC_FILE, DEFAULT_PLUGINS, nyansep, indent
+    DEFAULT_RC_FILE, DEFAULT_PLUGINS, nyansep, indent, output_manifest
 from .plugins import Plugin
 from .types.system import TypeSystem
 from .version import report_versions
@@ -32,11 +32,15 @@ class XDressPlugin(Plugin):
         verbose=False,
         version=False,
         dumpdesc=False,
+        explain=False,
+        serve=False,
+        watch=False,
         package=NotSpecified,
         packagedir=NotSpecified,
         testdir=NotSpecified,
         sourcedir=NotSpecified,
         builddir='build',
+        jobs=1,
         bash_completion=True,
         dtypes_module='dtypes',
         stlcontainers_module='stlcontainers',
@@ -53,11 +57,20 @@ class XDressPlugin(Plugin):
         'verbose': "Print more output.",
         'version': "Print version information.",
         'dumpdesc': "Print the description cache",
+        'explain': ("Print why xdress is not skipping this run as unchanged "
+                    "since the last successful one."),
+        'serve': ("Run as a daemon which keeps parsers, ASTs, and plugins in "
+                  "memory.  Later xdress runs in this project are forwarded "
+                  "to it."),
+        'watch': ("Keep running, and run again whenever a source file, "
+                  "sidecar, or run control file changes.  Only the modules "
+                  "affected by the change are regenerated."),
         'package': "The Python package name for the generated wrappers", 
         'packagedir': "Path to package directory, same as 'package' if not specified",
         'testdir': "Path to root directory for tests (tests are placed in root/tests), same as 'package' if not specified",
         'sourcedir': "Path to source directory (deprecated)",
         'builddir': "Path to build directory",
+        'jobs': "Number of processes to use for parallelizable work",
         'bash_completion': ("Flag for enabling / disabling BASH completion. "
                             "This is only relevant when using argcomplete."),
         'dtypes_module': "Module name for numpy dtype wrappers.",
@@ -76,6 +89,12 @@ class XDressPlugin(Plugin):
                             help=self.rcdocs["version"])
         parser.add_argument('--dumpdesc', action='store_true', dest='dumpdesc',
                             help=self.rcdocs["dumpdesc"])
+        parser.add_argument('--explain', action='store_true', dest='explain',
+                            help=self.rcdocs["explain"])
+        parser.add_argument('--serve', action='store_true', dest='serve',
+                            help=self.rcdocs["serve"])
+        parser.add_argument('--watch', action='store_true', dest='watch',
+                            help=self.rcdocs["watch"])
         parser.add_argument('--package', action='store', dest='package',
                             help=self.rcdocs["package"])
         parser.add_argument('--packagedir', action='store', dest='packagedir',
@@ -86,6 +105,8 @@ class XDressPlugin(Plugin):
                             help=self.rcdocs["sourcedir"])
         parser.add_argument('--builddir', action='store', dest='builddir',
                             help=self.rcdocs["builddir"])
+        parser.add_argument('-j', '--jobs', action='store', dest='jobs', type=int,
+                            help=self.rcdocs["jobs"])
         parser.add_argument('--bash-completion', action='store_true',
                             help="enable bash completion", dest="bash_completion")
         parser.add_argument('--no-bash-completion', action='store_false',
@@ -124,11 +145,15 @@ class XDressPlugin(Plugin):
         writenewonly("", os.path.join(rc.packagedir, '__init__.py'), rc.verbose)
         writenewonly("", os.path.join(rc.packagedir, '__init__.pxd'), rc.verbose)
         rc._cache = DescriptionCache(cachefile=os.path.join(rc.builddir, 'desc.cache'))
+        rc._outputs = output_manifest(os.path.join(rc.builddir, 'outputs.manifest'))
 
         if rc.dumpdesc:
             print(str(rc._cache))
             sys.exit()
 
+    def teardown(self, rc):
+        rc._outputs.dump()
+
     def report_debug(self, rc):
         msg = 'Version Information:\n\n{0}\n\n'
         msg += nyansep + "\n\n"
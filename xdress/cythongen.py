@@ -15,17 +15,25 @@ Cython Generation API
 """
 from __future__ import print_function
 import os
+import io
+import re
 import sys
+import glob
 import math
+import fnmatch
+import pickle
+import multiprocessing
 import warnings
 from numbers import Number
+from hashlib import md5
 
 from .plugins import Plugin
 from .types.matching import TypeMatcher, MatchAny
 from .types.system import TypeSystem
 from .utils import indent, expand_default_args, isclassdesc, isfuncdesc, \
-    isvardesc, newoverwrite, sortedbytype, _lang_exts, Arg
-from .version import cython_version, cython_version_info
+    isvardesc, newoverwrite, sortedbytype, _lang_exts, Arg, stabledigest, \
+    generated_from, note_generated, dump_generated, memoize
+from .version import cython_version, cython_version_info, xdress_version
 
 if sys.version_info[0] >= 3:
     basestring = str
@@ -296,6 +304,8 @@ def funccpppxd(desc, exceptions=True, ts=None):
         for a in fargs:
             ts.cython_cimport_tuples(a[1], cimport_tups, inc)
         estr = _exception_str(exceptions, desc['name']['language'], frtn, ts)
+        if _nogil(desc):
+            estr = ("nogil " + estr).strip()
         if fname == cppname == cyname:
             line = "{0}({1}) {2}".format(fname, argfill, estr)
         else:
@@ -418,6 +428,8 @@ def classcpppxd(desc, exceptions=True, ts=None):
         for a in margs:
             ts.cython_cimport_tuples(a[1], cimport_tups, inc)
         estr = _exception_str(exceptions, src_lang, mrtn, ts)
+        if mrtn is not None and _nogil(desc, mbasename):
+            estr = ("nogil " + estr).strip()
         if mname == mcppname == mcyname:
             line = "{0}({1}) {2}".format(mname, argfill, estr)
         else:
@@ -1028,7 +1040,7 @@ def _gen_argfill(args, defaults):
     return ", ".join(afill), names
 
 def _gen_function(name, name_mangled, args, rtn, defaults, ts, doc=None,
-                  inst_name="self._inst", is_method=False):
+                  inst_name="self._inst", is_method=False, nogil=False):
     argfill, names = _gen_argfill(args, defaults)
     if is_method:
         argfill = "self, " + argfill
@@ -1044,11 +1056,23 @@ def _gen_function(name, name_mangled, args, rtn, defaults, ts, doc=None,
         if abody is not None:
             argbodies += indent(abody, join=False)
         argrtns[n] = artn
+    if nogil:
+        # arguments which still refer to Python objects are converted before
+        # the GIL is released
+        cnames = _cdef_names(decls)
+        for n, a in zip(names, args):
+            if _pyfree(argrtns[n], cnames):
+                continue
+            atype = ts.cython_ctype(a[1]).replace('const ', "").replace(' &', '')
+            decls += indent("cdef {0} {1}_nogil".format(atype, n), join=False)
+            argbodies += indent("{0}_nogil = {1}".format(n, argrtns[n]), join=False)
+            argrtns[n] = n + "_nogil"
     rtype_orig = ts.cython_ctype(rtn)
     rtype = rtype_orig.replace('const ', "").replace(' &', '')
     hasrtn = rtype not in set(['None', None, 'NULL', 'void'])
     argvals = ', '.join(argrtns[n] for n in names)
     fcall = '{0}.{1}({2})'.format(inst_name, name, argvals)
+    fcbody = None
     if hasrtn:
         fcdecl, fcbody, fcrtn, fccached = ts.cython_c2py('rtnval', rtn, cached=False, view=False)
         decls += indent("cdef {0} {1}".format(rtype, 'rtnval'), join=False)
@@ -1058,12 +1082,14 @@ def _gen_function(name, name_mangled, args, rtn, defaults, ts, doc=None,
             func_call = indent('rtnval = {0}'.format(fcall), join=False)
         if fcdecl is not None:
             decls += indent(fcdecl, join=False)
-        if fcbody is not None:
-            func_call += indent(fcbody, join=False)
         func_rtn = indent("return {0}".format(fcrtn), join=False)
     else:
         func_call = indent(fcall, join=False)
         func_rtn = []
+    if nogil:
+        func_call = indent("with nogil:", join=False) + indent(func_call, join=False)
+    if fcbody is not None:
+        func_call += indent(fcbody, join=False)
     lines += decls
     lines += argbodies
     lines += func_call
@@ -1141,23 +1167,65 @@ def _gen_dispatcher(name, name_mangled, ts, doc=None, hasrtn=True, is_method=Tru
         dispatch_str_ret = "return self.{0}(*args, **kwargs)"
         dispatch_str_no_ret = "self.{0}(*args, **kwargs)"
 
+        # the exact dispatch table maps to method names
+        table_str = "self.{0}"
+        table_val = '"{0}"'
+        exact_call = "getattr(self, meth)(*args)"
+
         # Make self a method argument or not
         argfill = ", ".join(['self', '*args', '**kwargs'])
     else:
         arg_chk_str = "if types <= {0}_argtypes:"
         dispatch_str_ret = "return {0}(*args, **kwargs)"
         dispatch_str_no_ret = "{0}(*args, **kwargs)"
+        table_str = "{0}"
+        table_val = "{0}"
+        exact_call = "meth(*args)"
         argfill = ", ".join(['*args', '**kwargs'])
     lines  = ['def {0}({1}):'.format(name, argfill)]
     lines += [] if doc is None else indent('\"\"\"{0}\"\"\"'.format(doc), join=False)
-    types = ["types = set([(i, type(a)) for i, a in enumerate(args)])",
-             "types.update([(k, type(v)) for k, v in kwargs.items()])",]
-    lines += indent(types, join=False)
     refinenum = lambda x: (sum([int(ts.isrefinement(a[1])) for a in x[0][1:]]),
                            len(x[0]), x[1])
     mangitems = sorted(name_mangled.items(), key=refinenum)
+    # Positional calls whose argument types exactly match a prefix of the
+    # argument types of an overload are looked up in a table keyed by the
+    # tuple of types, whose length is the arity.  Earlier overloads take
+    # precedence.  Identical type strings are only entered once, for the
+    # first overload, but distinct strings may name the same type, in which
+    # case the last entry of the dict literal wins, so the entries are
+    # written in reverse.  This table takes the place of fused types with
+    # cpdef: overloads differ in arity and in types which are not C types,
+    # such as strings, refinements, containers, and wrapped classes, and
+    # their arguments are converted by the Python-level py2c code of the
+    # type system, so there is no single fused signature to specialize.
+    table = sorted(name_mangled.values())[0].rsplit('_', 1)[0] + '_dispatch'
+    entries, seen = [], set()
+    for key, mangled_name in mangitems:
+        pytypes = [ts.cython_pytype(ca[1]) for ca in key[1:]]
+        for n in range(len(pytypes) + 1):
+            tkey = "(" + "".join([pyt + ", " for pyt in pytypes[:n]]).rstrip() + ")"
+            if tkey not in seen:
+                seen.add(tkey)
+                entries.append("{0}: {1}".format(tkey,
+                                                 table_val.format(mangled_name)))
+    tablelines = [table + " = {"] + indent([e + "," for e in entries[::-1]],
+                                           join=False) + ["    }"]
+    exact = ["meth = {0}.get(tuple(map(type, args)), None)".format(
+                table_str.format(table)),
+             "if meth is not None:"]
+    exact += indent(("return " + exact_call) if hasrtn else \
+                    [exact_call, "return"], join=False)
+    lines += indent("# table dispatch for exactly matching positional types",
+                    join=False)
+    lines += indent("if 0 == len(kwargs):", join=False)
+    lines += indent(indent(exact, join=False), join=False)
+    lines += indent("else:", join=False)
+    types = ["types = set([(i, type(a)) for i, a in enumerate(args)])",
+             "types.update([(k, type(v)) for k, v in kwargs.items()])",]
+    lines += indent(indent(types, join=False), join=False)
     mtypeslines = []
-    lines += indent("# vtable-like dispatch for exactly matching types", join=False)
+    lines += indent(indent("# vtable-like dispatch for exactly matching types",
+                           join=False), join=False)
     for key, mangled_name in mangitems:
         cargs = key[1:]
         arang = range(len(cargs))
@@ -1174,8 +1242,8 @@ def _gen_dispatcher(name, name_mangled, ts, doc=None, hasrtn=True, is_method=Tru
         else:
             rline = [dispatch_str_no_ret.format(mangled_name), "return"]
         cond += indent(rline, join=False)
-        lines += indent(cond, join=False)
-    lines = sorted(mtypeslines) + [''] +  lines
+        lines += indent(indent(cond, join=False), join=False)
+    lines = sorted(mtypeslines) + tablelines + [''] +  lines
     lines += indent("# duck-typed dispatch based on whatever works!", join=False)
     refineopp = lambda x: (-1*sum([int(ts.isrefinement(a[1])) for a in x[0][1:]]), len(x[0]), x[1])
     mangitems = sorted(name_mangled.items(), key=refineopp)
@@ -1410,7 +1478,8 @@ def classpyx(desc, classes=None, ts=None, max_callbacks=8):
             mdoc = _doc_add_sig(mdoc, mcyname, margs, mdefs)
             mlines += _gen_function(mcyname, mname_mangled, margs, mrtn, mdefs,
                                     ts, mdoc, inst_name=minst_name,
-                                    is_method=True)
+                                    is_method=True, nogil=_nogil(
+                                        classes.get(mcname, desc), mbasename))
             if 1 < methcounts[mname] and currcounts[mname] == methcounts[mname]:
                 # write dispatcher
                 nm = dict([(k, v) for k, v in mangled_mnames.items() \
@@ -1555,7 +1624,8 @@ def funcpyx(desc, ts=None):
         fdoc = desc.get('docstring', nodocmsg.format(fcyname))
         fdoc = _doc_add_sig(fdoc, fcyname, fargs, fdefs, ismethod=False)
         flines += _gen_function(fcyname, fname_mangled, fargs, frtn, fdefs, ts,
-                                fdoc, inst_name=inst_name, is_method=False)
+                                fdoc, inst_name=inst_name, is_method=False,
+                                nogil=_nogil(desc))
         if 1 < funccounts[fname] and currcounts[fname] == funccounts[fname]:
             # write dispatcher
             nm = dict([(k, v) for k, v in mangled_fnames.items() if k[0] == fname])
@@ -1567,6 +1637,145 @@ def funcpyx(desc, ts=None):
         extra['pyx_filename'] = '{0}.pyx'.format(extra['name']['tarbase'])
     return import_tups, cimport_tups, pyx
 
+#
+# Incremental generation
+#
+
+def _names_in(x, names):
+    # adds all strings found in nested containers to names
+    if isinstance(x, basestring):
+        names.add(x)
+    elif isinstance(x, dict):
+        for key, value in x.items():
+            _names_in(key, names)
+            _names_in(value, names)
+    elif isinstance(x, (tuple, list, set, frozenset)):
+        for y in x:
+            _names_in(y, names)
+    return names
+
+@memoize
+def _generator_digest():
+    # digest of the source of this module and the type system, so that
+    # changes to the generated code are noticed between releases, or None
+    # if the source is not installed
+    h = md5()
+    typesdir = os.path.join(os.path.dirname(__file__), 'types')
+    for f in [__file__] + sorted(glob.glob(os.path.join(typesdir, '*.py'))):
+        f = f[:-1] if f.endswith('.pyc') else f
+        try:
+            with io.open(f, 'rb') as src:
+                h.update(src.read())
+        except IOError:
+            return None
+    return h.hexdigest()
+
+def module_fingerprint(mod, classes, entries, max_callbacks=8):
+    """Computes a fingerprint of everything that the files of a module are
+    generated from.  This covers the module description, the descriptions of
+    the classes from other modules that it refers to, the type system entries
+    that mention any type it refers to, the xdress version and the source of
+    the code generators, and max_callbacks.  References are followed
+    transitively, through parent classes and type
+    aliases for example.
+
+    Parameters
+    ----------
+    mod : dict
+        Module description dictonary.
+    classes : dict
+        Maps all class names in the environment to their descriptions.
+    entries : list of tuples
+        The type system entries, see TypeSystem.registrations().
+    max_callbacks : int, optional
+        The default maximum number of callbacks for function pointers.
+
+    Returns
+    -------
+    fingerprint : str or None
+        A digest which is the same in every process, see stabledigest(), or None
+        if the module or the source of the code generators cannot be
+        fingerprinted.
+
+    """
+    # entries whose keys do not name a type, such as the names of the dtypes
+    # and stlcontainers modules, may affect any module
+    index, touched = {}, []
+    for i, (field, key, value) in enumerate(entries):
+        keynames = _names_in(key, set())
+        if 0 == len(keynames):
+            touched.append(i)
+        for name in keynames:
+            index.setdefault(name, []).append(i)
+    refclasses = {}
+    seen = set()
+    todo = _names_in(mod, set())
+    while 0 < len(todo):
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        more = set()
+        if name in classes and name not in mod:
+            refclasses[name] = classes[name]
+            _names_in(classes[name], more)
+        for i in index.get(name, ()):
+            touched.append(i)
+            _names_in(entries[i][2], more)
+        todo |= more - seen
+    touched = dict([(entries[i][:2], entries[i][2]) for i in touched])
+    generator = _generator_digest()
+    if generator is None:
+        return None
+    return stabledigest(xdress_version, generator, max_callbacks, mod,
+                        refclasses, touched)
+
+#
+# Parallel generation
+#
+
+_worker_ts = None
+_worker_classes = None
+_worker_max_callbacks = 8
+
+def _init_codegen_worker(tsdump, classes, max_callbacks):
+    global _worker_ts, _worker_classes, _worker_max_callbacks
+    _worker_ts = pickle.loads(tsdump)
+    _worker_classes = classes
+    _worker_max_callbacks = max_callbacks
+
+def _codegen_worker(args):
+    # Generates the files of one module starting from the type system snapshot.
+    # Returns the cpp_*.pxd, *.pxd, and *.pyx strings (None where the module has
+    # no such file) along with the keys that generating added to the
+    # descriptions, or None if generating failed so that the caller may retry
+    # serially.
+    modname, mod = args
+    ts = _worker_ts
+    # the module's own class descriptions, as when generating serially
+    classes = dict(_worker_classes)
+    classes.update([(n, d) for n, d in mod.items() if isclassdesc(d)])
+    before = dict([(n, (set(d), set(d.get('extra', ())))) \
+                   for n, d in mod.items() if isinstance(d, dict)])
+    env = {modname: mod}
+    try:
+        cpppxd = gencpppxd(env, ts=ts).get(modname, None)
+        pxd = genpxd(env, classes, ts=ts,
+                     max_callbacks=_worker_max_callbacks).get(modname, None)
+        pyx = genpyx(env, classes, ts=ts,
+                     max_callbacks=_worker_max_callbacks).get(modname, None)
+    except Exception:
+        return None
+    added = {}
+    for n, (keys, extrakeys) in before.items():
+        d = mod[n]
+        extra = d.get('extra', {})
+        newkeys = dict([(k, d[k]) for k in d if k not in keys])
+        newextra = dict([(k, extra[k]) for k in extra if k not in extrakeys])
+        if 0 < len(newkeys) or 0 < len(newextra):
+            added[n] = (newkeys, newextra)
+    return cpppxd, pxd, pyx, added
+
 #
 # Plugin
 #
@@ -1578,15 +1787,21 @@ class XDressPlugin(Plugin):
     requires = ('xdress.autodescribe',)
     """This plugin requires autodescribe."""
 
-    defaultrc = {'max_callbacks': 8}
+    defaultrc = {'max_callbacks': 8, 'release_gil': ()}
 
     rcdocs = {
         "max_callbacks": "The maximum number of callbacks for function pointers",
+        "release_gil": ("Patterns for the target names of the functions and "
+                        "classes, or 'Class.method' methods, whose wrappers "
+                        "release the GIL around the C/C++ call, as does a "
+                        "'nogil' key set to True in their sidecars"),
         }
 
     def update_argparser(self, parser):
         parser.add_argument('--max-callbacks', type=int, dest="max_callbacks",
                     help=self.rcdocs["max_callbacks"])
+        parser.add_argument('--release-gil', nargs='+', dest="release_gil",
+                    help=self.rcdocs["release_gil"])
 
     def setup(self, rc):
         if rc.max_callbacks < 1:
@@ -1601,33 +1816,219 @@ class XDressPlugin(Plugin):
     def execute(self, rc):
         print("cythongen: creating C/C++ API wrappers")
         env = rc.env
+        if 0 < len(rc.release_gil):
+            _mark_nogil(env, rc.release_gil)
+        _unsafe_nogil(env, rc.ts)
         classes = {}
         for modname, mod in env.items():
             for name, desc in mod.items():
                 if isclassdesc(desc):
                     classes[name] = desc
 
-        # generate all files
-        cpppxds = gencpppxd(env, ts=rc.ts)
-        pxds = genpxd(env, classes, ts=rc.ts, max_callbacks=rc.max_callbacks)
-        pyxs = genpyx(env, classes, ts=rc.ts, max_callbacks=rc.max_callbacks)
+        # skip the modules whose files were generated from the same inputs, in
+        # an earlier run or earlier in this process
+        record = os.path.join(rc.builddir, 'cythongen.fingerprint')
+        entries = rc.ts.registrations()
+        inputs, filenames, todo = {}, {}, {}
+        for modname, mod in env.items():
+            filenames[modname] = [os.path.join(rc.packagedir, mod[k]) for k in \
+                ('srcpxd_filename', 'pxd_filename', 'pyx_filename') \
+                if mod.get(k, None) is not None]
+            inputs[modname] = module_fingerprint(mod, classes, entries,
+                                                 rc.max_callbacks)
+            if not generated_from(('cythongen', modname), inputs[modname],
+                                  filenames[modname], record):
+                todo[modname] = mod
+        if len(todo) < len(env):
+            print("cythongen: {0} of {1} modules are unchanged".format(
+                  len(env) - len(todo), len(env)))
+
+        # generate all files, in parallel with more than one job and serially
+        # for the rest
+        serial = todo
+        if 1 < rc.jobs and 1 < len(todo):
+            serial = self.generate_parallel(todo, classes, rc)
+        cpppxds = gencpppxd(serial, ts=rc.ts)
+        pxds = genpxd(serial, classes, ts=rc.ts, max_callbacks=rc.max_callbacks)
+        pyxs = genpyx(serial, classes, ts=rc.ts, max_callbacks=rc.max_callbacks)
 
         # write out all files
-        for key, cpppxd in cpppxds.items():
-            newoverwrite(cpppxd, os.path.join(rc.packagedir,
-                         env[key]['srcpxd_filename']), rc.verbose)
-        for key, pxd in pxds.items():
-            newoverwrite(pxd, os.path.join(rc.packagedir,
-                         env[key]['pxd_filename']), rc.verbose)
-        for key, pyx in pyxs.items():
-            newoverwrite(pyx, os.path.join(rc.packagedir,
-                         env[key]['pyx_filename']), rc.verbose)
+        for modname in serial:
+            self.write_module(env[modname], cpppxds.get(modname, None),
+                              pxds.get(modname, None), pyxs.get(modname, None),
+                              rc)
+        for modname in todo:
+            note_generated(('cythongen', modname), inputs[modname],
+                           filenames[modname], record)
+        dump_generated(record)
+
+    def write_module(self, mod, cpppxd, pxd, pyx, rc):
+        """Writes out the generated files of a module, skipping those which are
+        None."""
+        for s, key in ((cpppxd, 'srcpxd_filename'), (pxd, 'pxd_filename'),
+                       (pyx, 'pyx_filename')):
+            if s is not None:
+                newoverwrite(s, os.path.join(rc.packagedir, mod[key]),
+                             rc.verbose)
+
+    def generate_parallel(self, todo, classes, rc):
+        """Generates and writes out the files of modules using a pool of rc.jobs
+        processes.  Each worker starts from a snapshot of the type system and
+        generates one module at a time.  Files are written as the results
+        arrive, and the keys which generating adds to the descriptions are
+        copied back, so that the output and the environment end up the same as
+        when generating serially.
+
+        Parameters
+        ----------
+        todo : dict
+            Maps the names of the modules to generate to their descriptions.
+        classes : dict
+            Maps all class names in the environment to their descriptions.
+        rc : xdress.utils.RunControl
+            Run contoler for this xdress execution.
+
+        Returns
+        -------
+        serial : dict
+            The modules which failed to generate in parallel, and must be
+            generated serially.
+
+        """
+        try:
+            tsdump = pickle.dumps(rc.ts, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            msg = "type system could not be pickled, generating serially: {0}"
+            warnings.warn(msg.format(e), RuntimeWarning)
+            return todo
+        if rc.verbose:
+            print("cythongen: generating {0} modules with {1} jobs".format(
+                  len(todo), rc.jobs))
+        tasks = sorted(todo.items(), key=lambda item: item[0])
+        serial = {}
+        pool = multiprocessing.Pool(min(rc.jobs, len(tasks)),
+                                    initializer=_init_codegen_worker,
+                                    initargs=(tsdump, classes, rc.max_callbacks))
+        try:
+            results = pool.imap(_codegen_worker, tasks, chunksize=1)
+            for (modname, mod), result in zip(tasks, results):
+                if result is None:
+                    serial[modname] = mod
+                    continue
+                cpppxd, pxd, pyx, added = result
+                for name, (newkeys, newextra) in added.items():
+                    mod[name].update(newkeys)
+                    if 0 < len(newextra):
+                        mod[name]['extra'].update(newextra)
+                self.write_module(mod, cpppxd, pxd, pyx, rc)
+        finally:
+            pool.close()
+            pool.join()
+        return serial
 
 
 #
 # Misc Helpers Below
 #
 
+def _nogil(desc, name=None):
+    # whether calls to a function, or to a method of a class, release the GIL,
+    # the 'nogil' key is either a bool or a collection of method names
+    nogil = desc.get('nogil', False)
+    if isinstance(nogil, bool) or nogil is None:
+        return bool(nogil)
+    return name in nogil
+
+def _mark_nogil(env, patterns):
+    # flags the functions and classes, or 'Class.method' methods, whose names
+    # match any of the patterns to release the GIL
+    for mod in env.values():
+        for name, desc in mod.items():
+            if not isinstance(desc, dict) or desc.get('nogil', False) is True:
+                continue
+            basename = name if isinstance(name, basestring) else name[0]
+            if any([fnmatch.fnmatchcase(basename, p) for p in patterns]):
+                desc['nogil'] = True
+            elif isclassdesc(desc):
+                meths = set([m[0] if isinstance(m[0], basestring) else m[0][0] \
+                             for m in desc['methods']])
+                meths = [m for m in meths if any([fnmatch.fnmatchcase(
+                         basename + '.' + m, p) for p in patterns])]
+                if 0 < len(meths):
+                    desc['nogil'] = sorted(set(meths) | set(desc.get('nogil', ())))
+
+def _has_function_pointer(t, ts=None):
+    # whether a type is, or contains, a function pointer
+    if ts is not None:
+        try:
+            t = ts.canon(t)
+        except (TypeError, KeyError):
+            return False
+    if not isinstance(t, tuple) or 0 == len(t):
+        return False
+    return t[0] == 'function_pointer' or \
+           any([_has_function_pointer(x) for x in t])
+
+def _unsafe_nogil(env, ts):
+    # Python callbacks for function pointers are not run with the GIL held,
+    # so functions and methods which may call them must keep the GIL
+    for mod in env.values():
+        for name, desc in mod.items():
+            if not isinstance(desc, dict) or not desc.get('nogil', False):
+                continue
+            basename = name if isinstance(name, basestring) else name[0]
+            if isclassdesc(desc):
+                if any([_has_function_pointer(t, ts) for t in \
+                        desc.get('attrs', {}).values()]):
+                    desc['nogil'] = False
+                    warnings.warn("not releasing the GIL in methods of {0} since "
+                                  "it has function pointer attributes".format(
+                                  basename), RuntimeWarning)
+                    continue
+                sigs = desc['methods'].items()
+            elif isfuncdesc(desc):
+                sigs = desc['signatures'].items()
+            else:
+                continue
+            meths = set()
+            unsafe = set()
+            for key, val in sigs:
+                rtn = val.get('return', None) if isinstance(val, dict) else val
+                mname = key[0] if isinstance(key[0], basestring) else key[0][0]
+                meths.add(mname)
+                if any([_has_function_pointer(a[1], ts) for a in key[1:]]) or \
+                   _has_function_pointer(rtn, ts):
+                    unsafe.add(mname)
+            if 0 == len(unsafe):
+                continue
+            warnings.warn("not releasing the GIL in {0} since {1} function pointer "
+                          "arguments".format(", ".join(sorted(unsafe)), "they take"
+                          if 1 < len(unsafe) else "it takes"), RuntimeWarning)
+            if isclassdesc(desc):
+                nogil = meths if desc['nogil'] is True else set(desc['nogil'])
+                desc['nogil'] = sorted(nogil - unsafe)
+            else:
+                desc['nogil'] = False
+
+_cdef_name = re.compile(r'\s*cdef\s+.*?(\w+)\s*(=.*)?$')
+_c_cast = re.compile(r'<[^<>]*>')
+_root_name = re.compile(r'(?<![\w\.])([A-Za-z_]\w*)(?!\s*[\w\(])')
+
+def _cdef_names(decls):
+    # the names of the C variables declared by cdef lines
+    names = set(['self'])
+    for line in decls:
+        m = _cdef_name.match(line)
+        if m is not None:
+            names.add(m.group(1))
+    return names
+
+def _pyfree(expr, cnames):
+    # whether an expression only refers to C variables, and so may be
+    # evaluated without the GIL
+    roots = _root_name.findall(_c_cast.sub(' ', expr))
+    return all([r in cnames for r in roots])
+
 def _format_ns(desc):
     ns = desc.get('namespace', None)
     if ns is None:
@@ -0,0 +1,439 @@
+"""A warm xdress daemon, the thin client which forwards runs to it, and a
+watcher which runs xdress whenever its inputs change.
+
+:author: Anthony Scopatz <scopatz@gmail.com>
+
+Each xdress run normally pays for starting the interpreter, importing the
+plugins, loading libclang, and parsing every source file from scratch.  Running
+``xdress --serve`` in a project directory starts a daemon which instead keeps
+all of these in memory, along with the parsed ASTs and their symbol indexes.
+It listens on a Unix socket in the build directory.  While it is up, plain
+``xdress`` invocations in the same project forward their command line to the
+daemon, which performs the run with their environment variables and streams
+the output back.
+
+Before every run the daemon drops the ASTs whose files changed on disk (by
+their stat information), and gives the plugins fresh copies of their default
+run control.  The type system stays resident: it is reset to its defaults,
+which undoes the registrations of the previous run while keeping the
+memoizations that they did not affect.  Everything else that xdress caches
+is already validated against the files themselves.  What subprocesses and C
+libraries, such as gccxml and libclang, write to the standard output and
+error of the daemon is forwarded to the client along with the rest.
+
+``xdress --watch`` performs runs in the same way, except that it starts one
+itself whenever a file that the last successful run read changes.  On Linux it
+waits for changes with inotify, elsewhere it polls.  Only the descriptions that
+depend on the changed file are recomputed, and only the modules whose
+descriptions changed are regenerated.
+
+Daemon API
+==========
+"""
+from __future__ import print_function
+import os
+import sys
+import copy
+import json
+import time
+import codecs
+import select
+import signal
+import socket
+import threading
+from contextlib import contextmanager
+
+SERVING = False
+"""Whether this process is the daemon or a watcher, in which case runs are
+never forwarded."""
+
+WATCH_INTERVAL = 1.0
+"""Seconds between checks for changed files when watching."""
+
+def socket_path(builddir):
+    """Returns the path of the daemon socket for a build directory."""
+    return os.path.abspath(os.path.join(builddir, 'xdress.sock'))
+
+_send_lock = threading.Lock()
+
+def _send(conn, **msg):
+    data = (json.dumps(msg) + '\n').encode('utf-8')
+    with _send_lock:
+        conn.sendall(data)
+
+def _messages(conn):
+    # yields the newline separated JSON messages on a connection
+    buf = b''
+    while True:
+        data = conn.recv(65536)
+        if not data:
+            return
+        buf += data
+        while b'\n' in buf:
+            line, buf = buf.split(b'\n', 1)
+            yield json.loads(line.decode('utf-8'))
+
+class _Stream(object):
+    # a file-like object which sends what is written to the client
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+
+    def write(self, s):
+        if 0 < len(s):
+            _send(self.conn, **{self.name: s})
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+class _FdStream(object):
+    # sends what is written to a file descriptor, by subprocesses for example,
+    # to the client until closed
+    def __init__(self, conn, fd, name):
+        self.fd = fd
+        self.saved = os.dup(fd)
+        r, w = os.pipe()
+        os.dup2(w, fd)
+        os.close(w)
+        self.thread = threading.Thread(target=self._pump, args=(r, conn, name))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _pump(self, r, conn, name):
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        while True:
+            data = os.read(r, 65536)
+            s = decoder.decode(data, final=not data)
+            if 0 < len(s):
+                try:
+                    _send(conn, **{name: s})
+                except socket.error:
+                    pass  # keep draining, the client went away
+            if not data:
+                break
+        os.close(r)
+
+    def close(self):
+        # the pipe is closed, and so the pump finishes, once the descriptor is
+        # restored
+        os.dup2(self.saved, self.fd)
+        os.close(self.saved)
+        self.thread.join()
+
+def _setenviron(env):
+    # makes os.environ, which subprocesses inherit, equal to env
+    for key in list(os.environ.keys()):
+        if key not in env:
+            del os.environ[key]
+    for key, value in env.items():
+        if os.environ.get(key, None) != value:
+            os.environ[key] = value
+
+@contextmanager
+def _environ(env):
+    # runs the body with the environment variables env, if given, and then
+    # restores those of this process
+    if env is None:
+        yield
+        return
+    saved = dict(os.environ)
+    _setenviron(env)
+    try:
+        yield
+    finally:
+        _setenviron(saved)
+
+def _connect(sockpath):
+    # returns a connection to the daemon, or None if there is none
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(sockpath):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(sockpath)
+    except socket.error:
+        conn.close()
+        return None  # a stale socket, from a daemon which did not exit cleanly
+    return conn
+
+def forward(sockpath, args, cwd=None):
+    """Forwards an xdress run to the daemon listening on a socket.  The run
+    sees the environment variables of this process, such as PATH and CC, so
+    that it finds the same executables as a local run.
+
+    Parameters
+    ----------
+    sockpath : str
+        Path to the daemon socket.
+    args : list of str
+        The command line arguments for the run.
+    cwd : str, optional
+        Directory to perform the run in, the current one by default.
+
+    Returns
+    -------
+    status : int or None
+        The exit status of the run, or None if there is no daemon to forward
+        the run to.
+
+    """
+    conn = _connect(sockpath)
+    if conn is None:
+        return None
+    status = 1
+    try:
+        _send(conn, args=list(args), cwd=cwd or os.getcwd(),
+              env=dict(os.environ))
+        for msg in _messages(conn):
+            if 'out' in msg:
+                sys.stdout.write(msg['out'])
+                sys.stdout.flush()
+            elif 'err' in msg:
+                sys.stderr.write(msg['err'])
+                sys.stderr.flush()
+            elif 'status' in msg:
+                status = msg['status']
+    finally:
+        conn.close()
+    return status
+
+class Daemon(object):
+    """Performs xdress runs in this process, keeping the imported plugins, the
+    parsed ASTs, and their indexes in memory between them."""
+
+    def __init__(self):
+        self.defaultrcs = {}  # plugin class -> pristine default run control
+        self.ts = None  # the resident type system
+        self.nruns = 0
+
+    def _preload(self, plugins):
+        # imports the plugins of a run and remembers their pristine defaults
+        # before any run has had the chance to modify them
+        from .plugins import Plugins
+        for plugin in Plugins(plugins).plugins:
+            cls = plugin.__class__
+            if cls not in self.defaultrcs and not callable(cls.defaultrc):
+                # the type system is not copied, it is replaced by the
+                # resident one
+                ts = getattr(cls.defaultrc, 'ts', None)
+                memo = {} if ts is None else {id(ts): None}
+                self.defaultrcs[cls] = copy.deepcopy(cls.defaultrc, memo)
+
+    def _reset(self):
+        # forgets everything from earlier runs which might be out of date
+        from . import astparsers, autodescribe, utils
+        from .types.system import TypeSystem
+        if self.ts is None:
+            self.ts = TypeSystem()
+        else:
+            self.ts.reset()
+        for cls, defaultrc in self.defaultrcs.items():
+            cls.defaultrc = copy.deepcopy(defaultrc)
+            if 'ts' in cls.defaultrc:
+                cls.defaultrc.ts = self.ts
+        nstale = astparsers._parser_memo.invalidate()
+        autodescribe.clearmemo()
+        utils.find_sidecar.cache.clear()
+        return len(astparsers._parser_memo), nstale
+
+    def run(self, args, cwd, env=None):
+        """Performs an xdress run and returns its exit status.  The run sees
+        the environment variables env, if given, instead of those of this
+        process."""
+        from .main import main, _preprocess
+        os.chdir(cwd)
+        status = 0
+        try:
+            with _environ(env):
+                self._preload(_preprocess(args)[1].plugins)
+                nkept, nstale = self._reset()
+                if 0 < self.nruns:
+                    print("xdress: reusing {0} parsed files, dropped {1} which "
+                          "changed".format(nkept, nstale))
+                main(args)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                status = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                status = 1
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            status = 1
+        self.nruns += 1
+        return status
+
+    def handle(self, conn):
+        """Serves a single client connection."""
+        for msg in _messages(conn):
+            stdout, stderr = sys.stdout, sys.stderr
+            stdout.flush()
+            stderr.flush()
+            fdout, fderr = _FdStream(conn, 1, 'out'), _FdStream(conn, 2, 'err')
+            sys.stdout, sys.stderr = _Stream(conn, 'out'), _Stream(conn, 'err')
+            try:
+                status = self.run(msg['args'], msg['cwd'], msg.get('env', None))
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+                fdout.close()
+                fderr.close()
+            _send(conn, status=status)
+            return
+
+def serve(sockpath):
+    """Runs the xdress daemon, listening on a Unix socket until interrupted.
+
+    Parameters
+    ----------
+    sockpath : str
+        Path of the socket to create.
+
+    """
+    global SERVING
+    if not hasattr(socket, 'AF_UNIX'):
+        sys.exit("ERROR: xdress --serve needs Unix domain sockets")
+    if os.path.exists(sockpath):
+        conn = _connect(sockpath)
+        if conn is not None:
+            conn.close()
+            sys.exit("ERROR: an xdress daemon is already serving " + sockpath)
+        os.remove(sockpath)
+    sockdir = os.path.dirname(sockpath)
+    if not os.path.isdir(sockdir):
+        os.makedirs(sockdir)
+    cwd = os.getcwd()
+    SERVING = True
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(sockpath)
+    server.listen(5)
+    # exit through the cleanup below when terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    print("xdress: serving on " + sockpath)
+    d = Daemon()
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                d.handle(conn)
+            except socket.error:
+                pass  # the client went away
+            finally:
+                conn.close()
+                os.chdir(cwd)
+    except KeyboardInterrupt:
+        print("xdress: stopped serving")
+    finally:
+        server.close()
+        SERVING = False
+        if os.path.exists(sockpath):
+            os.remove(sockpath)
+
+# inotify flags for the changes that a watcher cares about
+_IN_CHANGES = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+def _inotify(dirs):
+    # returns a non-blocking inotify descriptor watching dirs, or None
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for d in dirs:
+        libc.inotify_add_watch(fd, d.encode(sys.getfilesystemencoding()),
+                               _IN_CHANGES)
+    return fd
+
+def _statkey(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+def wait_for_change(paths, interval=None):
+    """Blocks until one of the files is modified, created, or removed.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        Paths to the files to watch.
+    interval : float, optional
+        Seconds between checks of the files, WATCH_INTERVAL by default.  With
+        inotify, files are also checked as soon as anything in their
+        directories changes.
+
+    Returns
+    -------
+    path : str
+        The file that changed.
+
+    """
+    interval = WATCH_INTERVAL if interval is None else interval
+    paths = sorted(paths)
+    before = dict([(p, _statkey(p)) for p in paths])
+    dirs = set([os.path.dirname(os.path.abspath(p)) for p in paths])
+    fd = _inotify([d for d in dirs if os.path.isdir(d)])
+    try:
+        while True:
+            if fd is None:
+                time.sleep(interval)
+            elif 0 < len(select.select([fd], [], [], interval)[0]):
+                try:
+                    while os.read(fd, 65536):
+                        pass
+                except OSError:
+                    pass  # drained
+            for p in paths:
+                if _statkey(p) != before[p]:
+                    return p
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+def watch(args, rcfile, fingerprint):
+    """Runs xdress, and then again whenever any of the files that the last
+    successful run read changes, until interrupted.  The runs are performed in
+    this process, as with the daemon.
+
+    Parameters
+    ----------
+    args : list of str
+        The command line arguments for each run.
+    rcfile : str
+        Path to the run control file, which is watched even if the runs fail.
+    fingerprint : str
+        Path to the run fingerprint file, which lists the files to watch.
+
+    """
+    global SERVING
+    from .utils import RunFingerprint
+    cwd = os.getcwd()
+    fingerprint = os.path.abspath(fingerprint)
+    SERVING = True
+    d = Daemon()
+    paths = set([rcfile])
+    try:
+        while True:
+            d.run(args, cwd)
+            os.chdir(cwd)
+            files = RunFingerprint(fingerprint).files
+            if 0 < len(files):
+                paths = set(files)
+                paths.add(rcfile)
+            print("xdress: watching {0} files for changes".format(len(paths)))
+            sys.stdout.flush()
+            changed = wait_for_change(paths)
+            print("xdress: {0} changed, running again".format(changed))
+    except KeyboardInterrupt:
+        print("xdress: stopped watching")
+    finally:
+        SERVING = False
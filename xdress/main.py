@@ -24,7 +24,7 @@ This has the following usage::
                                 [-I INCLUDES [INCLUDES ...]]
                                 [-D DEFINES [DEFINES ...]]
                                 [-U UNDEFINES [UNDEFINES ...]] [-p PARSERS]
-                                [--clear-parser-cache-period CLEAR_PARSER_CACHE_PERIOD]
+                                [--parser-cache-size PARSER_CACHE_SIZE]
                                 [--dumpast FILE] [--max-callbacks MAX_CALLBACKS]
                                 [--extra-types EXTRA_TYPES] [--make-extra-types]
                                 [--no-make-extra-types]
@@ -58,10 +58,10 @@ This has the following usage::
                             Options include 
                                 c:  ['pycparser', 'clang', 'gccxml']
                                 c++:['clang', 'gccxml', 'pycparser']
-      --clear-parser-cache-period CLEAR_PARSER_CACHE_PERIOD
-                            Number of parser calls to perform before clearing the
-                            internal cache. This prevents nasty memory overflow
-                            issues.
+      --parser-cache-size PARSER_CACHE_SIZE
+                            Approximate maximum size in bytes of the parsed ASTs
+                            kept in memory. The least recently used are evicted
+                            first.
       --dumpast FILE        Prints the abstract syntax tree of a file.
       --max-callbacks MAX_CALLBACKS
                             The maximum number of callbacks for function pointers
@@ -179,16 +179,58 @@ except ImportError:
 
 from .plugins import Plugins
 from .utils import NotSpecified, RunControl, DEFAULT_RC_FILE, DEFAULT_PLUGINS, \
-    exec_file, parse_global_rc
+    RunFingerprint, exec_file, parse_global_rc, GLOBAL_RC_FILES
+from .version import report_versions
+from . import daemon
 
 
 if sys.version_info[0] >= 3:
     basestring = str
 
 
-def main():
-    """Entry point for xdress API generation."""
-    warnings.simplefilter('default')
+# extensions of the files in the package directory that a run may write
+_output_exts = frozenset(['.py', '.pyx', '.pxd'])
+
+def _run_key(prerc, args):
+    # the parts of the run fingerprint which are not files
+    return {'xdress_version': report_versions(),
+            'command_line_arguments': [a for a in args if a != '--explain'],
+            'plugins': list(prerc.plugins),
+            'working_directory': os.getcwd(),
+            }
+
+def _run_paths(rc, plugins, rcfile):
+    # all of the files that a successful run read or wrote
+    paths = set([rcfile])
+    paths.update(GLOBAL_RC_FILES)
+    xdressdir = os.path.dirname(os.path.abspath(__file__))
+    for root, dirs, files in os.walk(xdressdir):
+        paths.update([os.path.join(root, f) for f in files if f.endswith('.py')])
+    for modname in plugins.modnames:
+        modfile = getattr(sys.modules.get(modname, None), '__file__', None)
+        if modfile is not None:
+            paths.add(modfile[:-1] if modfile.endswith('.pyc') else modfile)
+    for key in ('classes', 'functions', 'variables'):
+        for name in getattr(rc, key, ()):
+            srcfiles = getattr(name, 'srcfiles', ())
+            paths.update(srcfiles)
+            paths.update(getattr(name, 'sidecars', ()))
+            # sidecars and glob matches which may not exist yet
+            paths.update([os.path.splitext(f)[0] + '.py' for f in srcfiles])
+            paths.update([os.path.dirname(f) or os.curdir for f in srcfiles])
+    cache = getattr(rc, '_cache', None)
+    if cache is not None:
+        paths.update(cache.deps())
+    for outdir in set([getattr(rc, 'packagedir', None),
+                       getattr(rc, 'testdir', None)]):
+        if not isinstance(outdir, basestring) or not os.path.isdir(outdir):
+            continue
+        for root, dirs, files in os.walk(outdir):
+            paths.update([os.path.join(root, f) for f in files
+                          if os.path.splitext(f)[1] in _output_exts])
+    return paths
+
+def _preprocess(args):
     # Preprocess plugin names, which entails preprocessing the rc file
     preparser = argparse.ArgumentParser("XDress Pre-processor", add_help=False)
     preparser.add_argument('--rc', default=NotSpecified, 
@@ -199,24 +241,73 @@ def main():
                            help="enable bash completion", dest="bash_completion")
     preparser.add_argument('--no-bash-completion', action='store_false',
                            help="disable bash completion", dest="bash_completion")
-    prens = preparser.parse_known_args()[0]
-    predefaultrc = RunControl(rc=DEFAULT_RC_FILE, plugins=DEFAULT_PLUGINS)
+    preparser.add_argument('--builddir', default=NotSpecified,
+                           help="path to build directory")
+    preparser.add_argument('--explain', default=False, action='store_true',
+                           help="print why this run is not skipped")
+    preparser.add_argument('--serve', default=False, action='store_true',
+                           help="run as a daemon")
+    preparser.add_argument('--watch', default=False, action='store_true',
+                           help="run again whenever an input changes")
+    prens = preparser.parse_known_args(args)[0]
+    predefaultrc = RunControl(rc=DEFAULT_RC_FILE, plugins=DEFAULT_PLUGINS,
+                              builddir='build')
     prerc = RunControl()
     prerc._update(predefaultrc)
     prerc.rc = prens.rc
+    rcfile = os.path.abspath(prerc.rc)
     rcdict = {}
     if os.path.isfile(prerc.rc):
         exec_file(prerc.rc, rcdict, rcdict)
         prerc.rc = rcdict['rc'] if 'rc' in rcdict else NotSpecified
         prerc.plugins = rcdict['plugins'] if 'plugins' in rcdict else NotSpecified
+        prerc.builddir = rcdict['builddir'] if 'builddir' in rcdict else NotSpecified
     prerc._update([(k, v) for k, v in prens.__dict__.items()])    
+    return prens, prerc, rcdict, rcfile
+
+def main(args=None):
+    """Entry point for xdress API generation.
+
+    Parameters
+    ----------
+    args : list of str, optional
+        The command line arguments, sys.argv[1:] by default.
+
+    """
+    warnings.simplefilter('default')
+    args = sys.argv[1:] if args is None else list(args)
+    prens, prerc, rcdict, rcfile = _preprocess(args)
+    sockpath = daemon.socket_path(prerc.builddir)
+    if prens.serve:
+        daemon.serve(sockpath)
+        return
+    if prens.watch:
+        daemon.watch([a for a in args if a != '--watch'], rcfile,
+                     os.path.join(prerc.builddir, 'run.fingerprint'))
+        return
+
+    # skip the run if nothing has changed since the last successful one
+    fingerprint = RunFingerprint(os.path.join(prerc.builddir, 'run.fingerprint'))
+    runkey = _run_key(prerc, args)
+    reason = fingerprint.check(runkey)
+    if reason is None:
+        print("xdress: nothing has changed since the last successful run")
+        return
+
+    # hand the run over to a daemon for this project, if one is serving
+    if not daemon.SERVING:
+        status = daemon.forward(sockpath, args)
+        if status is not None:
+            sys.exit(status or None)
+    if prens.explain:
+        print("xdress: running because " + reason)
 
     # run plugins
     plugins = Plugins(prerc.plugins)
     parser = plugins.build_cli()
     if argcomplete is not None and prerc.bash_completion:
         argcomplete.autocomplete(parser)
-    ns = parser.parse_args()
+    ns = parser.parse_args(args)
     rc = plugins.merge_rcs()
     rc._update(parse_global_rc())
     rc._update(rcdict)
@@ -224,6 +315,7 @@ def main():
     plugins.setup()
     plugins.execute()
     plugins.teardown()
+    fingerprint.update(runkey, _run_paths(rc, plugins, rcfile))
     plugins.exit()
 
 if __name__ == '__main__':
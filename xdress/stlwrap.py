@@ -16,7 +16,7 @@ import pprint
 from .plugins import Plugin
 from .types.system import TypeSystem
 from .utils import newoverwrite, newcopyover, ensuredirs, indent, indentstr, \
-    RunControl, NotSpecified
+    RunControl, NotSpecified, digest, generated_from, note_generated
 
 if sys.version_info[0] >= 3: 
     basestring = str
@@ -960,7 +960,15 @@ class XDressPlugin(Plugin):
         testdir = rc.testdir or rc.packagedir
         testname = os.path.join(testdir, 'tests', testname)
         ensuredirs(testname)
+        inputs = digest(rc.stlcontainers, rc.ts, rc.package)
+        base = fname[:-4] if fname.endswith('.pyx') else fname
+        filenames = [base + '.pyx', base + '.pxd', testname if \
+                     testname.endswith('.py') else testname + '.py']
+        if generated_from('stlwrap', inputs, filenames):
+            print("stlwrap: wrappers are unchanged")
+            return
         genfiles(rc.stlcontainers, fname=fname, testname=testname, package=rc.package, 
                  ts=rc.ts, verbose=rc.verbose)
+        note_generated('stlwrap', inputs, filenames)
 
 
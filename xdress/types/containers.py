@@ -5,12 +5,30 @@ import sys
 if sys.version_info[0] > 2:
     basestring = str
 
-from .matching import TypeMatcher
+from .matching import TypeMatcher, MatcherIndex
 
 _ensuremod = lambda x: x if x is not None and 0 < len(x) else ''
 _ensuremoddot = lambda x: x + '.' if x is not None and 0 < len(x) else ''
 
 
+_fields = ('extra_types', 'dtypes', 'stlcontainers')
+
+def _memodepends(ts, deps, key, value):
+    # tags the memoized type system values being computed with the config
+    # fields whose placeholders appear in a lazy value.  The placeholders are 
+    # found once for each value stored under a key and kept in deps.
+    cache = ts.__dict__.get('_cache', None)
+    if cache is None or 0 == len(cache._frames):
+        return
+    entry = deps.get(key, None)
+    if entry is None or entry[0] is not value:
+        s = repr(value)
+        tags = () if '{' not in s else \
+               tuple(['{' + k + '}' for k in _fields if '{' + k + '}' in s])
+        entry = deps[key] = (value, tags)
+    if 0 < len(entry[1]):
+        cache.depends(*entry[1])
+
 def _recurse_replace(x, a, b):
     if isinstance(x, basestring):
         return x.replace(a, b)
@@ -23,6 +41,7 @@ def _recurse_replace(x, a, b):
 class _LazyConfigDict(MutableMapping):
     def __init__(self, items, ts):
         self._d = items if isinstance(items, MutableMapping) else dict(items)
+        self._deps = {}  # key -> (value, placeholder tags)
         self._ts = ts
 
     def __len__(self):
@@ -37,6 +56,7 @@ class _LazyConfigDict(MutableMapping):
 
     def __getitem__(self, key):
         value = self._d[key]
+        _memodepends(self._ts, self._deps, key, value)
         kw = {'extra_types': _ensuremoddot(self._ts.extra_types),
               'dtypes': _ensuremoddot(self._ts.dtypes),
               'stlcontainers': _ensuremoddot(self._ts.stlcontainers), }
@@ -49,6 +69,7 @@ class _LazyConfigDict(MutableMapping):
 
     def __delitem__(self, key):
         del self._d[key]
+        self._deps.pop(key, None)
 
     def update(self, *args, **kwargs):
         if len(args) == 1 and len(kwargs) == 0:
@@ -70,6 +91,7 @@ class _LazyConfigDict(MutableMapping):
 class _LazyImportDict(MutableMapping):
     def __init__(self, items, ts):
         self._d = items if isinstance(items, MutableMapping) else dict(items)
+        self._deps = {}  # key -> (value, placeholder tags)
         self._ts = ts
 
     def __len__(self):
@@ -86,6 +108,7 @@ class _LazyImportDict(MutableMapping):
         value = self._d[key]
         if callable(value):
             return value
+        _memodepends(self._ts, self._deps, key, value)
         kw = {'extra_types': _ensuremod(self._ts.extra_types),
               'dtypes': _ensuremod(self._ts.dtypes),
               'stlcontainers': _ensuremod(self._ts.stlcontainers),}
@@ -98,6 +121,7 @@ class _LazyImportDict(MutableMapping):
 
     def __delitem__(self, key):
         del self._d[key]
+        self._deps.pop(key, None)
 
     def update(self, *args, **kwargs):
         if len(args) == 1 and len(kwargs) == 0:
@@ -119,7 +143,8 @@ class _LazyImportDict(MutableMapping):
 class _LazyConverterDict(MutableMapping):
     def __init__(self, items, ts):
         self._d = items if isinstance(items, MutableMapping) else dict(items)
-        self._tms = set([k for k in self._d if isinstance(k, TypeMatcher)])
+        self._deps = {}  # key -> (value, placeholder tags)
+        self._tms = MatcherIndex([k for k in self._d if isinstance(k, TypeMatcher)])
         self._ts = ts
 
     def __len__(self):
@@ -130,12 +155,11 @@ class _LazyConverterDict(MutableMapping):
             return True  # Check if key is present
         else:
             # check if any TypeMatcher keys actually match
-            for tm in self._tms:
-                if tm.matches(key):
-                    self[key] = self._d[tm]
-                    return True
-            else:
+            tm = self._tms.match(key)
+            if tm is None:
                 return False
+            self[key] = self._d[tm]
+            return True
 
     def __iter__(self):
         for k in self._d:
@@ -146,15 +170,14 @@ class _LazyConverterDict(MutableMapping):
             value = self._d[key]  # Check if key is present
         else:
             # check if any TypeMatcher keys actually match
-            for tm in self._tms:
-                if tm.matches(key):
-                    value = self._d[tm]
-                    self[key] = value
-                    break
-            else:
+            tm = self._tms.match(key)
+            if tm is None:
                 raise KeyError("{0} not found".format(key))
+            value = self._d[tm]
+            self[key] = value
         if value is None or value is NotImplemented or callable(value):
             return value
+        _memodepends(self._ts, self._deps, key, value)
         kw = {'extra_types': _ensuremoddot(self._ts.extra_types),
               'dtypes': _ensuremoddot(self._ts.dtypes),
               'stlcontainers': _ensuremoddot(self._ts.stlcontainers),}
@@ -174,6 +197,7 @@ class _LazyConverterDict(MutableMapping):
 
     def __delitem__(self, key):
         del self._d[key]
+        self._deps.pop(key, None)
         if isinstance(key, TypeMatcher):
             self._tms.remove(key)
 
@@ -187,7 +211,9 @@ class _LazyConverterDict(MutableMapping):
         else:
             raise TypeError("invalid update signature.")
         self._d.update(toup)
-        self._tms.update([k for k in toup if isinstance(k, TypeMatcher)])
+        for k in toup:
+            if isinstance(k, TypeMatcher):
+                self._tms.add(k)
 
     def __str__(self):
         return pformat(self._d)
@@ -14,6 +14,10 @@ class MatchAny(object):
         # give consistent hash value across executions
         return hash(repr(self))
 
+    def __reduce__(self):
+        # pickle by reference so that the singleton survives a round trip
+        return "MatchAny"
+
 MatchAny = MatchAny()
 
 
@@ -118,3 +122,143 @@ class TypeMatcher(object):
 
     def __repr__(self):
         return "{0}({1!r})".format(self.__class__.__name__, self._pattern)
+
+
+#
+# Discrimination tree
+#
+
+_ANY = MatchAny  # the token for a wildcard
+
+def _pattern_tokens(x, toks):
+    # a pattern flattened in preorder, where a sequence of length n is the
+    # token (n,) followed by the tokens of its elements
+    if x is MatchAny:
+        toks.append(_ANY)
+    elif isinstance(x, (tuple, list)):
+        toks.append((len(x),))
+        for y in x:
+            _pattern_tokens(y, toks)
+    else:
+        toks.append(x)
+    return toks
+
+def _type_tokens(t, toks, ends):
+    # as above, along with the index just past each token's subtree
+    i = len(toks)
+    ends.append(None)
+    if isinstance(t, (tuple, list)):
+        toks.append((len(t),))
+        for x in t:
+            _type_tokens(x, toks, ends)
+    else:
+        toks.append(t)
+    ends[i] = len(toks)
+
+class _Node(object):
+    __slots__ = ('children', 'any', 'matcher')
+
+    def __init__(self):
+        self.children = {}  # token -> node
+        self.any = None  # node after a MatchAny
+        self.matcher = None  # TypeMatcher whose pattern ends here
+
+class MatcherIndex(object):
+    """A set of TypeMatchers, indexed by a discrimination tree over the 
+    structure of their patterns.  This finds the most specific matcher for
+    a type in time proportional to the size of the type, rather than to the
+    number of matchers.  When several patterns match, the one which matches 
+    exactly at the first place where they differ wins, so the winner does 
+    not depend on the order in which the matchers were added.  The results 
+    of lookups, including failed ones, are cached until a matcher is added 
+    or removed, or until more than cachesize types have been looked up.
+    """
+
+    cachesize = 4096
+    """The maximum number of lookup results which are cached."""
+
+    def __init__(self, matchers=()):
+        self._matchers = set()
+        self._root = _Node()
+        self._cache = {}
+        for tm in matchers:
+            self.add(tm)
+
+    def __len__(self):
+        return len(self._matchers)
+
+    def __iter__(self):
+        return iter(self._matchers)
+
+    def __contains__(self, tm):
+        return tm in self._matchers
+
+    def add(self, tm):
+        """Adds a TypeMatcher to the index."""
+        if tm in self._matchers:
+            self.remove(tm)
+        node = self._root
+        for tok in _pattern_tokens(tm.pattern, []):
+            if tok is _ANY:
+                if node.any is None:
+                    node.any = _Node()
+                node = node.any
+            else:
+                if tok not in node.children:
+                    node.children[tok] = _Node()
+                node = node.children[tok]
+        node.matcher = tm
+        self._matchers.add(tm)
+        self._cache.clear()
+
+    def remove(self, tm):
+        """Removes a TypeMatcher from the index, raising a KeyError if it is
+        not present."""
+        self._matchers.remove(tm)
+        node = self._root
+        for tok in _pattern_tokens(tm.pattern, []):
+            node = node.any if tok is _ANY else node.children[tok]
+        node.matcher = None
+        self._cache.clear()
+
+    def discard(self, tm):
+        """Removes a TypeMatcher from the index if it is present."""
+        if tm in self._matchers:
+            self.remove(tm)
+
+    def clearcache(self):
+        """Forgets the results of earlier lookups."""
+        self._cache.clear()
+
+    def match(self, t):
+        """Returns the most specific TypeMatcher which matches the type, or
+        None if none do."""
+        try:
+            return self._cache[t]
+        except KeyError:
+            cacheable = True
+        except TypeError:
+            cacheable = False  # unhashable
+        toks, ends = [], []
+        _type_tokens(t, toks, ends)
+        tm = self._search(self._root, toks, ends, 0)
+        if cacheable:
+            if self.cachesize <= len(self._cache):
+                self._cache.clear()
+            self._cache[t] = tm
+        return tm
+
+    def _search(self, node, toks, ends, i):
+        if i == len(toks):
+            return node.matcher
+        try:
+            child = node.children.get(toks[i], None)
+        except TypeError:
+            child = None  # unhashable tokens only match wildcards
+        if child is not None:
+            tm = self._search(child, toks, ends, i + 1)
+            if tm is not None:
+                return tm
+        if node.any is not None:
+            return self._search(node.any, toks, ends, ends[i])
+        return None
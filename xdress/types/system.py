@@ -267,7 +267,8 @@ try:
 except ImportError:
     import pickle
 
-from xdress.utils import Arg, memoize_method, infer_format
+from xdress.utils import Arg, memoize_method, infer_format, TaggedMemo, \
+    NotSpecified
 from .containers import (_LazyConfigDict, _LazyConverterDict,
                               _LazyImportDict)
 from .defaults import get_defaults
@@ -275,6 +276,83 @@ from .defaults import get_defaults
 if sys.version_info[0] >= 3:
     basestring = str
 
+# config fields which memoized values may depend on, see _switchmemo()
+_MEMO_FIELDS = ('extra_types', 'dtypes', 'stlcontainers')
+_MEMO_FIELD_TAGS = frozenset(['{' + f + '}' for f in _MEMO_FIELDS])
+
+class CanonType(tuple):
+    """An interned, immutable canonical type.  This is a tuple, and so it may be
+    used anywhere that a type tuple may be.  There is only ever one CanonType
+    with a given value, its hash is computed once, and two CanonTypes compare
+    by identity.  Plain tuples compare equal to, and hash the same as, the
+    CanonType with the same value.  The interned types which nothing else
+    refers to are forgotten whenever a type system is reset.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, t):
+        t = tuple([_intern(x) for x in t])
+        self = _canon_types.get(t, None)
+        if self is None:
+            self = tuple.__new__(cls, t)
+            _canon_hashes[id(self)] = tuple.__hash__(self)
+            _canon_types[self] = self
+        return self
+
+    def __hash__(self):
+        return _canon_hashes[id(self)]
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(other) is CanonType:
+            return False
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    def __reduce__(self):
+        return (CanonType, (tuple(self),))
+
+_canon_types = {}  # the interned canonical types, by value
+_canon_hashes = {}  # id of an interned canonical type -> its hash
+
+def _prune_canon_types():
+    # Forgets the interned canonical types which nothing else refers to any
+    # more, so that the table does not keep every type ever seen.  A type
+    # which is still referred to is never forgotten, since another CanonType
+    # with the same value would then not compare equal to it.  Returns the
+    # number of types forgotten.
+    if not hasattr(sys, 'getrefcount'):
+        return 0
+    n = 0
+    while True:
+        # the table holds two references, and the loop and call one each
+        dead = [t for t in _canon_types if sys.getrefcount(t) <= 4]
+        if 0 == len(dead):
+            return n
+        for t in dead:
+            del _canon_types[t]
+            del _canon_hashes[id(t)]
+        n += len(dead)
+        # forgetting a type releases the types that it contains
+        del dead, t
+
+def _intern(t):
+    # interns every tuple in a type
+    if type(t) is tuple:
+        return CanonType(t)
+    return t
+
+def _basename(t):
+    # the outermost name of a type, which every type built from it contains
+    while not isinstance(t, basestring):
+        t = t[0]
+    return t
+
 class TypeSystem(object):
     """A class representing a type system.
     """
@@ -367,6 +445,11 @@ class TypeSystem(object):
 
         """
         defaults = get_defaults()
+        if '_cache' in self.__dict__:
+            self._cache.clear()  # the bound memoized methods refer to it
+        else:
+            self._cache = TaggedMemo()
+        self._localclasses = ()
 
         self.base_types = base_types if base_types is not None else defaults['base_types']
         self.template_types = template_types if template_types is not None else defaults['template_types']
@@ -537,6 +620,146 @@ class TypeSystem(object):
             else:
                 setattr(self, k, v)
 
+    def __getstate__(self):
+        # The defaults contain closures and lambdas which cannot be pickled.
+        # Therefore only the differences from a freshly constructed type system
+        # are stored and the defaults are rebuilt when unpickling.
+        defaults = get_defaults()
+        state = {}
+        for k in self.datafields:
+            if not hasattr(self, k):
+                state[k] = ('missing', None)
+                continue
+            x = getattr(self, k)
+            derived = _derived_keys(x) if isinstance(x, _LazyConverterDict) else ()
+            x = getattr(x, '_d', x)
+            d = defaults.get(k, None)
+            if isinstance(x, Mapping) and isinstance(d, Mapping):
+                added = dict([(key, value) for key, value in x.items() \
+                              if key not in derived and (key not in d or \
+                                 not _same_value(value, d[key]))])
+                removed = [key for key in d if key not in x]
+                state[k] = ('mapping', (added, removed))
+            elif isinstance(x, Set) and isinstance(d, Set):
+                state[k] = ('set', (x - d, d - x))
+            else:
+                state[k] = ('value', x)
+        if self.typestr is not typestr:
+            state['typestr'] = ('value', self.typestr)
+        return state
+
+    def __setstate__(self, state):
+        self.__init__()
+        for k, (kind, value) in state.items():
+            if kind == 'missing':
+                delattr(self, k)
+            elif kind == 'value':
+                setattr(self, k, value)
+            elif kind == 'mapping':
+                added, removed = value
+                x = getattr(self, k)
+                for key in removed:
+                    del x[key]
+                x.update(added)
+            elif kind == 'set':
+                added, removed = value
+                x = getattr(self, k)
+                x -= removed
+                x |= added
+
+    def registrations(self):
+        """Returns the ways in which this type system differs from a freshly
+        constructed one, such as the types which have been registered, along
+        with the fields which are not containers, such as dtypes.
+
+        Returns
+        -------
+        entries : list of (str, key, value) tuples
+            The data field, the key or set member, and its value.  Removed keys
+            and members have a value of NotSpecified, added members a value of
+            True.  Fields which are not containers have a key of None.
+
+        """
+        entries = []
+        for k, (kind, value) in sorted(self.__getstate__().items()):
+            if kind == 'mapping':
+                added, removed = value
+                entries += [(k, key, x) for key, x in added.items()]
+                entries += [(k, key, NotSpecified) for key in removed]
+            elif kind == 'set':
+                added, removed = value
+                entries += [(k, x, True) for x in added]
+                entries += [(k, x, NotSpecified) for x in removed]
+            elif kind == 'value':
+                entries.append((k, None, value))
+            else:
+                entries.append((k, None, NotSpecified))
+        return entries
+
+    def reset(self):
+        """Restores this type system to the state of a freshly constructed one,
+        undoing every registration and change.  Unlike constructing a new type
+        system, this keeps the memoizations which the changes do not affect.
+
+        Returns
+        -------
+        n : int
+            The number of entries which were restored.
+
+        """
+        fresh = TypeSystem()
+        changed = []
+        nvalues = 0
+        for k in self.datafields:
+            x, y = getattr(self, k), getattr(fresh, k)
+            if isinstance(y, Mapping):
+                # keys filled in from TypeMatchers are kept while those remain
+                derived = _derived_keys(x) if isinstance(x, _LazyConverterDict) \
+                          else set()
+                xd, yd = getattr(x, '_d', x), getattr(y, '_d', y)
+                for key in list(xd.keys()):
+                    if key in derived:
+                        continue
+                    if key not in yd:
+                        del x[key]
+                        changed.append(key)
+                    elif not _same_value(xd[key], yd[key]):
+                        x[key] = yd[key]
+                        changed.append(key)
+                for key in yd:
+                    if key not in xd:
+                        x[key] = yd[key]
+                        changed.append(key)
+                if 0 < len(derived):
+                    for key in derived - _derived_keys(x):
+                        del x[key]
+                        changed.append(key)
+                if isinstance(x, _LazyConverterDict):
+                    x._tms.clearcache()
+            elif isinstance(y, Set):
+                diff = (x - y) | (y - x)
+                x -= diff & x
+                x |= diff & y
+                changed += list(diff)
+            elif x != y:
+                setattr(self, k, y)
+                nvalues += 1
+        tags = set()
+        for key in changed:
+            if not isinstance(key, (basestring, tuple)):
+                tags = None  # TypeMatchers may match anything
+                break
+            tags.add(_basename(key))
+        if self.typestr is not fresh.typestr:
+            self.typestr = fresh.typestr
+            tags = None
+        if tags is None:
+            self.clearmemo()
+        else:
+            self.invalidatememo(*tags)
+        _prune_canon_types()
+        return len(changed) + nvalues
+
     def __str__(self):
         s = pformat(dict([(k, getattr(self, k, None)) for k in \
                                                       sorted(self.datafields)]))
@@ -647,7 +870,11 @@ class TypeSystem(object):
 
     @memoize_method
     def canon(self, t):
-        """Turns the type into its canonical form. See module docs for more information."""
+        """Turns the type into its canonical form. See module docs for more information.
+        Compound canonical types are interned CanonType tuples."""
+        return _intern(self._canon(t))
+
+    def _canon(self, t):
         if isinstance(t, basestring):
             if t in self.base_types:
                 return t
@@ -1520,6 +1747,7 @@ class TypeSystem(object):
             self.cython_classnames[name] = cython_template_class_name
         if (cython_template_function_name is not None):
             self.cython_functionnames[name] = cython_template_function_name
+        self.invalidatememo(name)
 
     def deregister_class(self, name):
         """This function will remove a previously registered class from
@@ -1547,7 +1775,7 @@ class TypeSystem(object):
         self.cython_py2c_conv.pop(name, None)
         self.cython_classnames.pop(name, None)
 
-        self.clearmemo()
+        self.invalidatememo(name)
 
     def register_classname(self, classname, package, pxd_base, cpppxd_base,
                            cpp_classname=None, make_dtypes=True):
@@ -1761,6 +1989,7 @@ class TypeSystem(object):
             cython_py2c = (cython_py2c, False)
         if cython_py2c is not None:
             self.cython_py2c_conv[name] = cython_py2c
+        self.invalidatememo(_basename(name))
 
     def deregister_refinement(self, name):
         """This function will remove a previously registered refinement from
@@ -1772,7 +2001,7 @@ class TypeSystem(object):
         self.cython_cimports.pop(name, None)
         self.cython_cyimports.pop(name, None)
         self.cython_pyimports.pop(name, None)
-        self.clearmemo()
+        self.invalidatememo(_basename(name))
 
     def register_specialization(self, t, cython_c_type=None, cython_cy_type=None,
                                 cython_py_type=None, cython_cimport=None,
@@ -1793,6 +2022,7 @@ class TypeSystem(object):
             self.cython_cyimports[t] = cython_cyimport
         if cython_pyimport is not None:
             self.cython_pyimports[t] = cython_pyimport
+        self.invalidatememo(_basename(t))
 
     def deregister_specialization(self, t):
         """This function will remove previously registered template specialization."""
@@ -1803,7 +2033,7 @@ class TypeSystem(object):
         self.cython_cimports.pop(t, None)
         self.cython_cyimports.pop(t, None)
         self.cython_pyimports.pop(t, None)
-        self.clearmemo()
+        self.invalidatememo(_basename(t))
 
     def register_numpy_dtype(self, t, cython_cimport=None, cython_cyimport=None,
                              cython_pyimport=None):
@@ -1834,6 +2064,7 @@ class TypeSystem(object):
         x = x + _ensure_importable(self.cython_pyimports._d.get(t, None))
         x = x + _ensure_importable(cython_pyimport)
         self.cython_pyimports[t] = x
+        self.invalidatememo(_basename(t))
 
     def register_argument_kinds(self, t, argkinds):
         """Registers an argument kind tuple into the type system for a template type.
@@ -1878,13 +2109,56 @@ class TypeSystem(object):
         # see utils.memozie_method
         if hasattr(self, '_cache'):
             self._cache.clear()
+        self._memogen = self.__dict__.get('_memogen', 0) + 1
+
+    def invalidatememo(self, *tags):
+        """Clears only the method memoizations on this type system instance
+        which depend on any of the given tags, which are usually type names.
+        Returns the number of memoizations that were cleared."""
+        # see utils.TaggedMemo
+        if 0 < len(tags):
+            self._memogen = self.__dict__.get('_memogen', 0) + 1
+        if hasattr(self, '_cache'):
+            return self._cache.invalidate(*tags)
+        return 0
+
+    def memostamp(self):
+        """Returns a value which changes whenever the method memoizations on
+        this type system are cleared, invalidated, or switch context.  Results
+        derived from the type system elsewhere may be cached alongside it."""
+        d = self.__dict__
+        context = d['_cache']._context if '_cache' in d else None
+        return (d.get('_memogen', 0), context)
+
+    def _switchmemo(self):
+        # Memoizations which depend on the config fields or on the local 
+        # classes are kept separately for each of their values, so that they
+        # survive swap_dtypes(), swap_stlcontainers(), and local_classes().
+        d = self.__dict__
+        if '_cache' not in d:
+            return
+        local = d.get('_localclasses', ())
+        context = tuple([d.get(f, None) for f in _MEMO_FIELDS]) + (local,)
+        tags = set(_MEMO_FIELD_TAGS)
+        for classnames, typesets in local:
+            tags.update(classnames)
+        self._cache.switch(context, tags)
+
+    def __setattr__(self, name, value):
+        super(TypeSystem, self).__setattr__(name, value)
+        if name in _MEMO_FIELDS:
+            self._switchmemo()
+
+    def __delattr__(self, name):
+        super(TypeSystem, self).__delattr__(name)
+        if name in _MEMO_FIELDS:
+            self._switchmemo()
 
     def delmemo(self, meth, *args, **kwargs):
         """Deletes a single key from a method on this type system instance."""
         # see utils.memozie_method
-        if hasattr(self, '_cache'):
-            meth = getattr(self, meth )if isinstance(meth, basestring) else meth
-            del self._cache[meth.func.meth, args, tuple(sorted(kwargs.items()))]
+        meth = getattr(self, meth) if isinstance(meth, basestring) else meth
+        meth.forget(*args, **kwargs)
 
     @contextmanager
     def swap_dtypes(self, s):
@@ -1892,10 +2166,10 @@ class TypeSystem(object):
         with a new value and replacing the original value before exiting."""
         old = self.dtypes
         self.dtypes = s
-        self.clearmemo()
-        yield
-        self.clearmemo()
-        self.dtypes = old
+        try:
+            yield
+        finally:
+            self.dtypes = old
 
     @contextmanager
     def swap_stlcontainers(self, s):
@@ -1903,10 +2177,10 @@ class TypeSystem(object):
         with a new value and replacing the original value before exiting."""
         old = self.stlcontainers
         self.stlcontainers = s
-        self.clearmemo()
-        yield
-        self.clearmemo()
-        self.stlcontainers = old
+        try:
+            yield
+        finally:
+            self.stlcontainers = old
 
     @contextmanager
     def local_classes(self, classnames, typesets=frozenset(['cy', 'py'])):
@@ -1919,16 +2193,21 @@ class TypeSystem(object):
                 saved[name, 'cy'] = _undot_class_name(name, self.cython_cytypes)
             if 'py' in typesets and name in self.cython_pytypes:
                 saved[name, 'py'] = _undot_class_name(name, self.cython_pytypes)
-        self.clearmemo()
-        yield
-        for name in classnames:
-            if 'c' in typesets and name in self.cython_ctypes:
-                _redot_class_name(name, self.cython_ctypes, saved[name, 'c'])
-            if 'cy' in typesets and name in self.cython_cytypes:
-                _redot_class_name(name, self.cython_cytypes, saved[name, 'cy'])
-            if 'py' in typesets and name in self.cython_pytypes:
-                _redot_class_name(name, self.cython_pytypes, saved[name, 'py'])
-        self.clearmemo()
+        outer = self._localclasses
+        self._localclasses = outer + ((frozenset(classnames), frozenset(typesets)),)
+        self._switchmemo()
+        try:
+            yield
+        finally:
+            for name in classnames:
+                if 'c' in typesets and name in self.cython_ctypes:
+                    _redot_class_name(name, self.cython_ctypes, saved[name, 'c'])
+                if 'cy' in typesets and name in self.cython_cytypes:
+                    _redot_class_name(name, self.cython_cytypes, saved[name, 'cy'])
+                if 'py' in typesets and name in self.cython_pytypes:
+                    _redot_class_name(name, self.cython_pytypes, saved[name, 'py'])
+            self._localclasses = outer
+            self._switchmemo()
 
 #################### Type System Above This Line ##############################
 
@@ -2251,6 +2530,25 @@ def _redot_class_name(name, d, value):
         return
     d[name] = value + '.' + d[name]
 
+def _same_value(x, y):
+    # functions are compared by their code objects since the defaults are
+    # rebuilt as new closures each time.
+    if x is y:
+        return True
+    if hasattr(x, '__code__') and hasattr(y, '__code__'):
+        return x.__code__ is y.__code__
+    if isinstance(x, tuple) and isinstance(y, tuple):
+        return len(x) == len(y) and all(map(_same_value, x, y))
+    try:
+        return bool(x == y)
+    except Exception:
+        return False
+
+def _derived_keys(d):
+    # keys that were filled in from a matching TypeMatcher lookup
+    return set([key for key, value in d._d.items() if key not in d._tms and \
+                any([d._d[tm] is value and tm.matches(key) for tm in d._tms])])
+
 def _maprecurse(f, x):
     if not isinstance(x, list):
         return [f(x)]
@@ -12,6 +12,7 @@ import re
 import ast
 import sys
 import glob
+import sqlite3
 import functools
 from copy import deepcopy
 from pprint import pformat
@@ -139,27 +140,26 @@ def c_literal(s):
 def newoverwrite(s, filename, verbose=False):
     """Useful for not forcing re-compiles and thus playing nicely with the
     build system.  This is acomplished by not writing the file if the existsing
-    contents are exactly the same as what would be written out.
+    contents are exactly the same as what would be written out.  Files are
+    written through the current output manifest, see output_manifest(), so that
+    the existing contents usually need not be read back.
 
     Parameters
     ----------
-    s : str
+    s : str or bytes
         string contents of file to possible
     filename : str
         Path to file.
     vebose : bool, optional
         prints extra message
 
+    Returns
+    -------
+    written : bool
+        Whether the file was written.
+
     """
-    if os.path.isfile(filename):
-        with io.open(filename, 'rb') as f:
-            old = f.read()
-        if s == old:
-            return
-    with io.open(filename, 'wb') as f:
-        f.write(s.encode())
-    if verbose:
-        print("  wrote " + filename)
+    return output_manifest().write(s, filename, verbose)
 
 def newcopyover(f1, f2, verbose=False):
     """Useful for not forcing re-compiles and thus playing nicely with the
@@ -177,7 +177,7 @@ def newcopyover(f1, f2, verbose=False):
 
     """
     if os.path.isfile(f1):
-        with io.open(f1, 'r') as f:
+        with io.open(f1, 'rb') as f:
             s = f.read()
         return newoverwrite(s, f2, verbose)
 
@@ -202,6 +202,128 @@ def writenewonly(s, filename, verbose=False):
     if verbose:
         print("  wrote " + filename)
 
+def digest(*objs):
+    """Returns an md5 hex digest of the pickled objects, or None if any of them
+    cannot be pickled.  Equal digests imply equal objects, though equal objects
+    need not have equal digests."""
+    try:
+        s = pickle.dumps(objs, 2)
+    except Exception:
+        return None
+    return md5(s).hexdigest()
+
+def _stablerepr(x):
+    # a representation which, unlike pickles and reprs, does not depend on the
+    # order in which dicts and sets happen to iterate in this process
+    if isinstance(x, Mapping):
+        items = sorted([(_stablerepr(k), _stablerepr(v)) for k, v in x.items()])
+        return '{' + ', '.join([k + ': ' + v for k, v in items]) + '}'
+    elif isinstance(x, (set, frozenset)):
+        return '{' + ', '.join(sorted(map(_stablerepr, x))) + '}'
+    elif isinstance(x, tuple):
+        return '(' + ', '.join(map(_stablerepr, x)) + ',)'
+    elif isinstance(x, list):
+        return '[' + ', '.join(map(_stablerepr, x)) + ']'
+    elif type(x).__repr__ is object.__repr__ or callable(x):
+        # identified only by their address, or behavior that is not in the repr
+        raise TypeError("{0!r} has no stable representation".format(x))
+    return repr(x)
+
+def stabledigest(*objs):
+    """Returns an md5 hex digest of the objects which is the same in every
+    process, or None if any of them cannot be represented stably.  Unlike
+    digest(), this may be stored and compared in later xdress runs.  Dicts,
+    sets, lists, tuples, and objects with a repr are supported, functions are
+    not."""
+    try:
+        s = _stablerepr(objs)
+    except TypeError:
+        return None
+    return md5(s.encode('utf-8')).hexdigest()
+
+def _statkey(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+_generated = {None: {}}  # record file -> {key: (inputs, stats)}
+_generated_stats = {}  # record file -> its stat when last loaded or dumped
+
+def _generated_table(record):
+    # the records of what was generated, (re)loading them from the file if it
+    # changed
+    if record is None:
+        return _generated[None]
+    st = _statkey(record)
+    if record not in _generated or _generated_stats[record] != st:
+        table = {}
+        if st is not None:
+            try:
+                with io.open(record, 'rb') as f:
+                    table = pickle.load(f)
+            except Exception:
+                table = {}
+        _generated[record] = table
+        _generated_stats[record] = st
+    return _generated[record]
+
+def generated_from(key, inputs, filenames, record=None):
+    """Returns whether the files were written from the same inputs earlier, and
+    are still exactly as they were left.  Code generators use this to skip the
+    modules that are unaffected by a change.
+
+    Parameters
+    ----------
+    key : hashable
+        Identifies what was generated, such as a plugin and module name.
+    inputs : str or None
+        Digest of everything that the generated files depend on, see digest().
+        None never matches.
+    filenames : sequence of str
+        Paths to the generated files.
+    record : str, optional
+        Path to a file in which the records are kept between xdress runs, see
+        dump_generated().  By default, only the files that were generated in
+        this process are known, as when xdress runs repeatedly with
+        ``xdress --watch``.  Inputs kept in a file must be a stabledigest().
+
+    """
+    table = _generated_table(record)
+    if inputs is None or key not in table:
+        return False
+    oldinputs, stats = table[key]
+    if oldinputs != inputs or sorted(stats) != sorted(filenames):
+        return False
+    return all([st is not None and _statkey(f) == st \
+                for f, st in stats.items()])
+
+def note_generated(key, inputs, filenames, record=None):
+    """Records that the files were just written from the inputs, see
+    generated_from().  Records for a file are only kept in memory until
+    dump_generated() is called."""
+    table = _generated_table(record)
+    if inputs is None:
+        table.pop(key, None)
+        return
+    table[key] = (inputs, dict([(f, _statkey(f)) for f in filenames]))
+
+def dump_generated(record):
+    """Atomically writes out the records of what was generated to a file, see
+    generated_from()."""
+    table = _generated_table(record)
+    pardir = os.path.split(record)[0]
+    if len(pardir) > 0 and not os.path.isdir(pardir):
+        os.makedirs(pardir)
+    tmpfile = '{0}.{1}.tmp'.format(record, os.getpid())
+    with io.open(tmpfile, 'wb') as f:
+        pickle.dump(table, f, pickle.HIGHEST_PROTOCOL)
+    if os.name == 'nt' and os.path.exists(record):
+        os.remove(record)
+    os.rename(tmpfile, record)
+    _generated_stats[record] = _statkey(record)
+
 def ensuredirs(f):
     """For a file path, ensure that its directory path exists."""
     d = os.path.split(f)[0]
@@ -242,6 +364,10 @@ class NotSpecified(object):
     def __repr__(self):
         return "NotSpecified"
 
+    def __reduce__(self):
+        # copies and unpickles to the singleton
+        return "NotSpecified"
+
 NotSpecified = NotSpecified()
 """A helper class singleton for run control meaning that a 'real' value
 has not been given."""
@@ -264,8 +390,10 @@ class RunControl(object):
         self._updaters = {}
 
     def __getattr__(self, key):
-        if key in self._dict:
-            return self._dict[key]
+        # _dict is looked up directly, since it is missing while unpickling
+        _dict = self.__dict__.get('_dict', {})
+        if key in _dict:
+            return _dict[key]
         elif key in self.__dict__:
             return self.__dict__[key]
         elif key in self.__class__.__dict__:
@@ -344,17 +472,20 @@ class RunControl(object):
                 v = self._updaters[k](getattr(self, k), v)
             setattr(self, k, v)
 
+_home = os.path.expanduser('~')
+
+GLOBAL_RC_FILES = (os.path.join(_home, '.xdressrc'),
+                   os.path.join(_home, '.xdressrc.py'),
+                   os.path.join(_home, '.config', 'xdressrc'),
+                   os.path.join(_home, '.config', 'xdressrc.py'),
+                   )
+"""Paths of the global run control files, in order of increasing precedence."""
+
 def parse_global_rc():
     '''Search a global xdressrc file and parse if it exists.
     If nothing is found, an empty RunControl is returned.'''
-    home = os.path.expanduser('~')
-    globalrcs = [os.path.join(home, '.xdressrc'),
-                 os.path.join(home, '.xdressrc.py'),
-                 os.path.join(home, '.config', 'xdressrc'),
-                 os.path.join(home, '.config', 'xdressrc.py'),
-                 ]
     rc = RunControl()
-    for globalrc in globalrcs:
+    for globalrc in GLOBAL_RC_FILES:
         if not os.path.isfile(globalrc):
             continue
         globalrcdict = {}
@@ -539,7 +670,18 @@ nyansep = r'~\_/' * 17 + '~=[,,_,,]:3'
 class DescriptionCache(object):
     """A quick persistent cache for descriptions from files.
     The keys are (classname, filename, kind) tuples.  The values are
-    (hashes-of-the-file, description-dictionary) tuples."""
+    (dependencies, description-dictionary) tuples, where the dependencies
+    are (path, mtime, size, inode, hash) tuples for the source files and
+    everything that they include.
+
+    The cache is stored in an sqlite database with one record per entry.
+    Each entry is committed as soon as it is set, so an interrupted run keeps
+    everything described so far, and entries are only unpickled when they
+    are looked up.  Dependencies are validated by their stat information, and
+    files are only read and hashed when this has changed.
+    """
+
+    version = 2
 
     def __init__(self, cachefile=os.path.join('build', 'desc.cache')):
         """Parameters
@@ -549,58 +691,406 @@ class DescriptionCache(object):
 
         """
         self.cachefile = cachefile
+        self._stats = {}  # path -> (mtime, size, inode) or None, for this run
+        self._hashes = {}  # path -> hash, for this run
+        pardir = os.path.split(cachefile)[0]
+        if len(pardir) > 0 and not os.path.exists(pardir):
+            os.makedirs(pardir)
         if os.path.isfile(cachefile):
             with io.open(cachefile, 'rb') as f:
-                self.cache = pickle.load(f)
-        else:
-            self.cache = {}
-
-    def _hash_srcfiles(self, srcfiles):
-        hashes = []
-        for srcfile in srcfiles:
-            with io.open(srcfile, 'rb') as f:
-                filebytes = f.read()
-            hashes.append(md5(filebytes).hexdigest())
-        return tuple(hashes)
+                header = f.read(16)
+            if header != b'SQLite format 3\x00':
+                # an old-style pickled cache, the descriptions will be redone
+                os.remove(cachefile)
+        self._db = sqlite3.connect(cachefile)
+        self._db.text_factory = str
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.DatabaseError:
+            pass  # the default journal is also safe, just slower
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != self.version:
+            self._db.execute("DROP TABLE IF EXISTS descs")
+            self._db.execute("PRAGMA user_version={0}".format(self.version))
+        self._db.execute("CREATE TABLE IF NOT EXISTS descs "
+                         "(key TEXT PRIMARY KEY, deps BLOB, desc BLOB)")
+        self._db.commit()
+
+    def refresh(self):
+        """Forgets the stat information and hashes gathered so far, so that
+        long running processes notice files that changed since."""
+        self._stats.clear()
+        self._hashes.clear()
+
+    def _key(self, key):
+        if len(key) == 2 and isinstance(key[0], apiname):
+            key = tuple(key[0]) + key[1:]
+        return repr(key)
+
+    def _stat(self, path):
+        if path not in self._stats:
+            try:
+                st = os.stat(path)
+                self._stats[path] = (st.st_mtime, st.st_size, st.st_ino)
+            except OSError:
+                self._stats[path] = None
+        return self._stats[path]
+
+    def _hash(self, path):
+        if path not in self._hashes:
+            with io.open(path, 'rb') as f:
+                self._hashes[path] = md5(f.read()).hexdigest()
+        return self._hashes[path]
+
+    def _fetch(self, column, key):
+        row = self._db.execute("SELECT {0} FROM descs WHERE key=?".format(column),
+                               (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(bytes(row[0]))
+
+    def _dumps(self, obj):
+        return sqlite3.Binary(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
 
     def isvalid(self, name, kind):
         """Boolean on whether the cach value for a (apiname, kind)
-        tuple matches the state of the file on the system."""
-        key = tuple(name) + (kind,)
-        if key not in self.cache:
+        tuple matches the state of the files on the system."""
+        key = self._key((name, kind))
+        try:
+            deps = self._fetch('deps', key)
+        except KeyError:
             return False
-        cachehashes = self.cache[key][0]
-        currhashes = self._hash_srcfiles(name.srcfiles)
-        return cachehashes == currhashes
+        if not set(name.srcfiles) <= set([d[0] for d in deps]):
+            return False
+        fresh = []
+        for path, mtime, size, ino, h in deps:
+            st = self._stat(path)
+            if st is None:
+                return False
+            if st == (mtime, size, ino):
+                fresh.append((path, mtime, size, ino, h))
+                continue
+            if size != st[1] or h != self._hash(path):
+                return False
+            # only the stat information changed, remember it for next time
+            fresh.append((path,) + st + (h,))
+        if fresh != list(deps):
+            with self._db:
+                self._db.execute("UPDATE descs SET deps=? WHERE key=?",
+                                 (self._dumps(tuple(fresh)), key))
+        return True
+
+    def __contains__(self, key):
+        row = self._db.execute("SELECT 1 FROM descs WHERE key=?",
+                               (self._key(key),)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM descs").fetchone()[0]
 
     def __getitem__(self, key):
-        if len(key) == 2 and isinstance(key[0], apiname):
-            key = tuple(key[0]) + key[1:]
-        return self.cache[key][1]  # return the description only
+        return self._fetch('desc', self._key(key))  # return the description only
 
     def __setitem__(self, key, value):
         if len(key) == 2 and isinstance(key[0], apiname):
             name, kind = key
-            key = tuple(key[0]) + key[1:]
         else:
             name, kind = apiname(*key[0]), key[1]
-        currhashes = self._hash_srcfiles(name.srcfiles)
-        self.cache[key] = (currhashes, value)
+        self.store(name, kind, value)
+
+    def store(self, name, kind, desc, deps=()):
+        """Stores a description along with the files that it depends on.
+
+        Parameters
+        ----------
+        name : apiname
+            API element name.
+        kind : str
+            The kind of the API element, 'class', 'func', or 'var'.
+        desc : dict
+            The description.
+        deps : sequence of str, optional
+            Paths to the files the description depends on, besides the source
+            files of name, such as all of their includes.
+
+        """
+        paths = sorted(set(name.srcfiles) | set(deps))
+        entries = []
+        for path in paths:
+            st = self._stat(path)
+            if st is None:
+                continue
+            entries.append((path,) + st + (self._hash(path),))
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO descs VALUES (?, ?, ?)",
+                             (self._key((name, kind)), self._dumps(tuple(entries)),
+                              self._dumps(desc)))
+
+    def deps(self):
+        """Returns the set of paths that any of the cached descriptions
+        depend on."""
+        paths = set()
+        for row in self._db.execute("SELECT deps FROM descs"):
+            paths.update([d[0] for d in pickle.loads(bytes(row[0]))])
+        return paths
 
     def __delitem__(self, key):
-        del self.cache[key]
+        with self._db:
+            cur = self._db.execute("DELETE FROM descs WHERE key=?", (self._key(key),))
+        if cur.rowcount == 0:
+            raise KeyError(key)
 
     def dump(self):
-        """Writes the cache out to the filesystem."""
-        if not os.path.exists(self.cachefile):
-            pardir = os.path.split(self.cachefile)[0]
-            if not os.path.exists(pardir):
-                os.makedirs(pardir)
-        with io.open(self.cachefile, 'wb') as f:
-            pickle.dump(self.cache, f, pickle.HIGHEST_PROTOCOL)
+        """Writes the cache out to the filesystem.  Entries are already
+        committed as they are set, so this only makes sure that nothing is
+        pending."""
+        self._db.commit()
+
+    def close(self):
+        """Commits anything pending and closes the database, after which the
+        cache may no longer be used."""
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
 
     def __str__(self):
-        return pformat(self.cache)
+        rows = self._db.execute("SELECT key, deps, desc FROM descs ORDER BY key")
+        cache = dict((ast.literal_eval(k), (pickle.loads(bytes(h)),
+                                            pickle.loads(bytes(d))))
+                     for k, h, d in rows)
+        return pformat(cache)
+
+class RunFingerprint(object):
+    """A record of the last successful xdress run, so that a run whose inputs
+    and outputs have not changed since may be skipped.  The fingerprint is made
+    up of a key -- such as the xdress version, the command line arguments, and
+    the plugins -- and the state of every file that the run read or wrote.
+    File states are (mtime, size, inode, hash) tuples, or None for files that
+    did not exist.  Directories may also be recorded, in which case the hash is
+    of their sorted listing, so that new files matching a source glob are
+    noticed.  As with the description cache, files are only hashed when
+    their stat information has changed.
+    """
+
+    def __init__(self, filename=os.path.join('build', 'run.fingerprint')):
+        """Parameters
+        -------------
+        filename : str, optional
+            Path to the fingerprint file.
+
+        """
+        self.filename = filename
+        self.key = None
+        self.files = {}
+        if os.path.isfile(filename):
+            try:
+                with io.open(filename, 'rb') as f:
+                    self.key, self.files = pickle.load(f)
+            except Exception:
+                self.key, self.files = None, {}
+
+    def _filestate(self, path, hashit=True):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        h = None
+        if hashit and os.path.isdir(path):
+            h = md5('\n'.join(sorted(os.listdir(path))).encode()).hexdigest()
+        elif hashit:
+            with io.open(path, 'rb') as f:
+                h = md5(f.read()).hexdigest()
+        return (st.st_mtime, st.st_size, st.st_ino, h)
+
+    def check(self, key):
+        """Returns None if nothing has changed since the recorded run, and
+        otherwise a string explaining the first change that was found."""
+        if self.key is None:
+            return "there is no record of a previous successful run"
+        for k in sorted(set(key) | set(self.key)):
+            if key.get(k, None) != self.key.get(k, None):
+                return "the {0} changed".format(k.replace('_', ' '))
+        refreshed = {}
+        for path in sorted(self.files):
+            old = self.files[path]
+            new = self._filestate(path, hashit=False)
+            if old is None or new is None:
+                if old is not new:
+                    return "{0} was {1}".format(path, "removed" if new is None \
+                                                      else "created")
+                continue
+            if new[:3] == old[:3]:
+                continue
+            new = self._filestate(path) if new[1] == old[1] else new
+            if new[3] != old[3]:
+                return "{0} changed".format(path)
+            refreshed[path] = new
+        if 0 < len(refreshed):
+            # only the stat information changed, remember it for next time
+            self.files.update(refreshed)
+            self._dump()
+        return None
+
+    def update(self, key, paths):
+        """Records a successful run and atomically writes it out.
+
+        Parameters
+        ----------
+        key : dict
+            Values that identify the run, such as the command line arguments.
+        paths : iterable of str
+            The files that the run read and wrote.
+
+        """
+        files = {}
+        for path in paths:
+            old = self.files.get(path, None)
+            new = self._filestate(path, hashit=False)
+            if new is not None and old is not None and new[:3] == old[:3]:
+                new = old
+            elif new is not None:
+                new = self._filestate(path)
+            files[path] = new
+        self.key, self.files = key, files
+        self._dump()
+
+    def _dump(self):
+        pardir = os.path.split(self.filename)[0]
+        if len(pardir) > 0 and not os.path.isdir(pardir):
+            os.makedirs(pardir)
+        tmpfile = '{0}.{1}.tmp'.format(self.filename, os.getpid())
+        with io.open(tmpfile, 'wb') as f:
+            pickle.dump((self.key, self.files), f, pickle.HIGHEST_PROTOCOL)
+        if os.name == 'nt' and os.path.exists(self.filename):
+            os.remove(self.filename)
+        os.rename(tmpfile, self.filename)
+
+class OutputManifest(object):
+    """A record of the content hashes of generated files, so that regenerating
+    a file with unchanged contents neither touches it, which would force
+    Cython and the C/C++ compiler to rebuild it, nor reads it back.  Entries
+    are (mtime, size, inode, hash) tuples.  A file is only read and hashed
+    when its stat information differs from its entry, as when it was changed
+    by something other than xdress.  Files are written atomically, through
+    temporary files in the same directory.
+    """
+
+    def __init__(self, filename=None):
+        """Parameters
+        -------------
+        filename : str, optional
+            Path to the manifest file.  By default, the manifest is only kept
+            in memory.
+
+        """
+        self.filename = filename
+        self.entries = {}
+        self.dirs = set()  # directories which are known to exist
+        if filename is not None and os.path.isfile(filename):
+            try:
+                with io.open(filename, 'rb') as f:
+                    self.entries = pickle.load(f)
+            except Exception:
+                self.entries = {}
+
+    def _stathash(self, path, h=None):
+        # the entry for a file, hashing it only if no hash is given
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if h is None:
+            with io.open(path, 'rb') as f:
+                h = md5(f.read()).hexdigest()
+        return (st.st_mtime, st.st_size, st.st_ino, h)
+
+    def ensuredir(self, d):
+        """Creates a directory and its parents if they do not exist, only
+        checking directories that were not seen before."""
+        if len(d) == 0 or d in self.dirs:
+            return
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        self.dirs.add(d)
+
+    def current(self, path):
+        """Returns the hash of the contents of a file, or None if it does not
+        exist.  The file is only read if it changed since it was last seen."""
+        path = os.path.abspath(path)
+        entry = self.entries.get(path, None)
+        if entry is not None:
+            new = self._stathash(path, h=entry[3])
+            if new is not None and new[:3] == entry[:3]:
+                return entry[3]
+        new = self._stathash(path)
+        if new is None:
+            self.entries.pop(path, None)
+            return None
+        self.entries[path] = new
+        return new[3]
+
+    def write(self, s, filename, verbose=False):
+        """Writes out a file unless it already has the same contents.
+
+        Parameters
+        ----------
+        s : str or bytes
+            The contents of the file.  Strings are encoded as UTF-8.
+        filename : str
+            Path to file.
+        vebose : bool, optional
+            prints extra message
+
+        Returns
+        -------
+        written : bool
+            Whether the file was written.
+
+        """
+        data = s if isinstance(s, bytes) else s.encode('utf-8')
+        h = md5(data).hexdigest()
+        if self.current(filename) == h:
+            return False
+        path = os.path.abspath(filename)
+        self.ensuredir(os.path.dirname(path))
+        tmpfile = '{0}.{1}.tmp'.format(path, os.getpid())
+        with io.open(tmpfile, 'wb') as f:
+            f.write(data)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmpfile, path)
+        self.entries[path] = self._stathash(path, h=h)
+        if verbose:
+            print("  wrote " + filename)
+        return True
+
+    def dump(self):
+        """Atomically writes out the manifest, if it has a file."""
+        if self.filename is None:
+            return
+        pardir = os.path.split(self.filename)[0]
+        if len(pardir) > 0 and not os.path.isdir(pardir):
+            os.makedirs(pardir)
+        tmpfile = '{0}.{1}.tmp'.format(self.filename, os.getpid())
+        with io.open(tmpfile, 'wb') as f:
+            pickle.dump(self.entries, f, pickle.HIGHEST_PROTOCOL)
+        if os.name == 'nt' and os.path.exists(self.filename):
+            os.remove(self.filename)
+        os.rename(tmpfile, self.filename)
+
+_output_manifest = OutputManifest()
+
+def output_manifest(filename=None):
+    """Returns the output manifest which newoverwrite() writes files through.
+    If a filename is given, the manifest stored there is loaded and becomes
+    the current one.  Otherwise, the current manifest is returned, which is
+    only kept in memory until a file is given.
+    """
+    global _output_manifest
+    if filename is not None:
+        _output_manifest = OutputManifest(filename)
+    return _output_manifest
 
 def merge_descriptions(descriptions):
     """Given a sequence of descriptions, in order of increasing precedence,
@@ -710,11 +1200,201 @@ def memoize(obj):
             return obj(*args, **kwargs)
     return memoizer
 
+def _memotags(x, tags):
+    # adds the strings found in nested tuples and lists to a set of tags
+    if isinstance(x, basestring):
+        tags.add(x)
+    elif isinstance(x, (tuple, list)):
+        for y in x:
+            _memotags(y, tags)
+    return tags
+
+class TaggedMemo(object):
+    """The cache of method memoizations on an instance, see memoize_method.
+    Every entry is tagged with what it depends on, so that a change may remove
+    only the entries that it affects.  An entry is tagged with the strings --
+    such as type names -- found in its arguments and its result, the tags of
+    the memoized calls made while it was computed, and any tags passed to
+    depends() meanwhile.
+
+    The instance may also switch between contexts, such as the module being
+    generated, see switch().  Entries carrying any of the tags of the active
+    context are kept in a separate table for that context, and the table is
+    kept when another context becomes active.  All other entries are shared
+    by every context.
+    """
+
+    def __init__(self):
+        self._shared = {}  # meth -> {args: (value, tags)}
+        self._tables = {None: self._shared}  # context -> per method tables
+        self._context = None
+        self._active = self._shared
+        self._ctxtags = frozenset()
+        self._index = {}  # tag -> (context, meth, args) of the entries
+        self._frames = []  # tags of the entries being computed
+        self._bound = {}  # meth -> its BoundMemo
+
+    def __len__(self):
+        return sum([len(table) for tables in self._tables.values() \
+                               for table in tables.values()])
+
+    def table(self, meth, context=None):
+        """Returns the dict of entries for a method in a context, which is
+        created if it does not exist."""
+        tables = self._tables[context]
+        if meth not in tables:
+            tables[meth] = {}
+        return tables[meth]
+
+    def size(self, meth):
+        """Returns the number of entries for a method, in every context."""
+        return sum([len(tables.get(meth, ())) for tables in self._tables.values()])
+
+    def stats(self):
+        """Returns a dict mapping the names of the memoized methods to their
+        (hits, misses, size) counters."""
+        return dict([(bm.__name__, (bm.hits, bm.misses, self.size(meth))) \
+                     for meth, bm in self._bound.items()])
+
+    def _remove(self, context, meth, key):
+        index = self._index
+        for tag in self._tables[context][meth].pop(key)[1]:
+            entries = index[tag]
+            entries.discard((context, meth, key))
+            if 0 == len(entries):
+                del index[tag]
+
+    def forget(self, meth, key):
+        """Removes the entry for a method and its argument key from every
+        context."""
+        contexts = [c for c, tables in self._tables.items() \
+                    if key in tables.get(meth, ())]
+        if 0 == len(contexts):
+            raise KeyError(key)
+        for context in contexts:
+            self._remove(context, meth, key)
+
+    def clear(self):
+        """Removes all entries."""
+        for tables in self._tables.values():
+            for table in tables.values():
+                table.clear()
+        self._index.clear()
+
+    def switch(self, context, tags):
+        """Makes a context active.
+
+        Parameters
+        ----------
+        context : hashable
+            Identifies the context, e.g. the values of any configuration and 
+            temporary changes which memoized values may depend on.
+        tags : iterable
+            The tags of the entries which depend on the context.
+
+        """
+        self._context = context
+        self._ctxtags = frozenset(tags)
+        if context not in self._tables:
+            self._tables[context] = {}
+        self._active = self._tables[context]
+
+    def depends(self, *tags):
+        """Tags the entries which are currently being computed."""
+        if 0 < len(self._frames):
+            self._frames[-1].update(tags)
+
+    def compute(self, meth, key, args, kwargs):
+        """Computes an entry by calling the method with the arguments, and 
+        stores it under the key.  Returns the value."""
+        frames = self._frames
+        tags = _memotags(key, set())
+        frames.append(tags)
+        try:
+            value = meth(*args, **kwargs)
+        except Exception:
+            frames.pop()
+            self.depends(*tags)  # the caller may depend on the failure
+            raise
+        frames.pop()
+        _memotags(value, tags)
+        self.depends(*tags)
+        context = None if self._ctxtags.isdisjoint(tags) else self._context
+        self.table(meth, context)[key] = (value, tags)
+        index = self._index
+        for tag in tags:
+            if tag in index:
+                index[tag].add((context, meth, key))
+            else:
+                index[tag] = set([(context, meth, key)])
+        return value
+
+    def invalidate(self, *tags):
+        """Removes the entries carrying any of the tags, in every context, and
+        returns how many were removed."""
+        n = 0
+        for tag in tags:
+            for context, meth, key in list(self._index.get(tag, ())):
+                self._remove(context, meth, key)
+                n += 1
+        return n
+
+_kwmark = object()  # separates positional and keyword arguments in memo keys
+
+class BoundMemo(object):
+    """A memoized method bound to an instance, see memoize_method.  The hits
+    and misses attributes count the calls which were and were not found in
+    the cache, and len() gives the number of cached values."""
+
+    def __init__(self, meth, obj, memo):
+        self.meth = meth
+        self.obj = obj
+        self.memo = memo
+        self.shared = memo.table(meth)
+        self.hits = 0
+        self.misses = 0
+        self.__doc__ = meth.__doc__
+        self.__name__ = meth.__name__
+
+    def __len__(self):
+        return self.memo.size(self.meth)
+
+    def __call__(self, *args, **kwargs):
+        key = args + (_kwmark,) + tuple(sorted(kwargs.items())) if kwargs \
+              else args
+        memo = self.memo
+        try:
+            table = memo._active.get(self.meth, None)
+            entry = None if table is None else table.get(key, None)
+            if entry is None:
+                entry = self.shared.get(key, None)
+                if entry is not None and not memo._ctxtags.isdisjoint(entry[1]):
+                    entry = None
+        except TypeError:
+            # unhashable arguments are not memoized
+            return self.meth(self.obj, *args, **kwargs)
+        if entry is None:
+            self.misses += 1
+            return memo.compute(self.meth, key, (self.obj,) + args, kwargs)
+        self.hits += 1
+        if 0 < len(memo._frames):
+            memo._frames[-1].update(entry[1])
+        return entry[0]
+
+    def forget(self, *args, **kwargs):
+        """Removes the cached value for the arguments, raising a KeyError if 
+        there is none."""
+        key = args + (_kwmark,) + tuple(sorted(kwargs.items())) if kwargs \
+              else args
+        self.memo.forget(self.meth, key)
+
 class memoize_method(object):
     """Decorator suitable for memoizing methods, rather than functions
     and classes.  This is based off of code that may be found at
     http://code.activestate.com/recipes/577452-a-memoize-decorator-for-instance-methods/
-    This code was originally released under the MIT license.
+    This code was originally released under the MIT license.  The cache is a
+    TaggedMemo stored on the instance as ``_cache``.  The method is bound to 
+    each instance once, as a BoundMemo which is then stored on the instance.
     """
     def __init__(self, meth):
         self.meth = meth
@@ -722,22 +1402,21 @@ class memoize_method(object):
     def __get__(self, obj, objtype=None):
         if obj is None:
             return self.meth
-        p = functools.partial(self, obj)
-        p.__doc__ = self.meth.__doc__
-        p.__name__ = self.meth.__name__
-        return p
-
-    def __call__(self, *args, **kwargs):
-        obj = args[0]
-        cache = obj._cache = getattr(obj, '_cache', {})
-        key = (self.meth, args[1:], tuple(sorted(kwargs.items())))
-        hashable = ishashable(key)
-        if hashable:
-            if key not in cache:
-                cache[key] = self.meth(*args, **kwargs)
-            return cache[key]
-        else:
-            return self.meth(*args, **kwargs)
+        d = getattr(obj, '__dict__', None)
+        memo = None if d is None else d.get('_cache', None)
+        if memo is None:
+            memo = obj._cache = TaggedMemo()
+        bm = memo._bound.get(self.meth, None)
+        if bm is None:
+            bm = memo._bound[self.meth] = BoundMemo(self.meth, obj, memo)
+            # shadow this descriptor, unless it is reachable by another name
+            name = self.meth.__name__
+            for klass in type(obj).__mro__:
+                if name in klass.__dict__:
+                    if klass.__dict__[name] is self and d is not None:
+                        d[name] = bm
+                    break
+        return bm
 
 
 #